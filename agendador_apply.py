@@ -0,0 +1,117 @@
+# /opt/nanosip/agendador_apply.py
+"""
+Fila de aplicação da configuração do Asterisk (apply_config).
+
+As telas de configuração apenas pedem uma aplicação e retornam na hora.
+Pedidos feitos dentro da janela (NANOSIP_APPLY_JANELA, padrão 5s) são
+agrupados: N edições seguidas geram uma única execução, disparada quando
+a janela passa sem novos pedidos (ou, em edições contínuas, após
+ESPERA_MAXIMA). Uma única thread executa, então nunca há duas aplicações
+ao mesmo tempo; pedidos que chegam durante uma execução geram outra logo
+depois dela.
+"""
+import os
+import subprocess
+import threading
+import time
+
+JANELA_APPLY = float(os.environ.get("NANOSIP_APPLY_JANELA", "5"))
+ESPERA_MAXIMA = 30          # segundos desde o primeiro pedido pendente
+TIMEOUT_APPLY = 120
+COMANDO_APPLY = ["sudo", "systemctl", "start", "nanosip-admin@apply_config.service"]
+
+
+def executar_apply():
+    """Dispara o serviço oneshot e espera terminar."""
+    subprocess.run(COMANDO_APPLY, check=True, timeout=TIMEOUT_APPLY,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+class AgendadorApply:
+    """Agrupa pedidos de apply e os executa em série, em uma thread própria."""
+
+    def __init__(self, janela=JANELA_APPLY, executar=executar_apply):
+        self.janela = janela
+        self._executar = executar
+        self._cond = threading.Condition()
+        self._thread = None
+        self._primeiro_pedido = None    # início do lote pendente (monotonic)
+        self._ultimo_pedido = None
+        self._imediato = False
+        self.executando = False
+        self.pedidos = 0
+        self.execucoes = 0
+        self.ultima_execucao = None     # time.time() do fim da última execução
+        self.ultimo_erro = None
+
+    def solicitar(self, imediato=False):
+        """Registra um pedido de apply e retorna sem esperar a execução."""
+        agora = time.monotonic()
+        with self._cond:
+            self.pedidos += 1
+            if self._primeiro_pedido is None:
+                self._primeiro_pedido = agora
+            self._ultimo_pedido = agora
+            self._imediato = self._imediato or imediato
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="agendador-apply", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _espera(self):
+        """Segundos até o lote pendente poder rodar (chamado com o lock)."""
+        if self._imediato:
+            return 0
+        agora = time.monotonic()
+        return max(0, min(self._ultimo_pedido + self.janela, self._primeiro_pedido + ESPERA_MAXIMA) - agora)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._primeiro_pedido is None or self._espera() > 0:
+                    self._cond.wait(None if self._primeiro_pedido is None else self._espera())
+                self._primeiro_pedido = self._ultimo_pedido = None
+                self._imediato = False
+                self.executando = True
+
+            erro = None
+            try:
+                self._executar()
+            except Exception as e:
+                erro = str(e)
+                print(f"[agendador_apply] Erro ao aplicar configurações: {e}")
+
+            with self._cond:
+                self.executando = False
+                self.execucoes += 1
+                self.ultima_execucao = time.time()
+                self.ultimo_erro = erro
+
+    def status(self):
+        with self._cond:
+            return {
+                "pendente": self._primeiro_pedido is not None,
+                "executando": self.executando,
+                "pedidos": self.pedidos,
+                "execucoes": self.execucoes,
+                "ultima_execucao": self.ultima_execucao,
+                "ultimo_erro": self.ultimo_erro,
+            }
+
+
+_agendador = None
+_init_lock = threading.Lock()
+
+
+def get_agendador():
+    """Retorna o agendador compartilhado pelo processo."""
+    global _agendador
+    if _agendador is None:
+        with _init_lock:
+            if _agendador is None:
+                _agendador = AgendadorApply()
+    return _agendador
+
+
+def solicitar_apply(imediato=False):
+    get_agendador().solicitar(imediato)
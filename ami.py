@@ -0,0 +1,480 @@
+# /opt/nanosip/ami.py
+"""
+Cliente do Asterisk Manager Interface (AMI) usado pelo painel.
+
+Mantém uma conexão TCP permanente com o Asterisk e um modelo em memória
+de peers, canais e membros de fila, atualizado a partir dos eventos AMI.
+O painel lê esse modelo em vez de executar 'asterisk -rx' a cada consulta.
+
+A senha do usuário AMI é gerada na instalação (ami.secret, um valor por
+máquina) e gravada no manager.conf por 'python3 ami.py instalar', que
+system_manager.sh install_ami executa na instalação e nas atualizações.
+"""
+import os
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import asterisk_cli
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+AMI_HOST = os.environ.get("NANOSIP_AMI_HOST", "127.0.0.1")
+AMI_PORT = int(os.environ.get("NANOSIP_AMI_PORT", "5038"))
+AMI_USUARIO = os.environ.get("NANOSIP_AMI_USUARIO", "nanosip")
+AMI_SENHA = os.environ.get("NANOSIP_AMI_SENHA")     # padrão: conteúdo de AMI_SEGREDO_PATH
+AMI_SEGREDO_PATH = os.environ.get("NANOSIP_AMI_SEGREDO", os.path.join(BASE_DIR, "ami.secret"))
+
+MANAGER_CONF_PATH = "/etc/asterisk/manager.conf"
+MANAGER_CONF_MODELO = os.path.join(BASE_DIR, "config", "manager.conf")
+# Eventos lidos pelo modelo. Para escrever, SIPpeers e CoreShowChannels só exigem
+# 'reporting' e QueueStatus nenhuma classe: o painel não origina chamadas nem reinicia o Asterisk
+AMI_LEITURA = "system,call,agent,reporting"
+AMI_ESCRITA = "reporting"
+
+RECONEXAO_MIN = 1
+RECONEXAO_MAX = 30
+
+_RE_CANAL_SIP = re.compile(r'^SIP/([^-]+)-')
+_RE_INTERFACE_SIP = re.compile(r'^SIP/(.+)$')
+
+
+def ramal_do_canal(canal):
+    """Extrai o ramal de um nome de canal (ex: 'SIP/200-00000001' -> '200')."""
+    m = _RE_CANAL_SIP.match(canal or "")
+    return m.group(1) if m else None
+
+
+def ramal_da_interface(interface):
+    """Extrai o ramal de uma interface de fila (ex: 'SIP/200' -> '200')."""
+    m = _RE_INTERFACE_SIP.match(interface or "")
+    return m.group(1) if m else None
+
+
+def _formata_duracao(segundos):
+    segundos = max(int(segundos), 0)
+    return f"{segundos // 3600:02d}:{(segundos % 3600) // 60:02d}:{segundos % 60:02d}"
+
+
+def _segundos_da_duracao(texto):
+    try:
+        h, m, s = (int(x) for x in texto.split(":"))
+        return h * 3600 + m * 60 + s
+    except (AttributeError, ValueError):
+        return 0
+
+
+# ========================================================
+# 🔑 Usuário AMI (senha por instalação e manager.conf)
+# ========================================================
+
+def ler_segredo(criar=False, caminho=None):
+    """Senha AMI desta instalação; com criar, gera uma nova se ainda não existir."""
+    caminho = caminho or AMI_SEGREDO_PATH
+    try:
+        with open(caminho) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        if not criar:
+            return None
+    segredo = secrets.token_urlsafe(24)
+    fd = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(segredo + "\n")
+    return segredo
+
+
+def secao_manager(segredo, usuario=AMI_USUARIO):
+    return [
+        f"[{usuario}]",
+        f"secret = {segredo}",
+        "deny = 0.0.0.0/0.0.0.0",
+        "permit = 127.0.0.1/255.255.255.255",
+        f"read = {AMI_LEITURA}",
+        f"write = {AMI_ESCRITA}",
+    ]
+
+
+def mesclar_manager_conf(texto, segredo, usuario=AMI_USUARIO):
+    """
+    manager.conf com o usuário do painel atualizado: a seção [usuario] é
+    substituída (ou acrescentada) e o AMI habilitado em [general]. Os demais
+    usuários e opções são mantidos.
+    """
+    linhas, secao, tem_general, habilitado = [], None, False, False
+    for linha in texto.splitlines():
+        m = re.match(r"\s*\[([^\]]+)\]", linha)
+        if m:
+            if secao == "general" and not habilitado:
+                linhas.append("enabled = yes")
+            secao = m.group(1).strip()
+            tem_general = tem_general or secao == "general"
+        if secao == usuario:
+            continue
+        if secao == "general" and re.match(r"\s*enabled\s*=", linha):
+            linha, habilitado = "enabled = yes", True
+        linhas.append(linha)
+    if secao == "general" and not habilitado:
+        linhas.append("enabled = yes")
+    if not tem_general:
+        linhas = ["[general]", "enabled = yes", "port = 5038", "bindaddr = 127.0.0.1", ""] + linhas
+
+    while linhas and not linhas[-1].strip():
+        linhas.pop()
+    return "\n".join(linhas + [""] + secao_manager(segredo, usuario)) + "\n"
+
+
+def instalar_manager(caminho=MANAGER_CONF_PATH):
+    """Garante o usuário do painel no manager.conf. Retorna True se o arquivo mudou."""
+    segredo = ler_segredo(criar=True)
+    try:
+        with open(caminho) as f:
+            atual = f.read()
+    except FileNotFoundError:
+        atual = None
+    base = atual
+    if base is None:
+        with open(MANAGER_CONF_MODELO) as f:
+            base = f.read()
+    novo = mesclar_manager_conf(base, segredo)
+    if novo == atual:
+        return False
+
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w") as f:
+        f.write(novo)
+    os.chmod(tmp, 0o640)
+    os.replace(tmp, caminho)
+    return True
+
+
+# ========================================================
+# 📦 Modelo em memória do estado do Asterisk
+# ========================================================
+
+class EstadoAsterisk:
+    """Estado de peers, canais e filas alimentado pelos eventos AMI."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mudou = threading.Condition(self._lock)
+        self.versao = 0
+        self.conectado = False
+        self.peers = {}
+        self.canais = {}
+        self.filas = {}
+
+    def limpar(self):
+        with self._lock:
+            self.peers.clear()
+            self.canais.clear()
+            self.filas.clear()
+
+    # --- Despacho de eventos ---
+
+    def processar(self, msg):
+        """Aplica um evento (ou item de listagem) AMI ao modelo."""
+        evento = msg.get("Event")
+        tratador = getattr(self, f"_ev_{evento}", None) if evento else None
+        if tratador:
+            with self._lock:
+                tratador(msg)
+                self.versao += 1
+                self._mudou.notify_all()
+
+    def aguardar_mudanca(self, versao, timeout=None):
+        """Bloqueia até o modelo passar da versão informada (ou até o timeout)."""
+        with self._lock:
+            self._mudou.wait_for(lambda: self.versao != versao, timeout)
+            return self.versao
+
+    # --- Peers ---
+
+    def _atualiza_peer(self, ramal, ip, status, latencia="-"):
+        self.peers[ramal] = {"ip": ip, "status": status, "latencia": latencia}
+
+    def _ev_PeerEntry(self, msg):
+        ramal = msg.get("ObjectName")
+        if not ramal:
+            return
+        ip = msg.get("IPaddress", "")
+        status_txt = msg.get("Status", "").upper()
+        if not ip or ip == "-none-":
+            self._atualiza_peer(ramal, "offline", "offline")
+            return
+        latencia = "-"
+        status = "offline"
+        if status_txt.startswith("OK"):
+            status = "online"
+            mlat = re.search(r'\(([^)]+)\)', status_txt)
+            if mlat:
+                latencia = mlat.group(1).lower()
+        self._atualiza_peer(ramal, ip, status, latencia)
+
+    def _ev_PeerStatus(self, msg):
+        ramal = ramal_da_interface(msg.get("Peer"))
+        if not ramal:
+            return
+        estado = msg.get("PeerStatus", "").lower()
+        anterior = self.peers.get(ramal, {})
+        ip = (msg.get("Address") or "").split(":")[0] or anterior.get("ip", "offline")
+
+        if estado == "unregistered" or estado == "rejected":
+            self._atualiza_peer(ramal, "offline", "offline")
+        elif estado in ("registered", "reachable"):
+            latencia = f"{msg['Time']} ms" if msg.get("Time") else anterior.get("latencia", "-")
+            self._atualiza_peer(ramal, ip, "online", latencia)
+        else:
+            # Unreachable / Lagged -> mantém IP, mas o ramal aparece como offline
+            self._atualiza_peer(ramal, ip, "offline")
+
+    # --- Canais ---
+
+    def _novo_canal(self, msg, duracao=0):
+        uniqueid = msg.get("Uniqueid")
+        if not uniqueid:
+            return
+        self.canais[uniqueid] = {
+            "canal": msg.get("Channel", ""),
+            "uniqueid": uniqueid,
+            "linkedid": msg.get("Linkedid") or uniqueid,
+            "callerid": msg.get("CallerIDNum", ""),
+            "exten": msg.get("Exten", ""),
+            "estado": msg.get("ChannelStateDesc", ""),
+            "criado_em": time.monotonic() - duracao,
+            "inicio": int(time.time() - duracao),
+        }
+
+    def _ev_CoreShowChannel(self, msg):
+        self._novo_canal(msg, _segundos_da_duracao(msg.get("Duration")))
+
+    def _ev_Newchannel(self, msg):
+        self._novo_canal(msg)
+
+    def _ev_Newstate(self, msg):
+        canal = self.canais.get(msg.get("Uniqueid"))
+        if canal:
+            canal["estado"] = msg.get("ChannelStateDesc", canal["estado"])
+            if msg.get("CallerIDNum") and msg["CallerIDNum"] != "<unknown>":
+                canal["callerid"] = msg["CallerIDNum"]
+
+    def _ev_NewExten(self, msg):
+        canal = self.canais.get(msg.get("Uniqueid"))
+        if canal and msg.get("Extension") and canal["uniqueid"] == canal["linkedid"]:
+            canal["exten"] = msg["Extension"]
+
+    def _ev_Hangup(self, msg):
+        self.canais.pop(msg.get("Uniqueid"), None)
+
+    # --- Filas ---
+
+    def _fila(self, nome):
+        return self.filas.setdefault(nome, {"membros": {}, "aguardando": 0})
+
+    def _ev_QueueParams(self, msg):
+        fila = self._fila(msg.get("Queue"))
+        fila["aguardando"] = int(msg.get("Calls") or 0)
+
+    def _ev_QueueMember(self, msg):
+        fila = self._fila(msg.get("Queue"))
+        interface = msg.get("StateInterface") or msg.get("Location") or msg.get("Interface")
+        ramal = ramal_da_interface(interface)
+        if ramal:
+            fila["membros"][ramal] = {
+                "status": int(msg.get("Status") or 0),
+                "pausado": msg.get("Paused") == "1",
+            }
+
+    _ev_QueueMemberStatus = _ev_QueueMember
+    _ev_QueueMemberAdded = _ev_QueueMember
+    _ev_QueueMemberPause = _ev_QueueMember
+
+    def _ev_QueueMemberRemoved(self, msg):
+        fila = self._fila(msg.get("Queue"))
+        interface = msg.get("StateInterface") or msg.get("Interface")
+        fila["membros"].pop(ramal_da_interface(interface), None)
+
+    def _ev_QueueCallerJoin(self, msg):
+        self._fila(msg.get("Queue"))["aguardando"] = int(msg.get("Count") or 0)
+
+    def _ev_QueueCallerLeave(self, msg):
+        self._fila(msg.get("Queue"))["aguardando"] = int(msg.get("Count") or 0)
+
+    # --- Leitura (cópias, seguras para uso fora do lock) ---
+
+    def status_peers(self):
+        with self._lock:
+            return {ramal: dict(dados) for ramal, dados in self.peers.items()}
+
+    def chamadas(self):
+        """Agrupa os canais por Linkedid, como na listagem 'core show channels'."""
+        agora = time.monotonic()
+        with self._lock:
+            canais = [dict(c) for c in self.canais.values()]
+
+        grupos = {}
+        for canal in canais:
+            grupos.setdefault(canal["linkedid"], []).append(canal)
+
+        chamadas = []
+        for linkedid, membros in grupos.items():
+            origem = next((c for c in membros if c["uniqueid"] == linkedid), membros[0])
+            ramais = sorted({r for r in (ramal_do_canal(c["canal"]) for c in membros) if r})
+            chamadas.append({
+                "id": linkedid,
+                "origem": origem["callerid"] or "-",
+                "destino": origem["exten"] or "-",
+                "duracao": _formata_duracao(agora - origem["criado_em"]),
+                "inicio": origem["inicio"],
+                "ramais": ramais,
+            })
+        return chamadas
+
+    def filas_ativas(self):
+        with self._lock:
+            return {
+                nome: {"membros": {r: dict(m) for r, m in f["membros"].items()},
+                       "aguardando": f["aguardando"]}
+                for nome, f in self.filas.items()
+            }
+
+
+# ========================================================
+# 🔌 Cliente AMI (thread de leitura com reconexão)
+# ========================================================
+
+class ClienteAMI:
+    """Conexão AMI de longa duração que alimenta um EstadoAsterisk."""
+
+    def __init__(self, estado, host=AMI_HOST, port=AMI_PORT,
+                 usuario=AMI_USUARIO, senha=AMI_SENHA):
+        self.estado = estado
+        self.host = host
+        self.port = port
+        self.usuario = usuario
+        self.senha = senha
+        self._sock = None
+        self._parar = threading.Event()
+        self._thread = None
+        self._action_id = 0
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="nanosip-ami", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._sock:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _executar(self):
+        espera = RECONEXAO_MIN
+        while not self._parar.is_set():
+            try:
+                self._conectar()
+                espera = RECONEXAO_MIN
+                self._ler_mensagens()
+            except (OSError, ConnectionError) as e:
+                print(f"[AMI] Conexão perdida com {self.host}:{self.port}: {e}")
+            finally:
+                self.estado.conectado = False
+                if self._sock:
+                    self._sock.close()
+                    self._sock = None
+            self._parar.wait(espera)
+            espera = min(espera * 2, RECONEXAO_MAX)
+
+    def _enviar(self, acao, **campos):
+        self._action_id += 1
+        linhas = [f"Action: {acao}", f"ActionID: nanosip-{self._action_id}"]
+        linhas.extend(f"{k}: {v}" for k, v in campos.items())
+        self._sock.sendall(("\r\n".join(linhas) + "\r\n\r\n").encode("utf-8"))
+
+    def _conectar(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=10)
+        self._arquivo = self._sock.makefile("r", encoding="utf-8", errors="replace", newline="\r\n")
+        self._arquivo.readline()  # Banner: "Asterisk Call Manager/x.y.z"
+
+        self._enviar("Login", Username=self.usuario, Secret=self.senha or ler_segredo() or "", Events="on")
+        resposta = self._ler_mensagem()
+        if resposta is None or resposta.get("Response") != "Success":
+            raise ConnectionError(f"login recusado: {resposta and resposta.get('Message')}")
+
+        # Sem timeout após o login: a thread fica bloqueada aguardando eventos
+        self._sock.settimeout(None)
+
+        # Sincronização inicial; os itens das listagens chegam como eventos
+        self.estado.limpar()
+        self._enviar("SIPpeers")
+        self._enviar("CoreShowChannels")
+        self._enviar("QueueStatus")
+        self.estado.conectado = True
+
+    def _ler_mensagem(self):
+        msg = {}
+        while True:
+            linha = self._arquivo.readline()
+            if not linha:
+                return None
+            linha = linha.rstrip("\r\n")
+            if not linha:
+                if msg:
+                    return msg
+                continue
+            chave, sep, valor = linha.partition(":")
+            if sep:
+                msg[chave.strip()] = valor.strip()
+
+    def _ler_mensagens(self):
+        while not self._parar.is_set():
+            msg = self._ler_mensagem()
+            if msg is None:
+                raise ConnectionError("conexão encerrada pelo Asterisk")
+            self.estado.processar(msg)
+
+
+# ========================================================
+# 🌐 Instância compartilhada pelo processo
+# ========================================================
+
+_estado = None
+_cliente = None
+_init_lock = threading.Lock()
+
+
+def get_estado():
+    """Retorna o modelo compartilhado, iniciando o cliente AMI na primeira chamada."""
+    global _estado, _cliente
+    if _estado is None:
+        with _init_lock:
+            if _estado is None:
+                estado = EstadoAsterisk()
+                _cliente = ClienteAMI(estado)
+                _cliente.iniciar()
+                _estado = estado
+    return _estado
+
+
+if __name__ == "__main__":
+    # python3 ami.py instalar: cria a senha (se preciso) e atualiza o manager.conf
+    if sys.argv[1:] != ["instalar"]:
+        print("Uso: python3 ami.py instalar")
+        sys.exit(1)
+    if instalar_manager():
+        print(f"Usuário AMI '{AMI_USUARIO}' gravado em {MANAGER_CONF_PATH}.")
+        try:
+            asterisk_cli.rx("manager reload")
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            print(f"[AMI] Erro ao recarregar o manager: {e}")
+    else:
+        print(f"Usuário AMI '{AMI_USUARIO}' já está atualizado em {MANAGER_CONF_PATH}.")
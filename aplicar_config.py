@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# /opt/nanosip/aplicar_config.py
+"""
+Aplicação da configuração do Asterisk em um único processo.
+
+Carrega o modelo (modelo_config.carregar_modelo) uma vez, dentro de uma
+única transação de leitura, e gera extensions.conf, queues.conf e sip.conf
+a partir desse mesmo retrato do banco. Os tempos de cada etapa vão para a
+saída de erro. Os scripts reload_*.py continuam funcionando isoladamente.
+Antes de tudo, aplica as migrações pendentes do banco (migracoes.py).
+
+Só são gravados (arquivo temporário + rename) os arquivos cujo conteúdo
+mudou em relação ao disco, e só os módulos correspondentes são recarregados
+no Asterisk (dialplan, sip, queue). Sem mudanças, nada é recarregado.
+
+Uso (via system_manager.sh apply_config):
+    python3 aplicar_config.py
+"""
+import hashlib
+import os
+import subprocess
+import sys
+import time
+
+import asterisk_cli
+from licenca import get_modulos
+from migracoes import migrar
+from modelo_config import carregar_modelo
+from reload_extensions import EXTENSIONS_CONF_PATH, render_extensions_conf
+from reload_queues import QUEUES_CONF_PATH, render_queues_conf
+from reload_sip import SIP_CONF, render_sip_conf
+
+# Comando de reload de cada arquivo gerado
+RELOADS = {
+    EXTENSIONS_CONF_PATH: "dialplan reload",
+    QUEUES_CONF_PATH: "queue reload all",
+    SIP_CONF: "sip reload",
+}
+
+
+def _log(msg):
+    print(f"[aplicar_config] {msg}", file=sys.stderr)
+
+
+def _hash_arquivo(caminho):
+    try:
+        with open(caminho, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _gravar(caminho, conteudo):
+    """
+    Grava o arquivo só se o conteúdo mudou, de forma atômica (tmp + rename),
+    mantendo dono e permissões do arquivo anterior.
+    Retorna True se gravou, False se não mudou e None em caso de erro.
+    """
+    dados = conteudo.encode()
+    if hashlib.sha256(dados).hexdigest() == _hash_arquivo(caminho):
+        return False
+    tmp = f"{caminho}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            st = os.stat(caminho)
+            os.chown(tmp, st.st_uid, st.st_gid)
+            os.chmod(tmp, st.st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, caminho)
+        return True
+    except OSError as e:
+        _log(f"ERRO ao escrever {caminho}: {e}")
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return None
+
+
+def recarregar(comandos):
+    """Executa os reloads no Asterisk; retorna True se todos deram certo."""
+    ok = True
+    for comando in comandos:
+        try:
+            asterisk_cli.rx(comando, timeout=30)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            _log(f"ERRO ao executar '{comando}': {e}")
+            ok = False
+    return ok
+
+
+def aplicar():
+    """
+    Gera os três arquivos, grava os alterados e recarrega só o necessário.
+    Retorna ({etapa: segundos}, [arquivos alterados], ok).
+    """
+    tempos = {}
+
+    def etapa(nome, funcao, *args):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        tempos[nome] = time.perf_counter() - inicio
+        return resultado
+
+    modulos = etapa("licenca", lambda: get_modulos().lower().split(","))
+    modelo = etapa("modelo", carregar_modelo)
+
+    arquivos = [
+        (EXTENSIONS_CONF_PATH, etapa("extensions", render_extensions_conf, modelo, "record" in modulos)),
+        (QUEUES_CONF_PATH, etapa("queues", render_queues_conf, modelo)),
+        (SIP_CONF, etapa("sip", render_sip_conf, modelo, "video" in modulos)),
+    ]
+    resultados = etapa("gravacao", lambda: [(c, _gravar(c, conteudo)) for c, conteudo in arquivos])
+    alterados = [c for c, r in resultados if r]
+    ok = all(r is not None for _, r in resultados)
+    if alterados:
+        ok = etapa("reload", recarregar, [RELOADS[c] for c in alterados]) and ok
+    return tempos, alterados, ok
+
+
+def main():
+    inicio = time.perf_counter()
+    try:
+        migrar()
+    except Exception as e:
+        _log(f"erro ao migrar o banco: {e}")
+        return 1
+    tempos, alterados, ok = aplicar()
+    etapas = ", ".join(f"{nome} {t * 1000:.1f}ms" for nome, t in tempos.items())
+    if alterados:
+        _log(f"alterados: {', '.join(os.path.basename(c) for c in alterados)}")
+    else:
+        _log("nenhum arquivo mudou, Asterisk não foi recarregado")
+    _log(f"{etapas}; total {(time.perf_counter() - inicio) * 1000:.1f}ms")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
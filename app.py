@@ -1,6 +1,8 @@
 from flask import Flask, render_template, redirect, url_for, request, session
-from database import init_db
+from database import init_db, fechar_db, DB_PATH
+from migracoes import migrar
 import os
+import subprocess
 import licenca
 
 # ----- Importa Blueprints -----
@@ -20,6 +22,10 @@ from blueprints.painelweb import painelweb_bp
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "chave_super_secreta_para_desenvolvimento")
 
+# Atrás de um proxy com X-Sendfile (Apache mod_xsendfile / lighttpd), as gravações
+# são entregues pelo próprio servidor web, sem passar o arquivo pelo Python
+app.config["USE_X_SENDFILE"] = os.environ.get("NANOSIP_X_SENDFILE") == "1"
+
 
 # ========================================================
 # ⚙️ Registro dos Blueprints
@@ -42,6 +48,10 @@ for bp_name, bp in BLUEPRINT_MAP.items():
         app.register_blueprint(bp)
 
 
+# Uma conexão ao banco por requisição (database.get_db), fechada ao final
+app.teardown_appcontext(fechar_db)
+
+
 # ========================================================
 # 🔐 Contexto Global (para uso no template base.html)
 # ========================================================
@@ -62,21 +72,31 @@ def inject_license_status():
 # ========================================================
 
 def initialize_database():
-    db_path = "/opt/nanosip/nanosip.db"
-    if not os.path.exists(db_path):
+    if not os.path.exists(DB_PATH):
         print("📀 Banco de dados não encontrado. Criando...")
         with app.app_context():
             init_db()
         print("✅ Banco criado com sucesso.")
     else:
         print("📂 Banco já existe. Pulando criação.")
+    migrar()
 
 
 # ========================================================
 # 🚀 Execução Principal
 # ========================================================
 
+def instalar_usuario_ami():
+    """Após uma atualização, garante o usuário AMI do painel no manager.conf (em segundo plano)."""
+    try:
+        subprocess.Popen(["sudo", "systemctl", "start", "nanosip-admin@install_ami.service"],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        print(f"⚠️ Não foi possível instalar o usuário AMI: {e}")
+
+
 if __name__ == "__main__":
     initialize_database()
+    instalar_usuario_ami()
     app.run(host="0.0.0.0", port=80, debug=True)
 
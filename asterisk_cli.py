@@ -0,0 +1,17 @@
+# /opt/nanosip/asterisk_cli.py
+"""
+Comandos no console do Asterisk ('asterisk -rx').
+
+Um único caminho para todos os módulos. O app e os scripts rodam como root
+(nanosip.service, nanosip-admin@.service, cron), então não há sudo: ele
+poderia pedir senha ou falhar fora do sudoers.
+"""
+import subprocess
+
+ASTERISK_BIN = "/usr/sbin/asterisk"
+
+
+def rx(comando, timeout=10):
+    """Executa 'asterisk -rx comando'; levanta CalledProcessError, TimeoutExpired ou OSError."""
+    subprocess.run([ASTERISK_BIN, "-rx", comando], check=True, timeout=timeout,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# bench/bench_config.py
+"""
+Benchmark da geração de configuração (reload_extensions.py, reload_queues.py,
+reload_sip.py e aplicar_config.py) em bancos sintéticos de vários tamanhos.
+
+Para cada escala cria um nanosip.db temporário, roda cada gerador gravando
+em um diretório temporário e mede tempo (mediana), pico de memória
+(tracemalloc), consultas SQL e tamanho da saída. Os resultados vão para um
+JSON; com --comparar, mostra a variação em relação a uma execução anterior.
+
+    python3 bench/bench_config.py --json bench_config.json
+    python3 bench/bench_config.py --escalas pequena,media --comparar bench_config.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+
+# ramais, filas, membros por fila, rotas, horários por rota
+ESCALAS = {
+    "pequena": (100, 10, 20, 50, 2),
+    "media": (1000, 100, 50, 300, 3),
+    "grande": (10000, 300, 200, 1000, 3),
+}
+
+
+def _revisao():
+    try:
+        return subprocess.check_output(["git", "-C", BASE_DIR, "rev-parse", "--short", "HEAD"],
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def medir(funcao, contador, saidas, repeticoes):
+    """Executa o gerador, descartando o que ele imprime, e coleta as métricas."""
+    tempos = []
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+
+    contador.conexoes = contador.consultas = 0
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ms": round(statistics.median(tempos) * 1000, 2),
+        "ms_min": round(min(tempos) * 1000, 2),
+        "pico_memoria_kb": round(pico / 1024),
+        "consultas": contador.consultas,
+        "conexoes": contador.conexoes,
+        "bytes_saida": sum(os.path.getsize(s) for s in saidas),
+    }
+
+
+def rodar_escala(nome, parametros, repeticoes, tmp, modulos):
+    import database
+    from bench_modelo import Contador, popular
+
+    get_db = database.get_db
+    pasta = os.path.join(tmp, nome)
+    os.makedirs(pasta)
+    database.DB_PATH = os.path.join(pasta, "nanosip.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
+    db = database.get_db()
+    popular(db, *parametros)
+    db.close()
+
+    import modelo_config
+    import reload_extensions
+    import reload_queues
+    import reload_sip
+    import aplicar_config
+
+    # Módulos da licença fixos: o benchmark não depende da licença da máquina
+    for modulo in (reload_extensions, reload_sip, aplicar_config):
+        modulo.get_modulos = lambda: modulos
+
+    contador = Contador(get_db)
+    database.get_db = modelo_config.get_db = contador
+
+    ext, queues, sip = (os.path.join(pasta, n) for n in ("extensions.conf", "queues.conf", "sip.conf"))
+    reload_extensions.EXTENSIONS_CONF_PATH = ext
+    reload_queues.QUEUES_CONF_PATH = queues
+    reload_sip.SIP_CONF = sip
+    aplicar_config.EXTENSIONS_CONF_PATH, aplicar_config.QUEUES_CONF_PATH, aplicar_config.SIP_CONF = ext, queues, sip
+    aplicar_config.RELOADS = {ext: "dialplan reload", queues: "queue reload all", sip: "sip reload"}
+    aplicar_config.ASTERISK_BIN = shutil.which("true") or "/bin/true"
+
+    def aplicar_completo():
+        # Sem os arquivos no disco, toda execução grava os três e "recarrega"
+        for caminho in (ext, queues, sip):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+        aplicar_config.aplicar()
+
+    geradores = {
+        "extensions": (reload_extensions.generate_extensions_conf, [ext]),
+        "queues": (reload_queues.generate_queues_conf, [queues]),
+        "sip": (reload_sip.gerar_sip_conf, [sip]),
+        "aplicar_config": (aplicar_completo, [ext, queues, sip]),
+        "aplicar_config_sem_mudanca": (aplicar_config.aplicar, [ext, queues, sip]),
+    }
+    resultados = {}
+    print(f"\n[{nome}] ramais={parametros[0]} filas={parametros[1]} membros/fila={parametros[2]} "
+          f"rotas={parametros[3]} horarios/rota={parametros[4]}")
+    for rotulo, (funcao, saidas) in geradores.items():
+        r = medir(funcao, contador, saidas, repeticoes)
+        resultados[rotulo] = r
+        print(f"  {rotulo:<28} {r['ms']:>9.2f}ms {r['pico_memoria_kb']:>8}KB "
+              f"{r['consultas']:>5} consultas {r['bytes_saida']:>10} bytes")
+    database.get_db = modelo_config.get_db = get_db
+    return resultados
+
+
+def comparar(anterior, atual):
+    print("\nVariação de tempo em relação à execução anterior:")
+    for escala, geradores in atual.items():
+        for rotulo, r in geradores.items():
+            antes = anterior.get(escala, {}).get(rotulo)
+            if antes and antes["ms"]:
+                variacao = (r["ms"] - antes["ms"]) / antes["ms"]
+                print(f"  {escala:<8} {rotulo:<28} {antes['ms']:>9.2f}ms -> {r['ms']:>9.2f}ms ({variacao:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da geração de configuração do Asterisk")
+    parser.add_argument("--escalas", default=",".join(ESCALAS), help=f"dentre {', '.join(ESCALAS)}")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--modulos", default="record,video", help="módulos da licença simulados")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    escalas = [e.strip() for e in args.escalas.split(",") if e.strip()]
+    desconhecidas = [e for e in escalas if e not in ESCALAS]
+    if desconhecidas:
+        parser.error(f"escala(s) desconhecida(s): {', '.join(desconhecidas)}")
+
+    sys.path.insert(0, BASE_DIR)
+    sys.path.insert(0, BENCH_DIR)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="nanosip-config-") as tmp:
+        for escala in escalas:
+            resultados[escala] = rodar_escala(escala, ESCALAS[escala], args.repeticoes, tmp, args.modulos)
+
+    if args.comparar:
+        try:
+            with open(args.comparar) as f:
+                comparar(json.load(f)["resultados"], resultados)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Não foi possível comparar com {args.comparar}: {e}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "revisao": _revisao(),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "modulos": args.modulos,
+                "escalas": {e: dict(zip(("ramais", "filas", "membros_por_fila", "rotas", "horarios_por_rota"),
+                                        ESCALAS[e])) for e in escalas},
+                "resultados": resultados,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# bench/bench_dialplan.py
+"""
+Benchmark do dialplan das rotas de entrada: geração antiga (um GotoIfTime
+e um bloco completo por dia) contra o compilador atual (dias agrupados,
+um bloco por condição de horário, gravação em Gosub). Compara tamanho,
+prioridades por rota e GotoIfTime avaliados por chamada. Exemplo:
+
+    python3 bench/bench_dialplan.py --rotas 500 --json bench_output.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+
+ESCALAS_DIAS = ["mon,tue,wed,thu,fri", "mon,tue,wed,thu,fri,sat", "sat", "sat,sun", "mon,wed,fri"]
+
+
+def gerar_rotas(total, horarios_por_rota):
+    random.seed(42)
+    rotas = []
+    for i in range(total):
+        tcs = [{"days": random.choice(ESCALAS_DIAS), "time_start": f"{8 + j * 4:02d}:00",
+                "time_end": f"{12 + j * 4:02d}:00", "fila_if_time": 900 + j}
+               for j in range(random.randint(1, horarios_por_rota))]
+        rotas.append({"nome": f"Rota {i:04d}", "numero_entrada": f"4830{i:04d}",
+                      "fila_else": 800 + i % 50, "time_conditions": tcs})
+    return rotas
+
+
+def rota_legado(route, gravar_chamadas):
+    """Rota de entrada como era gerada antes do compilador (mesmo texto, incluindo o rótulo)."""
+    exten = route['numero_entrada']
+    gravar = [f"exten => {exten},n,Set(UNIQUEID_SAFE=${{CUT(UNIQUEID,.,1)}})",
+              f"exten => {exten},n,Set(ARQUIVO=${{CALLERID(num)}}-${{EXTEN}}-${{UNIQUEID_SAFE}})",
+              f"exten => {exten},n,MixMonitor(${{ARQUIVO}}.wav,b)"] if gravar_chamadas else []
+    parar = [f"exten => {exten},n,StopMixMonitor()"] if gravar_chamadas else []
+    linhas = [f"\n; Rota: {route['nome']}",
+              f"exten => {exten},1,NoOp(### Rota de Entrada: {route['nome']} para o numero {exten} ###)"]
+    if not route['time_conditions']:
+        if route['fila_else']:
+            linhas += gravar + [f"exten => {exten},n,Queue({route['fila_else']})"] + parar
+        return linhas + [f"exten => {exten},n,Hangup()"]
+    for tc in route['time_conditions']:
+        days = [d.strip() for d in tc['days'].split(',') if d.strip()]
+        timestart = tc['time_start'].replace(':', '-')
+        for day in days:
+            linhas.append(f"exten => {exten},n,GotoIfTime({tc['time_start']}-{tc['time_end']},{day},*,*?time-{day}-{timestart})")
+        if route['fila_else']:
+            linhas += gravar + [f"exten => {exten},n,Queue({route['fila_else']}) ; Rota fora do horario"] + parar
+        linhas.append(f"exten => {exten},n,Hangup()")
+        for day in days:
+            linhas.append(f"exten => {exten},n(time-{day}-{timestart})")
+            linhas += gravar + ([f"exten => {exten},n,Answer()"] if gravar_chamadas else [])
+            linhas += [f"exten => {exten},n,Queue({tc['fila_if_time']}) ; Rota dentro do horario"] + parar
+            linhas.append(f"exten => {exten},n,Hangup()")
+    return linhas
+
+
+def medir(rotulo, compilar, rotas, gravar, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        por_rota = [compilar(r, gravar) for r in rotas]
+    duracao = (time.perf_counter() - inicio) / repeticoes
+
+    prioridades = [sum(1 for l in linhas if l.startswith(("exten =>", " same =>"))) for linhas in por_rota]
+    gotoiftime = [sum(1 for l in linhas if "GotoIfTime(" in l) for linhas in por_rota]
+    texto = "\n".join(l for linhas in por_rota for l in linhas)
+    resultado = {
+        "ms": round(duracao * 1000, 2),
+        "bytes": len(texto.encode()),
+        "prioridades": sum(prioridades),
+        "prioridades_max_rota": max(prioridades),
+        "gotoiftime_max_por_chamada": max(gotoiftime),
+    }
+    print(f"{rotulo:<12} {resultado['ms']:>8.2f}ms {resultado['bytes']:>10} bytes "
+          f"{resultado['prioridades']:>7} prioridades (máx. {resultado['prioridades_max_rota']}/rota, "
+          f"{resultado['gotoiftime_max_por_chamada']} GotoIfTime/chamada)")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do dialplan das rotas de entrada")
+    parser.add_argument("--rotas", type=int, default=500)
+    parser.add_argument("--horarios-por-rota", type=int, default=3, help="máximo; sorteado de 1 a N")
+    parser.add_argument("--sem-gravacao", action="store_true")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BASE_DIR)
+    from reload_extensions import compilar_rota
+
+    rotas = gerar_rotas(args.rotas, args.horarios_por_rota)
+    gravar = not args.sem_gravacao
+    resultados = {
+        "legado": medir("legado", rota_legado, rotas, gravar, args.repeticoes),
+        "compilador": medir("compilador", compilar_rota, rotas, gravar, args.repeticoes),
+    }
+    print(f"redução: {1 - resultados['compilador']['bytes'] / resultados['legado']['bytes']:.0%} em bytes, "
+          f"{1 - resultados['compilador']['prioridades'] / resultados['legado']['prioridades']:.0%} em prioridades")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# bench/bench_http.py
+"""
+Benchmark de latência HTTP das páginas do NanoSip sem um PABX real.
+
+Sobe a aplicação Flask em um servidor local, com:
+  - 'asterisk' e 'sudo' falsos no PATH (fake_asterisk.py);
+  - um system_manager.sh falso para 'get_network_info';
+  - um servidor AMI falso (fake_ami.py) alimentando o painel;
+  - um banco temporário com os mesmos ramais dos peers falsos.
+
+Dispara clientes concorrentes contra cada endpoint e informa p50/p95/p99
+e vazão. Exemplo:
+
+    python3 bench/bench_http.py --peers 2000 --canais 300 --clientes 10 \
+        --requisicoes 300 --json bench_output.json
+"""
+import argparse
+import http.client
+import json
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+
+ENDPOINTS_PADRAO = ["/", "/painel", "/api/ramais", "/config/rede", "/licenca"]
+
+
+def _script(caminho, conteudo):
+    with open(caminho, "w") as f:
+        f.write(conteudo)
+    os.chmod(caminho, os.stat(caminho).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def preparar_ambiente(tmp, peers, canais):
+    """Cria os executáveis falsos e ajusta o ambiente antes de importar o app."""
+    bin_dir = os.path.join(tmp, "bin")
+    os.makedirs(bin_dir)
+    _script(os.path.join(bin_dir, "asterisk"),
+            f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(BENCH_DIR, "fake_asterisk.py")}" "$@"\n')
+    _script(os.path.join(bin_dir, "sudo"), '#!/bin/sh\nexec "$@"\n')
+
+    system_manager = os.path.join(tmp, "system_manager.sh")
+    rede = {"iface": "eth0", "gateway": "10.0.0.1", "ip_atual": "10.0.0.2", "netmask": "255.255.255.0"}
+    _script(system_manager, f"#!/bin/sh\n[ \"$1\" = get_network_info ] && echo '{json.dumps(rede)}'\nexit 0\n")
+
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    os.environ["NANOSIP_FAKE_PEERS"] = str(peers)
+    os.environ["NANOSIP_FAKE_CANAIS"] = str(canais)
+    return system_manager
+
+
+def popular_banco(database, peers, filas):
+    import fake_asterisk
+
+    database.init_db()
+    db = database.get_db()
+    ramais = [(fake_asterisk.PRIMEIRO_RAMAL + i, f"Ramal {i}", "senha123") for i in range(peers)]
+    db.executemany("INSERT INTO ramais (ramal, nome, senha) VALUES (?, ?, ?)", ramais)
+    for i in range(filas):
+        cursor = db.execute("INSERT INTO filas (fila, nome) VALUES (?, ?)", (500 + i, f"Fila {i}"))
+        fila_id = cursor.lastrowid
+        db.executemany(
+            "INSERT INTO ramal_fila (ramal_id, fila_id) SELECT id, ? FROM ramais WHERE id % ? = ?",
+            [(fila_id, filas, i)]
+        )
+    db.commit()
+    db.close()
+
+
+def iniciar_app(tmp, system_manager, peers, filas, eventos_por_segundo):
+    sys.path.insert(0, BASE_DIR)
+    from fake_ami import ServidorAMIFalso
+
+    ami_falso = ServidorAMIFalso(eventos_por_segundo=eventos_por_segundo).iniciar()
+    os.environ["NANOSIP_AMI_PORT"] = str(ami_falso.port)
+
+    import database
+    database.DB_PATH = os.path.join(tmp, "nanosip.db")
+    popular_banco(database, peers, filas)
+
+    import app as nanosip_app
+    from blueprints import rede
+    rede.SYSTEM_MANAGER = system_manager
+
+    from werkzeug.serving import make_server
+    servidor = make_server("127.0.0.1", 0, nanosip_app.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def requisitar(porta, metodo, caminho, cookie=None, corpo=None):
+    conn = http.client.HTTPConnection("127.0.0.1", porta, timeout=60)
+    cabecalhos = {}
+    if cookie:
+        cabecalhos["Cookie"] = cookie
+    if corpo is not None:
+        cabecalhos["Content-Type"] = "application/x-www-form-urlencoded"
+    inicio = time.perf_counter()
+    conn.request(metodo, caminho, body=corpo, headers=cabecalhos)
+    resposta = conn.getresponse()
+    resposta.read()
+    duracao = time.perf_counter() - inicio
+    conn.close()
+    return resposta, duracao
+
+
+def login(porta):
+    resposta, _ = requisitar(porta, "POST", "/login",
+                             corpo=urlencode({"username": "admin", "password": "nanosip"}))
+    cookie = resposta.getheader("Set-Cookie", "")
+    return cookie.split(";", 1)[0]
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100.0 * len(valores))) - 1))
+    return valores[indice]
+
+
+def medir(porta, caminho, cookie, clientes, requisicoes, aquecimento=3):
+    for _ in range(aquecimento):
+        requisitar(porta, "GET", caminho, cookie)
+
+    latencias, erros = [], 0
+    trava = threading.Lock()
+    por_cliente = max(1, requisicoes // clientes)
+
+    def cliente():
+        nonlocal erros
+        locais, falhas = [], 0
+        for _ in range(por_cliente):
+            try:
+                resposta, duracao = requisitar(porta, "GET", caminho, cookie)
+                locais.append(duracao)
+                if resposta.status >= 400:
+                    falhas += 1
+            except (OSError, http.client.HTTPException):
+                falhas += 1
+        with trava:
+            latencias.extend(locais)
+            erros += falhas
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as pool:
+        for _ in range(clientes):
+            pool.submit(cliente)
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "endpoint": caminho,
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+        "max_ms": round((latencias[-1] if latencias else 0) * 1000, 2),
+        "req_s": round(len(latencias) / total, 1) if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTTP do NanoSip com Asterisk falso")
+    parser.add_argument("--peers", type=int, default=2000)
+    parser.add_argument("--canais", type=int, default=300)
+    parser.add_argument("--filas", type=int, default=20)
+    parser.add_argument("--clientes", type=int, default=10)
+    parser.add_argument("--requisicoes", type=int, default=200, help="requisições por endpoint")
+    parser.add_argument("--eventos-ami", type=float, default=20, help="eventos AMI por segundo")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS_PADRAO)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCH_DIR)
+    with tempfile.TemporaryDirectory(prefix="nanosip-bench-") as tmp:
+        system_manager = preparar_ambiente(tmp, args.peers, args.canais)
+        servidor = iniciar_app(tmp, system_manager, args.peers, args.filas, args.eventos_ami)
+        porta = servidor.server_port
+        cookie = login(porta)
+        time.sleep(1)  # deixa o cliente AMI concluir a sincronização inicial
+
+        resultados = []
+        print(f"{'endpoint':<16} {'reqs':>6} {'erros':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'req/s':>8}")
+        for caminho in args.endpoints:
+            r = medir(porta, caminho, cookie, args.clientes, args.requisicoes)
+            resultados.append(r)
+            print(f"{r['endpoint']:<16} {r['requisicoes']:>6} {r['erros']:>6} {r['p50_ms']:>7}ms "
+                  f"{r['p95_ms']:>7}ms {r['p99_ms']:>7}ms {r['max_ms']:>7}ms {r['req_s']:>8}")
+        servidor.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "parametros": vars(args),
+                "resultados": resultados,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# bench/bench_modelo.py
+"""
+Benchmark da leitura da configuração: consultas N+1 (como eram feitas pelos
+geradores e por get_filas/get_routes) contra o carregamento em conjunto do
+modelo_config. Conta consultas e conexões abertas e mede o tempo. Exemplo:
+
+    python3 bench/bench_modelo.py --ramais 5000 --rotas 500 --json bench_output.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+
+
+def popular(db, ramais, filas, membros_por_fila, rotas, horarios_por_rota):
+    random.seed(42)
+    db.executemany("INSERT INTO ramais (ramal, nome, senha, contexto) VALUES (?, ?, ?, 'interno')",
+                   [(1000 + i, f"Ramal {i}", f"s{i:06d}") for i in range(ramais)])
+    db.executemany("INSERT INTO filas (fila, nome) VALUES (?, ?)",
+                   [(800 + i, f"Fila {i}") for i in range(filas)])
+    db.executemany("INSERT OR IGNORE INTO ramal_fila (ramal_id, fila_id) VALUES (?, ?)",
+                   [(random.randint(1, ramais), f) for f in range(1, filas + 1)
+                    for _ in range(membros_por_fila)])
+    db.executemany("INSERT INTO rotas (nome, numero_entrada, dest_fila_else) VALUES (?, ?, ?)",
+                   [(f"Rota {i:04d}", f"4830{i:04d}", random.randint(1, filas)) for i in range(rotas)])
+    db.executemany(
+        "INSERT INTO time_conditions (rota_id, time_start, time_end, days, dest_fila_if_time) VALUES (?, ?, ?, ?, ?)",
+        [(r, "08:00", "18:00", "mon,tue,wed,thu,fri", random.randint(1, filas))
+         for r in range(1, rotas + 1) for _ in range(horarios_por_rota)])
+    db.commit()
+
+
+# --- Leitura antiga (N+1), reproduzida para comparação ---
+
+def legado_geradores(get_db):
+    """Consultas feitas por reload_extensions, reload_queues e reload_sip antes do modelo."""
+    db = get_db()
+    db.execute("SELECT ramal FROM ramais ORDER BY ramal").fetchall()
+    db.execute("SELECT fila FROM filas ORDER BY fila").fetchall()
+    for r in db.execute("SELECT * FROM rotas ORDER BY nome").fetchall():
+        if r["dest_fila_else"]:
+            db.execute("SELECT fila FROM filas WHERE id = ?", (r["dest_fila_else"],)).fetchone()
+        for tc in db.execute("SELECT * FROM time_conditions WHERE rota_id = ?", (r["id"],)).fetchall():
+            db.execute("SELECT fila FROM filas WHERE id = ?", (tc["dest_fila_if_time"],)).fetchone()
+    db.close()
+
+    db = get_db()
+    filas = db.execute("SELECT id, fila, nome FROM filas").fetchall()
+    db.close()
+    for f in filas:
+        db = get_db()
+        db.execute("""SELECT r.ramal FROM ramais r JOIN ramal_fila rf ON r.id = rf.ramal_id
+                      WHERE rf.fila_id = ?""", (f["id"],)).fetchall()
+        db.close()
+
+    for sql in ("SELECT id, localnet, nome FROM localnets",
+                "SELECT id, ramal, nome, senha, contexto FROM ramais order by ramal"):
+        db = get_db()
+        db.execute(sql).fetchall()
+        db.close()
+
+
+def legado_telas(get_db):
+    """get_filas() + get_routes(include_time_conditions=True) antes do modelo."""
+    db = get_db()
+    for f in db.execute("SELECT id, fila, nome FROM filas order by fila").fetchall():
+        db.execute("SELECT ramal_id FROM ramal_fila WHERE fila_id = ?", (f["id"],)).fetchall()
+    db.close()
+    db = get_db()
+    for r in db.execute("SELECT id, nome, numero_entrada, dest_fila_else FROM rotas").fetchall():
+        db.execute("""SELECT id, time_start, time_end, days, dest_fila_if_time
+                      FROM time_conditions WHERE rota_id = ?""", (r[0],)).fetchall()
+    db.close()
+
+
+class Contador:
+    """Envolve get_db contando chamadas (conexões, antes da conexão compartilhada) e comandos SQL."""
+
+    def __init__(self, get_db):
+        self._get_db = get_db
+        self.conexoes = self.consultas = 0
+
+    def __call__(self):
+        conn = self._get_db()
+        self.conexoes += 1
+        conn.set_trace_callback(self._contar)
+        return conn
+
+    def _contar(self, sql):
+        self.consultas += 1
+
+
+def medir(rotulo, funcao, contador, repeticoes):
+    contador.conexoes = contador.consultas = 0
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    duracao = (time.perf_counter() - inicio) / repeticoes
+    resultado = {"ms": round(duracao * 1000, 2),
+                 "consultas": contador.consultas // repeticoes,
+                 "conexoes": contador.conexoes // repeticoes}
+    print(f"{rotulo:<34} {resultado['ms']:>9.2f}ms {resultado['consultas']:>7} consultas "
+          f"{resultado['conexoes']:>5} conexões")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do carregamento do modelo de configuração")
+    parser.add_argument("--ramais", type=int, default=5000)
+    parser.add_argument("--filas", type=int, default=100)
+    parser.add_argument("--membros-por-fila", type=int, default=20)
+    parser.add_argument("--rotas", type=int, default=500)
+    parser.add_argument("--horarios-por-rota", type=int, default=3)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BASE_DIR)
+    import database
+
+    with tempfile.TemporaryDirectory(prefix="nanosip-modelo-") as tmp:
+        database.DB_PATH = os.path.join(tmp, "nanosip.db")
+        database.init_db()
+        db = database.get_db()
+        popular(db, args.ramais, args.filas, args.membros_por_fila, args.rotas, args.horarios_por_rota)
+        db.close()
+
+        contador = Contador(database.get_db)
+        database.get_db = contador
+        import modelo_config
+        modelo_config.get_db = contador
+        from reload_extensions import render_extensions_conf
+        from reload_queues import render_queues_conf
+        from reload_sip import render_sip_conf
+
+        def novo_geradores():
+            modelo = modelo_config.carregar_modelo()
+            render_extensions_conf(modelo, True)
+            render_queues_conf(modelo)
+            render_sip_conf(modelo)
+
+        def novo_telas():
+            database.get_filas()
+            database.get_routes(include_time_conditions=True)
+
+        n = args.repeticoes
+        resultados = {
+            "geradores_legado": medir("geradores (N+1, só leitura)", lambda: legado_geradores(contador), contador, n),
+            "geradores_modelo": medir("geradores (modelo + render)", novo_geradores, contador, n),
+            "carregar_modelo": medir("carregar_modelo", modelo_config.carregar_modelo, contador, n),
+            "telas_legado": medir("get_filas + get_routes (N+1)", lambda: legado_telas(contador), contador, n),
+            "telas_modelo": medir("get_filas + get_routes (modelo)", novo_telas, contador, n),
+        }
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parametros": vars(args), "sqlite": sqlite3.sqlite_version,
+                       "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
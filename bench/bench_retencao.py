@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# bench/bench_retencao.py
+"""
+Benchmark da retenção de gravações (retencao.py) em um diretório sintético.
+
+Cria N arquivos .wav vazios com mtimes espalhados pelos últimos dias e
+tamanhos aparentes (arquivos esparsos), mede a listagem, a simulação
+(--dry-run) e a remoção real por idade e por cota. Exemplo:
+
+    python3 bench/bench_retencao.py --arquivos 500000 --dias 30 --json bench_output.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+
+
+def criar_arquivos(diretorio, total, dias, tamanho_medio):
+    agora = time.time()
+    for i in range(total):
+        nome = os.path.join(diretorio, f"{100 + i % 500}-{200 + i % 50}-{1700000000 + i}.wav")
+        with open(nome, "wb") as f:
+            f.truncate(tamanho_medio // 2 + (i * 7919) % tamanho_medio)
+        mtime = agora - (i / total) * dias * 86400
+        os.utime(nome, (mtime, mtime))
+
+
+def medir(rotulo, funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"{rotulo:<28} {duracao:>8.2f}s")
+    return duracao, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da retenção de gravações")
+    parser.add_argument("--arquivos", type=int, default=500000)
+    parser.add_argument("--dias", type=int, default=30, help="idade da gravação mais antiga")
+    parser.add_argument("--tamanho-medio", type=int, default=960000, help="bytes (~1 min de WAV 8kHz)")
+    parser.add_argument("--retencao-dias", type=int, default=7)
+    parser.add_argument("--cota-gb", type=float, default=0, help="0 = metade do que sobrar após a idade")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BASE_DIR)
+    import retencao
+
+    retencao.RETENCAO_DIAS = args.retencao_dias
+    retencao.RETENCAO_LIVRE_PCT = 0
+    retencao.PAUSA_LOTE = 0
+
+    with tempfile.TemporaryDirectory(prefix="nanosip-retencao-") as tmp:
+        print(f"Criando {args.arquivos} arquivos em {tmp}...")
+        criar_arquivos(tmp, args.arquivos, args.dias, args.tamanho_medio)
+
+        t_listar, arquivos = medir("listar (scandir + stat)", lambda: retencao.listar(tmp))
+        if not args.cota_gb:
+            limite = time.time() - args.retencao_dias * 86400
+            uso_restante = sum(a[1] for a in arquivos if a[0] >= limite)
+            args.cota_gb = uso_restante / 2 / 1024 ** 3
+        retencao.RETENCAO_MAX_GB = args.cota_gb
+
+        t_status, status = medir("status", lambda: retencao.calcular_status(arquivos, tmp))
+        t_simulacao, simulacao = medir("dry-run", lambda: retencao.aplicar(tmp, dry_run=True))
+        t_aplicar, execucao = medir("aplicar (remoção real)", lambda: retencao.aplicar(tmp))
+        restantes = len(os.listdir(tmp))
+
+    removidos = execucao["removidos_idade"] + execucao["removidos_cota"]
+    print(f"removidos: {execucao['removidos_idade']} por idade, {execucao['removidos_cota']} por cota; "
+          f"restantes: {restantes}; {removidos / t_aplicar:.0f} remoções/s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "parametros": vars(args),
+                "resultados": {
+                    "listar_s": round(t_listar, 3),
+                    "status_s": round(t_status, 3),
+                    "dry_run_s": round(t_simulacao, 3),
+                    "aplicar_s": round(t_aplicar, 3),
+                    "removidos_idade": execucao["removidos_idade"],
+                    "removidos_cota": execucao["removidos_cota"],
+                    "simulacao_confere": (simulacao["removidos_idade"], simulacao["removidos_cota"]) ==
+                                         (execucao["removidos_idade"], execucao["removidos_cota"]),
+                    "restantes": restantes,
+                    "status_inicial": status,
+                },
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
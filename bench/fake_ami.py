@@ -0,0 +1,134 @@
+# bench/fake_ami.py
+"""
+Servidor AMI falso, local, para exercitar o ami.py sem Asterisk.
+
+Aceita qualquer login (ou só a senha informada em 'segredo'), responde SIPpeers / CoreShowChannels / QueueStatus
+com os mesmos dados do fake_asterisk.py e, opcionalmente, emite eventos
+PeerStatus/Newchannel/Hangup contínuos para simular um PABX em uso.
+"""
+import random
+import socket
+import threading
+import time
+
+from fake_asterisk import gerar_peers, gerar_canais
+
+
+class ServidorAMIFalso:
+    def __init__(self, host="127.0.0.1", port=0, eventos_por_segundo=0, segredo=None):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(8)
+        self.host, self.port = self._sock.getsockname()
+        self.eventos_por_segundo = eventos_por_segundo
+        self.segredo = segredo
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        threading.Thread(target=self._aceitar, name="fake-ami", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self._sock.close()
+
+    def _aceitar(self):
+        while not self._parar.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._sessao, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _mensagem(**campos):
+        return ("\r\n".join(f"{k}: {v}" for k, v in campos.items()) + "\r\n\r\n").encode()
+
+    def _ler_acao(self, arquivo):
+        msg = {}
+        for linha in arquivo:
+            linha = linha.decode(errors="replace").rstrip("\r\n")
+            if not linha:
+                if msg:
+                    return msg
+                continue
+            chave, _, valor = linha.partition(":")
+            msg[chave.strip()] = valor.strip()
+        return None
+
+    def _responder(self, enviar, acao):
+        nome, action_id = acao.get("Action", ""), acao.get("ActionID", "")
+        if nome == "Login" and self.segredo is not None and acao.get("Secret") != self.segredo:
+            enviar(self._mensagem(Response="Error", ActionID=action_id, Message="Authentication failed"))
+            return False
+        if nome == "Login":
+            enviar(self._mensagem(Response="Success", ActionID=action_id,
+                                  Message="Authentication accepted"))
+        elif nome == "SIPpeers":
+            enviar(self._mensagem(Response="Success", ActionID=action_id, EventList="start"))
+            bloco = b"".join(
+                self._mensagem(Event="PeerEntry", ActionID=action_id, Channeltype="SIP",
+                               ObjectName=ramal, IPaddress=ip or "-none-", IPport=porta, Status=status)
+                for ramal, ip, porta, status in gerar_peers()
+            )
+            enviar(bloco + self._mensagem(Event="PeerlistComplete", ActionID=action_id))
+        elif nome == "CoreShowChannels":
+            enviar(self._mensagem(Response="Success", ActionID=action_id, EventList="start"))
+            bloco = b"".join(
+                self._mensagem(Event="CoreShowChannel", ActionID=action_id, Channel=canal,
+                               Uniqueid=f"{linkedid}{'' if exten != 's' else '1'}", Linkedid=linkedid,
+                               CallerIDNum=callerid, Exten=exten, ChannelStateDesc="Up",
+                               Duration=f"{d // 3600:02d}:{d % 3600 // 60:02d}:{d % 60:02d}")
+                for canal, exten, callerid, d, linkedid in gerar_canais()
+            )
+            enviar(bloco + self._mensagem(Event="CoreShowChannelsComplete", ActionID=action_id))
+        else:
+            enviar(self._mensagem(Response="Success", ActionID=action_id))
+
+    def _emitir_eventos(self, enviar):
+        peers = [p[0] for p in gerar_peers()]
+        sequencia = 0
+        while not self._parar.is_set() and self.eventos_por_segundo:
+            time.sleep(1.0 / self.eventos_por_segundo)
+            sequencia += 1
+            ramal = random.choice(peers)
+            uniqueid = f"1800000000.{sequencia}"
+            if sequencia % 3 == 0:
+                msg = self._mensagem(Event="PeerStatus", Peer=f"SIP/{ramal}",
+                                     PeerStatus=random.choice(["Reachable", "Unreachable"]),
+                                     Address=f"10.9.0.{sequencia % 250 + 1}:5060", Time=sequencia % 50)
+            elif sequencia % 3 == 1:
+                msg = self._mensagem(Event="Newchannel", Channel=f"SIP/{ramal}-{sequencia:08x}",
+                                     Uniqueid=uniqueid, Linkedid=uniqueid, CallerIDNum=ramal,
+                                     Exten=random.choice(peers), ChannelStateDesc="Ring")
+            else:
+                msg = self._mensagem(Event="Hangup", Uniqueid=f"1800000000.{sequencia - 1}")
+            try:
+                enviar(msg)
+            except OSError:
+                return
+
+    def _sessao(self, conn):
+        trava = threading.Lock()
+
+        def enviar(dados):
+            # Respostas e eventos saem de threads diferentes: não podem se intercalar
+            with trava:
+                conn.sendall(dados)
+
+        enviar(b"Asterisk Call Manager/5.0.1\r\n")
+        arquivo = conn.makefile("rb")
+        try:
+            while not self._parar.is_set():
+                acao = self._ler_acao(arquivo)
+                if acao is None:
+                    return
+                if self._responder(enviar, acao) is False:
+                    return
+                if acao.get("Action") == "Login":
+                    threading.Thread(target=self._emitir_eventos, args=(enviar,), daemon=True).start()
+        except OSError:
+            pass
+        finally:
+            conn.close()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# bench/fake_asterisk.py
+"""
+Substituto do executável 'asterisk' para benchmarks e testes sem PABX.
+
+Responde a 'asterisk -V' e 'asterisk -rx <comando>' com saídas no mesmo
+formato do Asterisk 18 / chan_sip. O tamanho é configurável por ambiente:
+
+    NANOSIP_FAKE_PEERS   quantidade de peers SIP (padrão 2000)
+    NANOSIP_FAKE_CANAIS  quantidade de canais ativos (padrão 300)
+    NANOSIP_FAKE_PRIMEIRO_RAMAL  número do primeiro ramal (padrão 1000)
+
+Também usado como gerador de dados pelo fake_ami.py.
+"""
+import os
+import sys
+
+PEERS = int(os.environ.get("NANOSIP_FAKE_PEERS", "2000"))
+CANAIS = int(os.environ.get("NANOSIP_FAKE_CANAIS", "300"))
+PRIMEIRO_RAMAL = int(os.environ.get("NANOSIP_FAKE_PRIMEIRO_RAMAL", "1000"))
+
+
+def gerar_peers(total=PEERS):
+    """(ramal, ip, porta, status) — ~80% online, o resto offline/inalcançável."""
+    peers = []
+    for i in range(total):
+        ramal = str(PRIMEIRO_RAMAL + i)
+        if i % 10 in (8, 9):
+            peers.append((ramal, None, 0, "UNKNOWN" if i % 10 == 8 else "UNREACHABLE"))
+        else:
+            ip = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255 or 1}"
+            peers.append((ramal, ip, 5060, f"OK ({1 + i % 40} ms)"))
+    return peers
+
+
+def gerar_canais(total=CANAIS, peers=PEERS):
+    """(canal, exten, callerid, duracao_seg, linkedid) — pares de canais por chamada."""
+    canais = []
+    for i in range(total):
+        chamada = i // 2
+        origem = str(PRIMEIRO_RAMAL + (chamada * 2) % max(peers, 1))
+        destino = str(PRIMEIRO_RAMAL + (chamada * 2 + 1) % max(peers, 1))
+        linkedid = f"1700000000.{chamada}"
+        if i % 2 == 0:
+            canais.append((f"SIP/{origem}-{i:08x}", destino, origem, 10 + chamada % 600, linkedid))
+        else:
+            canais.append((f"SIP/{destino}-{i:08x}", "s", destino, 10 + chamada % 600, linkedid))
+    return canais
+
+
+def _hms(segundos):
+    return f"{segundos // 3600:02d}:{(segundos % 3600) // 60:02d}:{segundos % 60:02d}"
+
+
+def sip_show_peers():
+    linhas = [f"{'Name/username':<25} {'Host':<39} {'Dyn':<3} {'Forcerport':<10} {'Comedia':<10} "
+              f"{'ACL':<3} {'Port':<8} {'Status':<11} Description"]
+    online = 0
+    peers = gerar_peers()
+    for ramal, ip, porta, status in peers:
+        online += status.startswith("OK")
+        linhas.append(f"{ramal + '/' + ramal:<25} {ip or '(Unspecified)':<39} {'D':<3} {'Auto (No)':<10} "
+                      f"{'No':<10} {'':<3} {porta:<8} {status:<11}")
+    linhas.append(f"{len(peers)} sip peers [Monitored: {online} online, {len(peers) - online} offline "
+                  f"Unmonitored: 0 online, 0 offline]")
+    return "\n".join(linhas)
+
+
+def core_show_channels_verbose():
+    linhas = [f"{'Channel':<20} {'Context':<20} {'Extension':<16} {'Prio':>4} {'State':<7} "
+              f"{'Application':<12} {'Data':<25} {'CallerID':<15} {'Duration':<8} "
+              f"{'Accountcode':<11} {'PeerAccount':<11} BridgeID"]
+    canais = gerar_canais()
+    for canal, exten, callerid, duracao, linkedid in canais:
+        aplicacao, dados = ("Dial", f"SIP/{exten},20,Ttr") if exten != "s" else ("AppDial", "(Outgoing Line)")
+        linhas.append(f"{canal:<20} {'interno':<20} {exten:<16} {1:>4} {'Up':<7} {aplicacao:<12} "
+                      f"{dados:<25} {callerid:<15} {_hms(duracao):<8} {'':<11} {'':<11} {linkedid}")
+    linhas.append(f"{len(canais)} active channels")
+    linhas.append(f"{len(canais) // 2} active calls")
+    linhas.append(f"{len(canais) * 10} calls processed")
+    return "\n".join(linhas)
+
+
+COMANDOS = {
+    "sip show peers": sip_show_peers,
+    "core show channels verbose": core_show_channels_verbose,
+}
+
+
+def main(argv):
+    if argv[1:2] == ["-V"]:
+        print("Asterisk 18.22.0")
+        return 0
+    if len(argv) >= 3 and argv[1] == "-rx":
+        gerador = COMANDOS.get(argv[2].strip())
+        if gerador:
+            print(gerador())
+        return 0
+    print("Uso: fake_asterisk.py -V | -rx <comando>", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
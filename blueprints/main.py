@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 import subprocess
+from agendador_apply import get_agendador, solicitar_apply
 from system_info import get_system_info
 from auth import login_required
 import licenca as lic  # módulo de funções de licença
@@ -148,14 +149,16 @@ def reload():
     """
     Aplica novamente as configurações do sistema.
     """
-    try:
-        subprocess.run(
-            ["/usr/bin/systemctl", "start", "nanosip-admin@apply_config.service"],
-            check=True
-        )
-        flash("Configurações aplicadas com sucesso!", "success")
-    except Exception as e:
-        flash(f"Erro ao aplicar configurações", "danger")
+    # Pedido explícito do usuário: não espera a janela de agrupamento
+    solicitar_apply(imediato=True)
+    flash("Configurações sendo aplicadas em segundo plano.", "info")
 
     return redirect(url_for("main.index"))
 
+
+@main_bp.route("/api/config/apply")
+@login_required
+def status_apply():
+    """Situação da fila de aplicação (pendente, executando, último erro)."""
+    return jsonify(get_agendador().status())
+
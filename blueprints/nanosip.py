@@ -1,8 +1,11 @@
 # /opt/nanosip/blueprints/nanosip.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, flash, Response
 from auth import login_required
-from database import get_ramais, get_filas, get_localnets, get_db
+from database import get_ramais, get_filas, get_localnets, get_db, unidade_de_trabalho
 from .main import license_context, license_message
+from agendador_apply import solicitar_apply
+from ramais_csv import importar_ramais, exportar_ramais, MAX_ERROS_EXIBIDOS
 from cadastro import (
     adicionar_ramal, atualizar_ramal, remover_ramal,
     adicionar_fila, atualizar_fila, remover_fila,
@@ -78,6 +81,48 @@ def excluir_ramal():
         flash("Nenhum ramal selecionado para exclusão.", "warning")
     return redirect(url_for("nanosip.cadastro_ramal"))
 
+# ----------------------------
+# Importação / exportação de ramais em CSV
+# ----------------------------
+@nanosip_bp.route("/ramal/importar", methods=["POST"])
+@login_required
+def importar_ramais_csv():
+    arquivo = request.files.get("arquivo")
+    if not arquivo or not arquivo.filename:
+        flash("Selecione um arquivo CSV para importar.", "warning")
+        return redirect(url_for("nanosip.cadastro_ramal"))
+
+    try:
+        conteudo = arquivo.read()
+        try:
+            texto = conteudo.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            texto = conteudo.decode("latin-1")  # CSV salvo pelo Excel
+
+        success, msg, erros = importar_ramais(texto, atualizar=bool(request.form.get("atualizar")))
+        flash(msg, "success" if success else "danger")
+        for erro in erros[:MAX_ERROS_EXIBIDOS]:
+            flash(erro, "danger")
+        if len(erros) > MAX_ERROS_EXIBIDOS:
+            flash(f"... e mais {len(erros) - MAX_ERROS_EXIBIDOS} erro(s).", "danger")
+        if success:
+            solicitar_apply()
+            flash("Configurações do Asterisk serão aplicadas em segundo plano.", "info")
+    except Exception as e:
+        flash(f"Erro ao importar ramais: {str(e)}", "danger")
+
+    return redirect(url_for("nanosip.cadastro_ramal"))
+
+@nanosip_bp.route("/ramal/exportar")
+@login_required
+def exportar_ramais_csv():
+    nome = f"ramais_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(
+        exportar_ramais(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={nome}"}
+    )
+
 # ----------------------------
 # Cadastro / edição de filas
 # ----------------------------
@@ -91,32 +136,32 @@ def cadastro_fila():
             nome = request.form["nome"]
             ramais_selecionados_ids = request.form.getlist("ramais")
 
-            if fila_id:
-                # Edição de fila existente
-                success, msg = atualizar_fila(fila_id, nome)
-                if success:
-                    desassociar_todos_ramais_da_fila(fila_id)
-                    for ramal_id in ramais_selecionados_ids:
-                        associar_ramal_fila(ramal_id, fila_id)
-                    flash("Fila atualizada com sucesso!", "success")
-                else:
-                    flash(f"Erro ao atualizar fila: {msg}", "danger")
-            else:
-                # Criação de nova fila
-                success, msg = adicionar_fila(fila_num, nome)
-                if success:
-                    db = get_db()
-                    fila_row = db.execute("SELECT id FROM filas WHERE fila = ?", (fila_num,)).fetchone()
-                    db.close()
-                    if fila_row:
-                        new_fila_id = fila_row['id']
+            # Fila e associações confirmadas em um único commit
+            with unidade_de_trabalho() as db:
+                if fila_id:
+                    # Edição de fila existente
+                    success, msg = atualizar_fila(fila_id, nome)
+                    if success:
+                        desassociar_todos_ramais_da_fila(fila_id)
                         for ramal_id in ramais_selecionados_ids:
-                            associar_ramal_fila(ramal_id, new_fila_id)
-                        flash("Fila criada e ramais associados com sucesso!", "success")
+                            associar_ramal_fila(ramal_id, fila_id)
+                        flash("Fila atualizada com sucesso!", "success")
                     else:
-                        flash("Fila criada, mas não foi possível recuperar o ID para associar ramais.", "warning")
+                        flash(f"Erro ao atualizar fila: {msg}", "danger")
                 else:
-                    flash(f"Erro ao adicionar fila: {msg}", "danger")
+                    # Criação de nova fila
+                    success, msg = adicionar_fila(fila_num, nome)
+                    if success:
+                        fila_row = db.execute("SELECT id FROM filas WHERE fila = ?", (fila_num,)).fetchone()
+                        if fila_row:
+                            new_fila_id = fila_row['id']
+                            for ramal_id in ramais_selecionados_ids:
+                                associar_ramal_fila(ramal_id, new_fila_id)
+                            flash("Fila criada e ramais associados com sucesso!", "success")
+                        else:
+                            flash("Fila criada, mas não foi possível recuperar o ID para associar ramais.", "warning")
+                    else:
+                        flash(f"Erro ao adicionar fila: {msg}", "danger")
 
         except ValueError:
             flash("O número da fila deve ser um valor numérico.", "danger")
@@ -1,117 +1,62 @@
-from flask import Blueprint, render_template, jsonify, flash
-import subprocess, re, sqlite3, os
+from flask import Blueprint, render_template, jsonify, flash, request, Response, stream_with_context
+import os, json
+import database
+from ami import get_estado
+from painel_estado import PainelEventos, CacheSnapshot
+from queue_log import get_tailer, JANELA, SLA_SEGUNDOS
+from modelo_config import carregar_filas
 
 painelweb_bp = Blueprint("painelweb", __name__)
 
-DB_PATH = "/opt/nanosip/nanosip.db"
 DEBUG = False
 
+SSE_HEARTBEAT = 15      # segundos entre comentários de keep-alive
+SSE_RETRY_MS = 3000     # intervalo de reconexão sugerido ao navegador
+
+eventos = PainelEventos()
+
 
 def coletar_chamadas():
-    try:
-        output = subprocess.check_output(
-            ["asterisk", "-rx", "core show channels verbose"],
-            text=True, stderr=subprocess.STDOUT
-        )
-        output = "\n".join(line for line in output.splitlines() if "AppDial" not in line)
-    except subprocess.CalledProcessError as e:
-        if DEBUG:
-            flash(f"[PainelWeb] Erro ao executar 'core show channels': {e.output}", "danger")
-        return []
-
-    chamadas = []
-    for linha in output.splitlines():
-        if not linha.strip() or linha.startswith("Channel") or "active" in linha.lower():
-            continue
-        partes = re.split(r'\s{2,}', linha.strip())
-        if len(partes) < 7:
-            continue
-        origem = partes[2] if len(partes) > 2 else "-"
-        destino = partes[6] if len(partes) > 6 else "-"
-        duracao = partes[7] if len(partes) > 7 else "-"
-        chamadas.append({"origem": origem, "destino": destino, "duracao": duracao})
-    return chamadas
-
-
-def coletar_ramais():
+    """Chamadas ativas, lidas do modelo mantido pelo cliente AMI."""
+    return get_estado().chamadas()
+
+
+def _conectar_db():
+    if not os.path.exists(database.DB_PATH):
+        return None
+    return database.get_db()
+
+
+def coletar_ramais(chamadas=None, conn=None):
     # 1️⃣ Busca nomes e números de ramais no banco
     ramais_db = {}
-    if os.path.exists(DB_PATH):
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            for r in cursor.execute("SELECT ramal, nome FROM ramais"):
+    fechar = conn is None
+    try:
+        conn = conn or _conectar_db()
+        if conn:
+            for r in conn.execute("SELECT ramal, nome FROM ramais"):
                 ramais_db[str(r[0])] = r[1]
+    except Exception as e:
+        if DEBUG:
+            flash(f"[PainelWeb] Erro ao ler DB: {e}", "danger")
+    finally:
+        if fechar and conn:
             conn.close()
-        except Exception as e:
-            if DEBUG:
-                flash(f"[PainelWeb] Erro ao ler DB: {e}", "danger")
 
-    # 2️⃣ Busca chamadas ativas (para saber quais ramais estão ocupados)
-    chamadas = coletar_chamadas()
+    # 2️⃣ Chamadas ativas (para saber quais ramais estão ocupados);
+    #    reaproveita a lista já coletada no mesmo snapshot, se houver
+    if chamadas is None:
+        chamadas = coletar_chamadas()
     ramais_em_chamada = set()
     for c in chamadas:
+        ramais_em_chamada.update(c["ramais"])
         if c["origem"].isdigit():
             ramais_em_chamada.add(c["origem"])
         if c["destino"].isdigit():
             ramais_em_chamada.add(c["destino"])
 
-    # 3️⃣ Busca status atual de todos os peers do Asterisk
-    try:
-        output = subprocess.check_output(
-            ["asterisk", "-rx", "sip show peers"],
-            text=True, stderr=subprocess.STDOUT
-        )
-    except subprocess.CalledProcessError as e:
-        if DEBUG:
-            flash(f"[PainelWeb] Erro ao executar 'sip show peers': {e.output}", "danger")
-        output = ""
-
-    padrao = re.compile(
-        r'^(?P<name>\S+?)/\S+\s+'
-        r'(?P<ip>(?:\d{1,3}\.){3}\d{1,3}|\(Unspecified\))\s+'
-        r'(?:\S+\s+){2,}?'
-        r'(?P<port>\d+)\s+'
-        r'(?P<status>.*)$', re.IGNORECASE
-    )
-
-    status_asterisk = {}
-    for linha in output.splitlines():
-        linha = linha.strip()
-        if not linha or linha.lower().startswith("name/username") or "peer" in linha.lower():
-            continue
-        m = padrao.match(linha)
-        if not m:
-            continue
-
-        ramal = m.group("name").strip()
-        ip = m.group("ip").strip()
-        status_txt = m.group("status").strip().upper()
-        latencia = "-"
-        status = "offline"
-        cor = "gray"
-
-        if ip.upper() != "(UNSPECIFIED)" and ip != "":
-            if "OK" in status_txt:
-                status = "online"
-                cor = "green"
-                mlat = re.search(r'\(([^)]+)\)', status_txt)
-                if mlat:
-                    latencia = mlat.group(1)
-            elif any(x in status_txt for x in ["UNREACHABLE", "LAGGED", "UNKNOWN"]):
-                status = "offline"
-                cor = "gray"
-        else:
-            ip = "offline"
-            status = "offline"
-            cor = "gray"
-
-        status_asterisk[ramal] = {
-            "ip": ip,
-            "status": status,
-            "cor": cor,
-            "latencia": latencia
-        }
+    # 3️⃣ Status atual de todos os peers, mantido pelos eventos AMI
+    status_asterisk = get_estado().status_peers()
 
     # 4️⃣ Combina dados do banco + status do Asterisk
     ramais = []
@@ -119,12 +64,11 @@ def coletar_ramais():
         dados_ast = status_asterisk.get(ramal, {
             "ip": "offline",
             "status": "offline",
-            "cor": "gray",
             "latencia": "-"
         })
 
         status = dados_ast["status"]
-        cor = dados_ast["cor"]
+        cor = "green" if status == "online" else "gray"
         if ramal in ramais_em_chamada:
             status = "ocupado"
             cor = "red"
@@ -142,31 +86,44 @@ def coletar_ramais():
     return ramais
 
 
-def coletar_filas():
+def coletar_filas(conn=None):
     filas = []
-    if not os.path.exists(DB_PATH):
-        return filas
-
+    fechar = conn is None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, fila, nome FROM filas")
-        filas_data = cursor.fetchall()
-
-        for f_id, fila_num, nome in filas_data:
-            cursor.execute("""
-                SELECT ramais.ramal, ramais.nome
-                FROM ramal_fila
-                JOIN ramais ON ramais.id = ramal_fila.ramal_id
-                WHERE ramal_fila.fila_id = ?
-            """, (f_id,))
-            ramais_fila = [{"ramal": str(r[0]), "nome": r[1]} for r in cursor.fetchall()]
-            filas.append({"fila": str(fila_num), "nome": nome, "ramais": ramais_fila})
-
-        conn.close()
+        conn = conn or _conectar_db()
+        if not conn:
+            return filas
+
+        # Filas e membros cadastrados em duas consultas (modelo_config)
+        filas_db = carregar_filas(conn)
+        nomes_ramais = {m["ramal"]: m["nome"] for f in filas_db for m in f["membros"]}
+        filas_ami = get_estado().filas_ativas()
+        estatisticas = get_tailer().estatisticas()
+
+        for fila_db in filas_db:
+            fila_num, nome = fila_db["fila"], fila_db["nome"]
+            fila_ami = filas_ami.get(str(fila_num))
+            if fila_ami is not None:
+                # Membros e status vindos do Asterisk (QueueMember*)
+                ramais_fila = [
+                    {"ramal": ramal, "nome": nomes_ramais.get(ramal, ramal),
+                     "status": m["status"], "pausado": m["pausado"]}
+                    for ramal, m in sorted(fila_ami["membros"].items())
+                ]
+                aguardando = fila_ami["aguardando"]
+            else:
+                # Fila ainda não carregada no Asterisk: usa o cadastro do banco
+                ramais_fila = [{"ramal": m["ramal"], "nome": m["nome"]} for m in fila_db["membros"]]
+                aguardando = 0
+            filas.append({"fila": str(fila_num), "nome": nome, "ramais": ramais_fila,
+                          "aguardando": aguardando,
+                          "estatisticas": estatisticas.get(str(fila_num))})
     except Exception as e:
         if DEBUG:
             flash(f"[PainelWeb] Erro ao coletar filas: {e}", "danger")
+    finally:
+        if fechar and conn:
+            conn.close()
 
     return filas
 
@@ -176,14 +133,131 @@ def painel():
     return render_template("painelweb.html")
 
 
+def coletar_painel():
+    """Coleta completa do painel: uma conexão ao banco e uma lista de chamadas."""
+    chamadas = coletar_chamadas()
+    conn = _conectar_db()
+    try:
+        return {
+            "ramais": coletar_ramais(chamadas, conn),
+            "filas": coletar_filas(conn),
+            "chamadas": chamadas
+        }
+    finally:
+        if conn:
+            conn.close()
+
+
+def coletar_painel_versionado():
+    """Coleta o painel e registra a coleta no diário de versões."""
+    dados = coletar_painel()
+    dados["versao"] = eventos.atualizar(dados)
+    return dados
+
+
+# Snapshot compartilhado por todas as requisições do processo
+cache_painel = CacheSnapshot(coletar_painel_versionado)
+
+
 @painelweb_bp.route("/api/ramais")
 def api_ramais():
-    dados = {
-        "ramais": coletar_ramais(),
-        "filas": coletar_filas(),
-        "chamadas": coletar_chamadas()
-    }
+    """
+    Estado do painel com versão.
+    - ETag/If-None-Match: estado inalterado responde 304 sem corpo.
+    - ?since=<versao>: apenas ramais, filas e chamadas alterados desde a
+      versão informada, indexados por chave (null = removido). Se a versão
+      já saiu do histórico, o estado completo é enviado com "completo": true.
+    """
+    dados = cache_painel.obter()
+    since = request.args.get("since", "")
+
+    if since.isdigit():
+        versao, mudancas = eventos.delta(int(since))
+        if mudancas is None:
+            versao, mudancas = eventos.snapshot()
+            resposta = jsonify(versao=versao, completo=True, **mudancas)
+        else:
+            resposta = jsonify(versao=versao, desde=int(since), **mudancas)
+    else:
+        versao = dados["versao"]
+        resposta = jsonify(dados)
+
     if DEBUG:
         print(dados)
-    return jsonify(dados)
+    # ETag fraca: 'duracao' muda a cada segundo sem alterar a versão do estado
+    resposta.set_etag(f"painel-{versao}", weak=True)
+    resposta.headers["Cache-Control"] = "no-cache"
+    return resposta.make_conditional(request)
+
+
+@painelweb_bp.route("/api/ramais/metricas")
+def api_ramais_metricas():
+    """Contadores do cache do painel (hits, misses, tempo de coleta) para ajuste do TTL."""
+    return jsonify(cache_painel.metricas())
+
+
+@painelweb_bp.route("/api/filas/estatisticas")
+def api_filas_estatisticas():
+    """Estatísticas das filas na janela atual, lidas do queue_log."""
+    return jsonify(
+        janela=JANELA,
+        sla_segundos=SLA_SEGUNDOS,
+        filas=get_tailer().estatisticas()
+    )
+
+
+def _evento_sse(evento, dados, versao):
+    return f"id: {versao}\nevent: {evento}\ndata: {json.dumps(dados, separators=(',', ':'))}\n\n"
+
+
+@painelweb_bp.route("/api/ramais/stream")
+def api_ramais_stream():
+    """
+    Fluxo Server-Sent Events do painel.
+    Envia um 'snapshot' inicial e depois apenas 'mudancas' (ramal, fila ou
+    chamada alterada/removida). Com o cabeçalho Last-Event-ID o cliente
+    retoma de onde parou, se a versão ainda estiver no histórico.
+    """
+    if eventos.versao == 0:
+        cache_painel.obter()
+    eventos.iniciar_publicador(lambda: cache_painel.obter(ttl=0), get_estado())
+
+    ultimo = request.headers.get("Last-Event-ID", "")
+
+    def gerar():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+
+        versao = None
+        if ultimo.isdigit():
+            pendentes = eventos.mudancas_desde(int(ultimo))
+            if pendentes is not None:
+                versao = int(ultimo)
+                for v, mudancas in pendentes:
+                    yield _evento_sse("mudancas", mudancas, v)
+                    versao = v
+
+        if versao is None:
+            versao, estado = eventos.snapshot()
+            yield _evento_sse("snapshot", estado, versao)
+
+        while True:
+            if eventos.aguardar(versao, SSE_HEARTBEAT) == versao:
+                yield ": heartbeat\n\n"
+                continue
+
+            pendentes = eventos.mudancas_desde(versao)
+            if pendentes is None:
+                # Cliente ficou para trás do histórico: reenvia o estado completo
+                versao, estado = eventos.snapshot()
+                yield _evento_sse("snapshot", estado, versao)
+                continue
+            for v, mudancas in pendentes:
+                yield _evento_sse("mudancas", mudancas, v)
+                versao = v
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
@@ -10,6 +10,8 @@ from auth import login_required
 
 rede_bp = Blueprint("rede", __name__, template_folder="../templates")
 
+SYSTEM_MANAGER = "/opt/nanosip/system_manager.sh"
+
 def get_dns_servers():
     """Lê os servidores DNS do /etc/resolv.conf."""
     dns_servers = []
@@ -37,7 +39,7 @@ def carrega_config_atual():
     }
 
     try:
-        script_path = "/opt/nanosip/system_manager.sh"
+        script_path = SYSTEM_MANAGER
         task_name = "get_network_info"
 
         # --- MUDANÇA PRINCIPAL: CAPTURAR TUDO ---
@@ -1,110 +1,62 @@
 import csv
+import io
+import json
 import os
-import glob
+from datetime import datetime, timedelta
 from werkzeug.utils import safe_join
-from flask import abort, send_from_directory, Blueprint, render_template, request, url_for, flash
-from datetime import datetime
+from flask import abort, send_file, Blueprint, render_template, request, url_for, flash, Response, jsonify
 from licenca import get_modulos
 from .main import license_message, license_context
 from auth import login_required
+import cdr
+import cdr_csv
+import gravacoes
+import retencao
+from gravacoes import MONITOR_DIR
 
 relatorios_bp = Blueprint("relatorios", __name__, template_folder="../templates")
 
-CSV_DIR = "/var/log/asterisk/cdr-csv"
-CSV_FILE_PATTERN = os.path.join(CSV_DIR, "Master.csv*")
-MONITOR_DIR = "/var/spool/asterisk/monitor"
-MAX_FILES = 7
-
-
-def parse_cdr():
-    """Lê e processa os arquivos CSV do CDR do Asterisk."""
-    registros = []
-
-    arquivos = sorted(
-        glob.glob(CSV_FILE_PATTERN),
-        key=os.path.getmtime,
-        reverse=True
-    )[:MAX_FILES]
-
-    for arquivo in arquivos:
-        if not os.path.isfile(arquivo):
-            flash(f"Arquivo {arquivo} não encontrado.", "warning")
-            continue
-
-        try:
-            with open(arquivo, newline="", encoding="utf-8") as f:
-                reader = list(csv.reader(f))
-                for row in reversed(reader):
-                    if not row or len(row) < 17:
-                        continue
-
-                    try:
-                        dt = datetime.strptime(row[9], "%Y-%m-%d %H:%M:%S")
-                        calldate_br = dt.strftime("%d/%m/%Y %H:%M:%S")
-                    except Exception:
-                        calldate_br = row[9]
-
-                    uniqueid = row[16]
-                    duration = row[12]
-                    billsec = row[13]
-                    disposition = row[14].strip().upper() if len(row) > 14 else "UNKNOWN"
-
-                    # Arquivo de gravação
-                    grava_file = os.path.join(MONITOR_DIR, f"{uniqueid}.wav")
-                    recording = grava_file if os.path.isfile(grava_file) else None
-
-                    # Mapeamento de status
-                    status_map = {
-                        "ANSWERED": "Atendida",
-                        "BUSY": "Ocupado",
-                        "FAILED": "Falha",
-                        "NO ANSWER": "Não atendida",
-                        "CANCEL": "Cancelada",
-                        "CONGESTION": "Congestionada"
-                    }
-
-                    # Chamadas com 0s não são realmente atendidas
-                    if disposition == "ANSWERED" and billsec == "0":
-                        disposition = "NO ANSWER"
-
-                    registros.append({
-                        "calldate": calldate_br,
-                        "src": row[1],
-                        "dst": row[2],
-                        "clid": row[4],
-                        "lastapp": row[7],
-                        "lastdata": row[8],
-                        "duration": duration,
-                        "billsec": billsec,
-                        "disposition": status_map.get(disposition, disposition.capitalize()),
-                        "uniqueid": uniqueid,
-                        "recording": recording
-                    })
-
-        except Exception as e:
-            flash(f"Erro ao processar {arquivo}: {e}", "danger")
-
-    return registros
+POR_PAGINA = 20
+LOTE_EXPORTACAO = 1000  # linhas por fetchmany/bloco enviado
 
+CAMPOS_EXPORTACAO = ["calldate", "src", "dst", "clid", "lastapp", "lastdata",
+                     "duration", "billsec", "disposition", "uniqueid"]
 
-@relatorios_bp.route("/relatorios")
-@login_required
-def relatorio_cdr():
-    """Página de relatórios CDR com paginação e links de gravação."""
-    page = int(request.args.get("page", 1))
-    per_page = 20
 
-    registros = parse_cdr()
-    total = len(registros)
-    total_pages = max((total // per_page) + (1 if total % per_page else 0), 1)
+def _buscar_no_banco(filtros, contar):
+    conn = cdr.get_cdr_db()
+    try:
+        rows, anterior, proximo = cdr.buscar(
+            conn, filtros,
+            apos=request.args.get("apos"),
+            antes=request.args.get("antes"),
+            limite=POR_PAGINA
+        )
+        # Contagem só quando pedida: evita varrer todo o intervalo a cada busca
+        total = cdr.contar(conn, filtros) if contar else None
+    finally:
+        conn.close()
+    return rows, anterior, proximo, total
 
-    if page < 1 or page > total_pages:
-        flash("Página inexistente, mostrando primeira página.", "warning")
-        page = 1
 
-    start = (page - 1) * per_page
-    end = start + per_page
-    registros_paginados = registros[start:end]
+@relatorios_bp.route("/relatorios")
+@login_required
+def relatorio_cdr():
+    """Página de relatórios CDR com filtros, paginação por cursor e links de gravação."""
+    filtros = cdr.ler_filtros(request.args)
+    contar = request.args.get("contar") == "1"
+
+    if cdr.CDR_FONTE == "csv":
+        rows, anterior, proximo = cdr_csv.buscar(
+            filtros,
+            apos=request.args.get("apos"),
+            antes=request.args.get("antes"),
+            limite=POR_PAGINA
+        )
+        total = cdr_csv.contar(filtros) if contar else None
+    else:
+        rows, anterior, proximo, total = _buscar_no_banco(filtros, contar)
+    registros_paginados = [cdr.formatar_registro(r) for r in rows]
 
     # Verifica módulo RECORD
     modulos_raw = get_modulos() or ''
@@ -112,34 +64,168 @@ def relatorio_cdr():
     has_record = 'record' in MODULOS
 
     if has_record:
+        catalogo = gravacoes.get_catalogo()
         for r in registros_paginados:
-            uniqueid_safe = r['uniqueid'].split('.')[0]
-            filename = f"{r['src']}-{r['dst']}-{uniqueid_safe}.wav"
-            full_path = os.path.join(MONITOR_DIR, filename)
-
-            if os.path.isfile(full_path) and os.path.getsize(full_path) > 44:
-                r['recording'] = url_for('relatorios.recordings', filename=filename)
+            gravacao = catalogo.procurar(r['src'], r['dst'], r['uniqueid'])
+            if gravacao and gravacao['tamanho'] > gravacoes.CABECALHO_WAV:
+                r['recording'] = url_for('relatorios.recordings', filename=gravacao['nome'])
+                r['recording_duracao'] = gravacao['duracao']
             else:
                 r['recording'] = None
 
     return render_template(
         "relatorio_cdr.html",
         registros=registros_paginados,
-        page=page,
-        total_pages=total_pages,
+        filtros=filtros,
+        anterior=anterior,
+        proximo=proximo,
+        total=total,
+        status_map=cdr.STATUS_MAP,
         has_record=has_record,
         LICENSE_VALID=license_context(),
         LICENSE_MSG=license_message()
     )
 
 
+def _gerar_exportacao(filtros, formato):
+    """Gera a exportação em blocos: memória constante, qualquer que seja o intervalo."""
+    conn = cdr.get_cdr_db()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        if formato == "csv":
+            writer.writerow(CAMPOS_EXPORTACAO)
+
+        for i, row in enumerate(cdr.iterar(conn, filtros, LOTE_EXPORTACAO), 1):
+            r = cdr.formatar_registro(row)
+            if formato == "csv":
+                writer.writerow([r[c] for c in CAMPOS_EXPORTACAO])
+            else:
+                buffer.write(json.dumps({c: r[c] for c in CAMPOS_EXPORTACAO}, ensure_ascii=False) + "\n")
+            if i % LOTE_EXPORTACAO == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        conn.close()
+
+
+@relatorios_bp.route("/relatorios/exportar")
+@login_required
+def exportar_cdr():
+    """Exporta o CDR filtrado em CSV (padrão) ou NDJSON, por streaming."""
+    formato = request.args.get("formato", "csv").lower()
+    if formato not in ("csv", "ndjson"):
+        abort(400)
+
+    filtros = cdr.ler_filtros(request.args)
+    nome = f"cdr_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    mimetype = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return Response(
+        _gerar_exportacao(filtros, formato),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={nome}"}
+    )
+
+
+def montar_resumo(granularidade, dimensao, inicio, fim):
+    """Agrupa as linhas do resumo em séries por valor da dimensão, prontas para gráfico."""
+    conn = cdr.get_cdr_db()
+    try:
+        rows = cdr.consultar_resumo(conn, granularidade, dimensao, inicio, fim)
+    finally:
+        conn.close()
+
+    periodos = sorted({r["periodo"] for r in rows})
+    posicao = {p: i for i, p in enumerate(periodos)}
+    series, totais = {}, {}
+    for r in rows:
+        valor = cdr.STATUS_MAP.get(r["valor"], r["valor"]) if dimensao == "disposicao" else r["valor"]
+        serie = series.setdefault(valor, [0] * len(periodos))
+        serie[posicao[r["periodo"]]] += r["chamadas"]
+        total = totais.setdefault(valor, {"chamadas": 0, "atendidas": 0, "falado": 0, "duracao": 0})
+        for campo in total:
+            total[campo] += r[campo]
+    return {
+        "granularidade": granularidade,
+        "dimensao": dimensao,
+        "inicio": inicio,
+        "fim": fim,
+        "periodos": periodos,
+        "series": series,
+        "totais": totais,
+    }
+
+
+def _parametros_resumo(args):
+    granularidade = args.get("granularidade", "dia")
+    dimensao = args.get("dimensao", "disposicao")
+    if granularidade not in cdr.TABELAS_RESUMO or dimensao not in cdr.DIMENSOES:
+        abort(400)
+    hoje = datetime.now().date()
+    padrao = hoje - timedelta(days=30 if granularidade == "dia" else 0)
+    inicio = args.get("de") or padrao.isoformat()
+    fim = args.get("ate") or hoje.isoformat()
+    # 'fim' é inclusivo: cobre todas as horas do último dia
+    return granularidade, dimensao, inicio, f"{fim} 23"
+
+
+@relatorios_bp.route("/relatorios/resumo")
+@login_required
+def resumo_cdr():
+    """Painel de resumo (volume, atendidas e tempo falado) lido só dos rollups."""
+    granularidade, dimensao, inicio, fim = _parametros_resumo(request.args)
+    return render_template(
+        "relatorio_resumo.html",
+        resumo=montar_resumo(granularidade, dimensao, inicio, fim),
+        dimensoes=cdr.DIMENSOES,
+        de=inicio[:10],
+        ate=fim[:10],
+        LICENSE_VALID=license_context(),
+        LICENSE_MSG=license_message()
+    )
+
+
+@relatorios_bp.route("/api/relatorios/resumo")
+@login_required
+def api_resumo_cdr():
+    return jsonify(montar_resumo(*_parametros_resumo(request.args)))
+
+
+@relatorios_bp.route("/api/gravacoes/retencao")
+@login_required
+def api_retencao():
+    """Uso do diretório de gravações e projeção de dias até encher (última execução da retenção)."""
+    status = retencao.ler_status()
+    if status is None:
+        return jsonify({"erro": "Retenção ainda não executada."}), 404
+    return jsonify(status)
+
+
 @relatorios_bp.route("/recordings/<path:filename>")
 @login_required
 def recordings(filename):
-    """Rota para download/reprodução de gravações."""
+    """
+    Rota para download/reprodução de gravações.
+    Atende Range (206) e requisições condicionais (If-None-Match / If-Modified-Since),
+    para o player buscar só o trecho necessário ao avançar no áudio.
+    """
     path = safe_join(MONITOR_DIR, filename)
-    if not os.path.isfile(path):
+    if path is None or gravacoes.get_catalogo().info(filename) is None:
         flash(f"Arquivo de gravação {filename} não encontrado.", "warning")
         abort(404)
-    return send_from_directory(MONITOR_DIR, filename)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        abort(404)
+
+    # ETag forte: muda se o arquivo for substituído (inode), crescer ou for reescrito
+    return send_file(
+        path,
+        mimetype="audio/wav",
+        conditional=True,
+        etag=f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}",
+        last_modified=st.st_mtime
+    )
 
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 import subprocess
 from auth import login_required
 from database import get_db, get_routes, get_filas
+from agendador_apply import solicitar_apply
 from functools import wraps
 from datetime import datetime
 from .main import license_message,license_context
@@ -85,17 +86,11 @@ def config_rotas():
 
             db.commit()
 
-            try:
-                subprocess.run(
-                    ["sudo", "systemctl", "start", "nanosip-admin@apply_config.service"],
-                    check=True,
-                )
-                flash("Configurações do Asterisk sendo aplicadas em segundo plano.", "info")
-            except Exception as e:
-
-                flash(f"Rota salva, mas falha ao recarregar o Asterisk: {e}", "warning")
+            solicitar_apply()
+            flash("Configurações do Asterisk serão aplicadas em segundo plano.", "info")
 
         except Exception as e:
+            db.desfazer()
             flash(f"Erro ao salvar a rota: {str(e)}", "danger")
         finally:
             db.close()
@@ -121,15 +116,10 @@ def excluir_rota():
             db.execute("DELETE FROM rotas WHERE id = ?", (route_id,))
             db.commit()
             flash("Rota excluída com sucesso!", "success")
-            try:
-                subprocess.run(
-                    ["sudo", "systemctl", "start", "nanosip-admin@apply_config.service"],
-                    check=True,
-                )
-                flash("Configurações do Asterisk sendo aplicadas em segundo plano.", "info")
-            except Exception as e:
-                flash(f"Rota excluída, mas falha ao recarregar o Asterisk: {e}", "warning")
+            solicitar_apply()
+            flash("Configurações do Asterisk serão aplicadas em segundo plano.", "info")
         except Exception as e:
+            db.desfazer()
             flash(f"Erro ao excluir a rota: {str(e)}", "danger")
         finally:
             db.close()
@@ -1,14 +1,14 @@
 # /opt/nanosip/cadastro.py
 import sqlite3
 from database import get_db
+from sip_realtime import podar_peer
 
 # --- CRUD de Ramais (Já estava ok, mas limpando para consistência) ---
 
 def adicionar_ramal(ramal, nome, senha, contexto):
     """Adiciona um novo ramal. Retorna False se já existir."""
+    db = get_db()
     try:
-        db = get_db()
-
         # 1. Verifica se o NÚMERO do ramal já existe na tabela de ramais
         cursor = db.execute("SELECT id FROM ramais WHERE ramal = ?", (ramal,))
         if cursor.fetchone():
@@ -26,40 +26,49 @@ def adicionar_ramal(ramal, nome, senha, contexto):
         db.close()
         return True, f"Ramal {ramal} criado com sucesso."
     except sqlite3.IntegrityError:
+        db.desfazer()
         return False, f"O ramal {ramal} já existe."
     except Exception as e:
+        db.desfazer()
         return False, str(e)
 
 def atualizar_ramal(ramal_id, nome, senha, contexto):
     """Atualiza um ramal existente pelo seu ID."""
+    db = get_db()
     try:
-        db = get_db()
         db.execute("UPDATE ramais SET nome = ?, senha = ?, contexto = ? WHERE id = ?", (nome, senha, contexto, ramal_id))
+        row = db.execute("SELECT ramal FROM ramais WHERE id = ?", (ramal_id,)).fetchone()
         db.commit()
         db.close()
+        if row:
+            podar_peer(row["ramal"])
         return True, "Ramal atualizado com sucesso."
     except Exception as e:
+        db.desfazer()
         return False, str(e)
 
 def remover_ramal(ramal_id): # <--- MUDANÇA AQUI
     """Remove um ramal e suas associações pelo ID do ramal."""
+    db = get_db()
     try:
-        db = get_db()
+        row = db.execute("SELECT ramal FROM ramais WHERE id = ?", (ramal_id,)).fetchone()
         db.execute("DELETE FROM ramal_fila WHERE ramal_id = ?", (ramal_id,))
         db.execute("DELETE FROM ramais WHERE id = ?", (ramal_id,)) # <--- MUDANÇA AQUI
         db.commit()
         db.close()
+        if row:
+            podar_peer(row["ramal"])
         return True, f"Ramal removido com sucesso."
     except Exception as e:
+        db.desfazer()
         return False, str(e)
 
 # --- CRUD de Filas (CORREÇÃO PRINCIPAL) ---
 
 def adicionar_fila(fila_num, nome):
     """Adiciona uma nova fila. Retorna False se já existir."""
+    db = get_db()
     try:
-        db = get_db()
-
         # 1. Verifica se o NÚMERO da fila já existe na tabela de filas
         cursor = db.execute("SELECT id FROM filas WHERE fila = ?", (fila_num,))
         if cursor.fetchone():
@@ -83,54 +92,73 @@ def adicionar_fila(fila_num, nome):
         db.close()
         return True, f"Fila {fila_num} adicionada com sucesso."
     except sqlite3.IntegrityError:
+        db.desfazer()
         return False, f"A fila {fila_num} já existe."
     except Exception as e:
+        db.desfazer()
         return False, str(e)
 
 def atualizar_fila(fila_id, nome):
     """Atualiza o nome de uma fila existente pelo seu ID."""
+    db = get_db()
     try:
-        db = get_db()
         db.execute("UPDATE filas SET nome = ? WHERE id = ?", (nome, fila_id))
         db.commit()
         db.close()
         return True, "Fila atualizada com sucesso."
     except Exception as e:
+        db.desfazer()
         return False, str(e)
 
 def remover_fila(fila_id):
     """Remove uma fila e suas associações pelo ID da fila."""
+    db = get_db()
     try:
-        db = get_db()
+        # Com foreign_keys ativo a exclusão levaria junto as rotas e horários que usam a fila
+        rota = db.execute("""
+            SELECT nome FROM rotas WHERE dest_fila_else = ?
+            UNION ALL
+            SELECT r.nome FROM time_conditions tc JOIN rotas r ON r.id = tc.rota_id
+            WHERE tc.dest_fila_if_time = ?
+            LIMIT 1
+        """, (fila_id, fila_id)).fetchone()
+        if rota:
+            db.close()
+            return False, f"Erro: A fila está em uso pela rota '{rota['nome']}'."
+
         db.execute("DELETE FROM ramal_fila WHERE fila_id = ?", (fila_id,))
         db.execute("DELETE FROM filas WHERE id = ?", (fila_id,))
         db.commit()
         db.close()
         return True, "Fila removida com sucesso."
     except Exception as e:
+        db.desfazer()
         return False, str(e)
 
 # --- Associações Ramais <-> Filas (CORREÇÃO PRINCIPAL) ---
 
 def desassociar_todos_ramais_da_fila(fila_id):
     """Remove todas as associações de ramais para uma determinada fila (pelo ID)."""
+    db = get_db()
     try:
-        db = get_db()
         db.execute("DELETE FROM ramal_fila WHERE fila_id = ?", (fila_id,))
         db.commit()
         db.close()
     except Exception as e:
+        db.desfazer()
         print(f"Erro ao desassociar ramais da fila {fila_id}: {e}")
 
 def associar_ramal_fila(ramal_id, fila_id):
     """Associa um ramal a uma fila usando os IDs de ambos."""
+    db = get_db()
     try:
-        db = get_db()
         db.execute("INSERT INTO ramal_fila (ramal_id, fila_id) VALUES (?, ?)", (ramal_id, fila_id))
         db.commit()
         db.close()
         return True, "Ramal associado com sucesso."
     except sqlite3.IntegrityError:
+        db.desfazer()
         return True, "Associação já existe."
     except Exception as e:
+        db.desfazer()
         return False, str(e)
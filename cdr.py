@@ -0,0 +1,506 @@
+# /opt/nanosip/cdr.py
+"""
+Ingestão incremental do CDR do Asterisk (cdr-csv/Master.csv) em SQLite.
+
+O arquivo é lido a partir do último offset salvo, em lotes transacionais.
+A rotação diária com 'copytruncate' (config/nanosip_logrotate) é detectada
+pelo tamanho menor que o offset: o trecho ainda não lido é recuperado da
+cópia Master.csv.1 antes de recomeçar o arquivo truncado do início.
+
+Cada lote importado também é somado nos resumos por hora/dia (ramal, fila
+e disposição), lidos pelo painel de resumo sem tocar na tabela cdr.
+
+A ingestão roda só em segundo plano (cron) e é exclusiva entre processos:
+quem encontra a trava (cdr.lock) ocupada desiste e fica para a próxima
+execução. O cdr.db fica em WAL, então as telas leem durante a ingestão.
+
+Uso via cron: python3 cdr.py
+Reconstrução dos resumos: python3 cdr.py --reconstruir-resumos
+"""
+import csv
+import fcntl
+import io
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from ami import ramal_do_canal
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CDR_DB_PATH = os.path.join(BASE_DIR, 'cdr.db')
+TRAVA_INGESTAO = os.path.join(BASE_DIR, 'cdr.lock')
+
+# 'db' (tabela cdr, padrão) ou 'csv' (leitura direta dos Master.csv*, ver cdr_csv.py)
+CDR_FONTE = os.environ.get("NANOSIP_CDR_FONTE", "db")
+
+CSV_DIR = "/var/log/asterisk/cdr-csv"
+CDR_CSV = os.path.join(CSV_DIR, "Master.csv")
+ROTACOES = 7            # mesmo 'rotate' do config/nanosip_logrotate
+LOTE = 500              # linhas por transação
+BLOCO_LEITURA = 1024 * 1024
+
+STATUS_MAP = {
+    "ANSWERED": "Atendida",
+    "BUSY": "Ocupado",
+    "FAILED": "Falha",
+    "NO ANSWER": "Não atendida",
+    "CANCEL": "Cancelada",
+    "CONGESTION": "Congestionada"
+}
+
+COLUNAS = ("calldate", "src", "dst", "dcontext", "clid", "channel", "dstchannel",
+           "lastapp", "lastdata", "duration", "billsec", "disposition", "uniqueid", "userfield")
+
+_SQL_INSERIR = (f"INSERT OR IGNORE INTO cdr ({', '.join(COLUNAS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUNAS)})")
+
+_IDX = {c: i for i, c in enumerate(COLUNAS)}
+
+# Índices das buscas do relatório: a data e um por filtro de igualdade,
+# já na ordem da paginação por cursor
+INDICES_BUSCA = {"idx_cdr_calldate": "calldate, uniqueid"}
+INDICES_BUSCA.update({f"idx_cdr_{c}": f"{c}, calldate, uniqueid" for c in ("src", "dst", "disposition", "lastapp")})
+
+# Resumos: tabela e tamanho do prefixo de calldate que define o período
+TABELAS_RESUMO = {"hora": ("cdr_resumo_hora", 13), "dia": ("cdr_resumo_dia", 10)}
+DIMENSOES = ("ramal", "fila", "disposicao")
+_CAMPOS_RESUMO = ("calldate", "channel", "dstchannel", "lastapp", "lastdata",
+                  "duration", "billsec", "disposition")
+
+
+def get_cdr_db():
+    conn = sqlite3.connect(CDR_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    init_cdr_db(conn, indices=False)
+    return conn
+
+
+@contextmanager
+def trava_ingestao(esperar=False):
+    """
+    Trava exclusiva entre processos (flock) para ingestão e importação em massa.
+    Entrega True se obtida; sem esperar, entrega False quando já está ocupada.
+    """
+    with open(TRAVA_INGESTAO, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def init_cdr_db(conn, indices=True):
+    """Cria as tabelas; os índices de busca só com 'indices' (quem escreve, sob a trava)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS cdr (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    calldate TEXT NOT NULL,
+                    src TEXT,
+                    dst TEXT,
+                    dcontext TEXT,
+                    clid TEXT,
+                    channel TEXT,
+                    dstchannel TEXT,
+                    lastapp TEXT,
+                    lastdata TEXT,
+                    duration INTEGER,
+                    billsec INTEGER,
+                    disposition TEXT,
+                    uniqueid TEXT NOT NULL UNIQUE,
+                    userfield TEXT
+                )""")
+    if indices:
+        for nome, colunas in INDICES_BUSCA.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON cdr ({colunas})")
+
+    # Posição de leitura do Master.csv (um registro por arquivo acompanhado)
+    conn.execute("""CREATE TABLE IF NOT EXISTS cdr_ingestao (
+                    arquivo TEXT PRIMARY KEY,
+                    inode INTEGER NOT NULL,
+                    offset INTEGER NOT NULL
+                )""")
+
+    # Resumos por hora/dia, mantidos a cada lote importado
+    for tabela, _ in TABELAS_RESUMO.values():
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS {tabela} (
+                        dimensao TEXT NOT NULL,
+                        valor TEXT NOT NULL,
+                        periodo TEXT NOT NULL,
+                        chamadas INTEGER NOT NULL DEFAULT 0,
+                        atendidas INTEGER NOT NULL DEFAULT 0,
+                        falado INTEGER NOT NULL DEFAULT 0,
+                        duracao INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (dimensao, valor, periodo)
+                    ) WITHOUT ROWID""")
+
+
+# --------------------------------
+# Normalização e formatação
+# --------------------------------
+
+def normalizar(row):
+    """Converte uma linha do Master.csv na tupla da tabela cdr (ou None se inválida)."""
+    if not row or len(row) < 17:
+        return None
+    try:
+        duration = int(row[12] or 0)
+        billsec = int(row[13] or 0)
+    except ValueError:
+        return None
+    disposition = row[14].strip().upper() or "UNKNOWN"
+    # Chamadas com 0s não são realmente atendidas
+    if disposition == "ANSWERED" and billsec == 0:
+        disposition = "NO ANSWER"
+    return (row[9], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8],
+            duration, billsec, disposition, row[16], row[17] if len(row) > 17 else "")
+
+
+def formatar_registro(r):
+    """Registro do banco no formato exibido pelo relatório (data BR, status em português)."""
+    try:
+        calldate_br = datetime.strptime(r["calldate"], "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M:%S")
+    except (TypeError, ValueError):
+        calldate_br = r["calldate"]
+    disposition = r["disposition"] or "UNKNOWN"
+    return {
+        "calldate": calldate_br,
+        "src": r["src"],
+        "dst": r["dst"],
+        "clid": r["clid"],
+        "lastapp": r["lastapp"],
+        "lastdata": r["lastdata"],
+        "duration": str(r["duration"]),
+        "billsec": str(r["billsec"]),
+        "disposition": STATUS_MAP.get(disposition, disposition.capitalize()),
+        "uniqueid": r["uniqueid"],
+        "recording": None
+    }
+
+
+# --------------------------------
+# Busca com filtros e cursor
+# --------------------------------
+
+FILTROS = ("data_inicio", "data_fim", "origem", "destino", "status", "billsec_min", "app", "fila")
+
+
+def ler_filtros(args):
+    """Extrai os filtros conhecidos de request.args (somente os preenchidos)."""
+    return {k: args.get(k, "").strip() for k in FILTROS if args.get(k, "").strip()}
+
+
+def montar_where(filtros):
+    """Traduz os filtros em (cláusula WHERE, parâmetros)."""
+    condicoes, params = [], []
+    if filtros.get("data_inicio"):
+        condicoes.append("calldate >= ?")
+        params.append(f"{filtros['data_inicio']} 00:00:00")
+    if filtros.get("data_fim"):
+        condicoes.append("calldate <= ?")
+        params.append(f"{filtros['data_fim']} 23:59:59")
+    if filtros.get("origem"):
+        condicoes.append("src = ?")
+        params.append(filtros["origem"])
+    if filtros.get("destino"):
+        condicoes.append("dst = ?")
+        params.append(filtros["destino"])
+    if filtros.get("status"):
+        condicoes.append("disposition = ?")
+        params.append(filtros["status"].upper())
+    if filtros.get("billsec_min", "").isdigit():
+        condicoes.append("billsec >= ?")
+        params.append(int(filtros["billsec_min"]))
+    if filtros.get("app"):
+        condicoes.append("lastapp = ?")
+        params.append(filtros["app"])
+    if filtros.get("fila"):
+        # Queue(500,tT,...) grava '500,tT,...' em lastdata
+        condicoes.append("lastapp = 'Queue' AND (lastdata = ? OR lastdata LIKE ?)")
+        params.extend([filtros["fila"], f"{filtros['fila']},%"])
+    where = " AND ".join(condicoes)
+    return (f"WHERE {where}" if where else ""), params
+
+
+def _cursor_de(row):
+    return f"{row['calldate']}|{row['uniqueid']}"
+
+
+def _ler_cursor(valor):
+    calldate, sep, uniqueid = (valor or "").partition("|")
+    return (calldate, uniqueid) if sep else None
+
+
+def buscar(conn, filtros, apos=None, antes=None, limite=20):
+    """
+    Página de registros (mais recentes primeiro) paginada por cursor (calldate, uniqueid).
+    'apos' avança para registros mais antigos, 'antes' volta para os mais novos.
+    Retorna (rows, cursor_anterior, cursor_proximo).
+    """
+    where, params = montar_where(filtros)
+    cursor_apos, cursor_antes = _ler_cursor(apos), _ler_cursor(antes)
+
+    if cursor_antes:
+        sql_cursor, ordem, params_cursor = "(calldate, uniqueid) > (?, ?)", "ASC", list(cursor_antes)
+    elif cursor_apos:
+        sql_cursor, ordem, params_cursor = "(calldate, uniqueid) < (?, ?)", "DESC", list(cursor_apos)
+    else:
+        sql_cursor, ordem, params_cursor = "", "DESC", []
+
+    if sql_cursor:
+        where = f"{where} AND {sql_cursor}" if where else f"WHERE {sql_cursor}"
+    rows = conn.execute(
+        f"SELECT * FROM cdr {where} ORDER BY calldate {ordem}, uniqueid {ordem} LIMIT ?",
+        params + params_cursor + [limite + 1]
+    ).fetchall()
+
+    tem_mais = len(rows) > limite
+    rows = rows[:limite]
+    if cursor_antes:
+        rows.reverse()
+        anterior = _cursor_de(rows[0]) if tem_mais else None
+        proximo = _cursor_de(rows[-1]) if rows else None
+    else:
+        anterior = _cursor_de(rows[0]) if cursor_apos and rows else None
+        proximo = _cursor_de(rows[-1]) if tem_mais else None
+    return rows, anterior, proximo
+
+
+def iterar(conn, filtros, lote=1000):
+    """Percorre todos os registros filtrados em ordem cronológica, 'lote' linhas por vez."""
+    where, params = montar_where(filtros)
+    cursor = conn.execute(f"SELECT * FROM cdr {where} ORDER BY calldate, uniqueid", params)
+    while True:
+        rows = cursor.fetchmany(lote)
+        if not rows:
+            return
+        yield from rows
+
+
+def contar(conn, filtros):
+    where, params = montar_where(filtros)
+    return conn.execute(f"SELECT COUNT(*) FROM cdr {where}", params).fetchone()[0]
+
+
+# --------------------------------
+# Resumos (rollups) por hora e por dia
+# --------------------------------
+
+def _acumular(acum, calldate, channel, dstchannel, lastapp, lastdata, duration, billsec, disposition):
+    """Soma um registro em {(dimensao, valor, hora): [chamadas, atendidas, falado, duracao]}."""
+    hora = (calldate or "")[:TABELAS_RESUMO["hora"][1]]
+    valores = [("disposicao", disposition or "UNKNOWN")]
+    origem, destino = ramal_do_canal(channel), ramal_do_canal(dstchannel)
+    if origem:
+        valores.append(("ramal", origem))
+    if destino and destino != origem:
+        valores.append(("ramal", destino))
+    if lastapp == "Queue" and lastdata:
+        valores.append(("fila", lastdata.split(",", 1)[0]))
+
+    atendida = 1 if disposition == "ANSWERED" else 0
+    for dimensao, valor in valores:
+        soma = acum.get((dimensao, valor, hora))
+        if soma is None:
+            acum[(dimensao, valor, hora)] = [1, atendida, billsec or 0, duration or 0]
+        else:
+            soma[0] += 1
+            soma[1] += atendida
+            soma[2] += billsec or 0
+            soma[3] += duration or 0
+
+
+def _gravar_resumos(conn, acum):
+    """Grava as somas por hora e, agregando-as, as somas por dia."""
+    por_periodo = {"hora": acum}
+    for granularidade, (_, tamanho) in TABELAS_RESUMO.items():
+        if granularidade == "hora":
+            continue
+        agregado = por_periodo[granularidade] = {}
+        for (dimensao, valor, hora), soma in acum.items():
+            total = agregado.setdefault((dimensao, valor, hora[:tamanho]), [0, 0, 0, 0])
+            for i in range(4):
+                total[i] += soma[i]
+
+    for granularidade, (tabela, _) in TABELAS_RESUMO.items():
+        conn.executemany(
+            f"""INSERT INTO {tabela} (dimensao, valor, periodo, chamadas, atendidas, falado, duracao)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (dimensao, valor, periodo) DO UPDATE SET
+                    chamadas = chamadas + excluded.chamadas,
+                    atendidas = atendidas + excluded.atendidas,
+                    falado = falado + excluded.falado,
+                    duracao = duracao + excluded.duracao""",
+            [(d, v, p, *soma) for (d, v, p), soma in por_periodo[granularidade].items()]
+        )
+
+
+def remover_indices_busca(conn):
+    """Para cargas em massa: sem os índices secundários a inserção é bem mais rápida.
+    init_cdr_db() os recria ao final."""
+    for nome in INDICES_BUSCA:
+        conn.execute(f"DROP INDEX IF EXISTS {nome}")
+
+
+def reconstruir_resumos(conn, lote=10000, limite_chaves=500000):
+    """Refaz os resumos a partir da tabela cdr (após importações em massa ou correções)."""
+    for tabela, _ in TABELAS_RESUMO.values():
+        conn.execute(f"DELETE FROM {tabela}")
+    cursor = conn.execute(f"SELECT {', '.join(_CAMPOS_RESUMO)} FROM cdr")
+    acum = {}
+    while True:
+        rows = cursor.fetchmany(lote)
+        if not rows:
+            break
+        for row in rows:
+            _acumular(acum, *row)
+        if len(acum) >= limite_chaves:
+            _gravar_resumos(conn, acum)
+            acum = {}
+    _gravar_resumos(conn, acum)
+    conn.commit()
+
+
+def consultar_resumo(conn, granularidade, dimensao, inicio, fim):
+    """Linhas do resumo no intervalo [inicio, fim] (prefixos de data comparáveis a 'periodo')."""
+    tabela, tamanho = TABELAS_RESUMO[granularidade]
+    return conn.execute(
+        f"""SELECT valor, periodo, chamadas, atendidas, falado, duracao FROM {tabela}
+            WHERE dimensao = ? AND periodo BETWEEN ? AND ? ORDER BY periodo, valor""",
+        (dimensao, inicio[:tamanho], fim[:tamanho])
+    ).fetchall()
+
+
+# --------------------------------
+# Ingestão incremental
+# --------------------------------
+
+def gravar_lote(conn, linhas):
+    """Insere o lote e soma nos resumos só os registros realmente novos. Retorna quantos eram novos."""
+    unicos = {}
+    for linha in linhas:
+        unicos.setdefault(linha[_IDX["uniqueid"]], linha)
+    if not unicos:
+        return 0
+    # Trava de escrita antes de ver o que já existe: outro escritor não pode
+    # gravar os mesmos uniqueids entre a consulta e o INSERT (contaria duas vezes)
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    existentes = {r[0] for r in conn.execute(
+        f"SELECT uniqueid FROM cdr WHERE uniqueid IN ({', '.join('?' for _ in unicos)})", list(unicos)
+    )}
+    novos = [linha for uid, linha in unicos.items() if uid not in existentes]
+    conn.executemany(_SQL_INSERIR, novos)
+
+    acum = {}
+    for linha in novos:
+        _acumular(acum, *(linha[_IDX[c]] for c in _CAMPOS_RESUMO))
+    _gravar_resumos(conn, acum)
+    return len(novos)
+
+
+def _ler_arquivo(conn, caminho, offset, chave_estado=None, inode=None):
+    """
+    Lê 'caminho' a partir de 'offset' e grava as linhas completas em lotes.
+    A posição só avança junto com o commit do lote correspondente.
+    Retorna (novo offset, linhas lidas).
+    """
+    total = 0
+    with open(caminho, "rb") as f:
+        f.seek(offset)
+        pendente = b""
+        while True:
+            bloco = f.read(BLOCO_LEITURA)
+            if not bloco:
+                break
+            pendente += bloco
+            fim = pendente.rfind(b"\n")
+            if fim < 0:
+                continue
+            completo, pendente = pendente[:fim + 1], pendente[fim + 1:]
+
+            texto = completo.decode("utf-8", errors="replace")
+            linhas = [n for n in (normalizar(row) for row in csv.reader(io.StringIO(texto))) if n]
+            for i in range(0, len(linhas), LOTE):
+                gravar_lote(conn, linhas[i:i + LOTE])
+            offset += len(completo)
+            total += len(linhas)
+            if chave_estado:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cdr_ingestao (arquivo, inode, offset) VALUES (?, ?, ?)",
+                    (chave_estado, inode, offset)
+                )
+            conn.commit()
+    return offset, total
+
+
+def ingerir(caminho=None):
+    """
+    Importa as linhas novas do Master.csv. Retorna a quantidade de linhas lidas.
+    Se outra ingestão ou importação estiver em andamento, não faz nada e retorna 0.
+    """
+    caminho = caminho or CDR_CSV
+    try:
+        st = os.stat(caminho)
+    except FileNotFoundError:
+        return 0
+
+    with trava_ingestao() as obtida:
+        if not obtida:
+            return 0
+        conn = get_cdr_db()
+        try:
+            init_cdr_db(conn)
+            estado = conn.execute(
+                "SELECT inode, offset FROM cdr_ingestao WHERE arquivo = ?", (caminho,)
+            ).fetchone()
+            total = 0
+
+            if estado is None:
+                # Primeira execução: aproveita também as cópias já rotacionadas
+                for n in range(ROTACOES, 0, -1):
+                    rodado = f"{caminho}.{n}"
+                    if os.path.isfile(rodado):
+                        total += _ler_arquivo(conn, rodado, 0)[1]
+                offset = 0
+            elif estado["inode"] == st.st_ino and st.st_size >= estado["offset"]:
+                offset = estado["offset"]
+            else:
+                # copytruncate (mesmo inode, menor) ou arquivo recriado (outro inode):
+                # o final ainda não lido está na cópia Master.csv.1
+                rodado = f"{caminho}.1"
+                try:
+                    if os.path.getsize(rodado) >= estado["offset"]:
+                        total += _ler_arquivo(conn, rodado, estado["offset"])[1]
+                except OSError:
+                    pass
+                offset = 0
+
+            conn.execute(
+                "INSERT OR REPLACE INTO cdr_ingestao (arquivo, inode, offset) VALUES (?, ?, ?)",
+                (caminho, st.st_ino, offset)
+            )
+            conn.commit()
+            total += _ler_arquivo(conn, caminho, offset, caminho, st.st_ino)[1]
+            return total
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if "--reconstruir-resumos" in sys.argv:
+        with trava_ingestao(esperar=True):
+            conn = get_cdr_db()
+            try:
+                reconstruir_resumos(conn)
+            finally:
+                conn.close()
+        print("Resumos do CDR reconstruídos.")
+    else:
+        print(f"{ingerir()} registros de CDR processados.")
@@ -0,0 +1,189 @@
+# /opt/nanosip/cdr_csv.py
+"""
+Leitura do CDR direto dos arquivos Master.csv*, do mais novo para o mais antigo.
+
+Usado pelo relatório quando NANOSIP_CDR_FONTE=csv (sem a tabela cdr).
+O arquivo atual é lido de trás para frente em blocos, então a primeira
+página custa poucos KB de I/O. Para páginas mais fundas, cada arquivo tem
+um índice de offsets das linhas em memória, identificado por (inode,
+tamanho, mtime): os rotacionados (Master.csv.N) não mudam mais e são
+indexados uma vez; no atual, só o trecho novo é acrescentado.
+"""
+import csv
+import os
+import threading
+from array import array
+
+from cdr import CDR_CSV, COLUNAS, ROTACOES, normalizar
+
+BLOCO_LEITURA = 64 * 1024
+
+_indices = {}
+_lock = threading.Lock()
+
+
+def _registro(linha):
+    """Linha crua (bytes) -> dict no formato da tabela cdr, ou None se inválida."""
+    try:
+        row = next(csv.reader([linha.decode("utf-8", errors="replace")]))
+    except (csv.Error, StopIteration):
+        return None
+    tupla = normalizar(row)
+    return dict(zip(COLUNAS, tupla)) if tupla else None
+
+
+def _corresponde(r, filtros):
+    """Mesmo significado dos filtros de cdr.montar_where, avaliado em Python."""
+    if filtros.get("data_inicio") and r["calldate"] < f"{filtros['data_inicio']} 00:00:00":
+        return False
+    if filtros.get("data_fim") and r["calldate"] > f"{filtros['data_fim']} 23:59:59":
+        return False
+    if filtros.get("origem") and r["src"] != filtros["origem"]:
+        return False
+    if filtros.get("destino") and r["dst"] != filtros["destino"]:
+        return False
+    if filtros.get("status") and r["disposition"] != filtros["status"].upper():
+        return False
+    if filtros.get("billsec_min", "").isdigit() and r["billsec"] < int(filtros["billsec_min"]):
+        return False
+    if filtros.get("app") and r["lastapp"] != filtros["app"]:
+        return False
+    if filtros.get("fila"):
+        if r["lastapp"] != "Queue" or r["lastdata"].split(",", 1)[0] != filtros["fila"]:
+            return False
+    return True
+
+
+def linhas_reversas(caminho, bloco=BLOCO_LEITURA):
+    """
+    Gera as linhas completas do arquivo, da última para a primeira, lendo
+    blocos a partir do fim. Uma linha final ainda sem quebra é ignorada.
+    """
+    with open(caminho, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        posicao = f.tell()
+        resto = b""
+        cauda = True  # o trecho após o último '\n' ainda está sendo gravado
+        while posicao > 0:
+            tamanho = min(bloco, posicao)
+            posicao -= tamanho
+            f.seek(posicao)
+            partes = (f.read(tamanho) + resto).split(b"\n")
+            resto = partes.pop(0)
+            for linha in reversed(partes):
+                if cauda:
+                    cauda = False
+                    continue
+                if linha.strip():
+                    yield linha + b"\n"
+        if resto.strip() and not cauda:
+            yield resto + b"\n"
+
+
+def _valida(linha):
+    """Triagem barata de uma linha completa do Master.csv (18 campos = 17+ vírgulas)."""
+    return linha.endswith(b"\n") and linha.count(b",") >= 16
+
+
+def indice(caminho):
+    """
+    Offsets (crescentes) das linhas válidas do arquivo, com cache por (inode, tamanho, mtime).
+    Arquivos rotacionados são indexados uma única vez; o atual só tem o trecho novo
+    acrescentado ao índice já existente.
+    """
+    st = os.stat(caminho)
+    chave = (st.st_ino, st.st_size, st.st_mtime_ns)
+    with _lock:
+        em_cache = _indices.get(caminho)
+    if em_cache and em_cache[0] == chave:
+        return em_cache[1]
+
+    if em_cache and em_cache[0][0] == st.st_ino and st.st_size >= em_cache[2]:
+        offsets, posicao = array("Q", em_cache[1]), em_cache[2]
+    else:
+        offsets, posicao = array("Q"), 0
+
+    with open(caminho, "rb") as f:
+        f.seek(posicao)
+        for linha in f:
+            if not linha.endswith(b"\n"):
+                break  # linha ainda sendo gravada
+            if _valida(linha):
+                offsets.append(posicao)
+            posicao += len(linha)
+
+    with _lock:
+        _indices[caminho] = (chave, offsets, posicao)
+    return offsets
+
+
+def _registros_indexados(caminho, pular):
+    """Registros do arquivo, do mais novo para o mais antigo, saltando 'pular' pelo índice."""
+    offsets = indice(caminho)
+    with open(caminho, "rb") as f:
+        for i in range(len(offsets) - 1 - pular, -1, -1):
+            f.seek(offsets[i])
+            r = _registro(f.readline())
+            if r:
+                yield r
+
+
+def registros_reversos(caminho=None, pular=0):
+    """
+    Todos os registros, do mais novo para o mais antigo, pulando os 'pular' primeiros.
+    A primeira página lê só o fim do arquivo atual; páginas profundas saltam pelo índice.
+    """
+    caminho = caminho or CDR_CSV
+    arquivos = [f"{caminho}.{n}" for n in range(ROTACOES, 0, -1)] + [caminho]
+    arquivos = [a for a in reversed(arquivos) if os.path.isfile(a)]
+
+    for i, arquivo in enumerate(arquivos):
+        if i == 0 and pular == 0:
+            for linha in linhas_reversas(arquivo):
+                r = _registro(linha) if _valida(linha) else None
+                if r:
+                    yield r
+            continue
+        total = len(indice(arquivo))
+        if pular >= total:
+            pular -= total
+            continue
+        yield from _registros_indexados(arquivo, pular)
+        pular = 0
+
+
+def buscar(filtros, apos=None, antes=None, limite=20, caminho=None):
+    """
+    Mesmo contrato de cdr.buscar: (registros, cursor_anterior, cursor_proximo).
+    Aqui o cursor é a quantidade de registros (filtrados) já percorridos.
+    """
+    inicio = int(apos) if (apos or "").isdigit() else 0
+    if (antes or "").isdigit():
+        inicio = max(int(antes) - limite, 0)
+
+    registros = []
+    if filtros:
+        # Com filtros, o salto por índice não se aplica: conta só os que correspondem
+        vistos = 0
+        for r in registros_reversos(caminho):
+            if not _corresponde(r, filtros):
+                continue
+            if vistos >= inicio:
+                registros.append(r)
+                if len(registros) > limite:
+                    break
+            vistos += 1
+    else:
+        for r in registros_reversos(caminho, pular=inicio):
+            registros.append(r)
+            if len(registros) > limite:
+                break
+
+    tem_mais = len(registros) > limite
+    anterior = str(inicio) if inicio else None
+    proximo = str(inicio + limite) if tem_mais else None
+    return registros[:limite], anterior, proximo
+
+
+def contar(filtros, caminho=None):
+    return sum(1 for r in registros_reversos(caminho) if not filtros or _corresponde(r, filtros))
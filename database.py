@@ -1,16 +1,113 @@
 import sqlite3
 import bcrypt
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, 'nanosip.db')
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+BUSY_TIMEOUT_MS = int(os.environ.get("NANOSIP_DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SENTENCAS = 256       # sentenças preparadas mantidas por conexão
+
+# -------------------------------
+# Conexões
+# -------------------------------
+# Uma conexão por requisição (Flask g) ou, fora do Flask (scripts, threads),
+# uma por thread. Os helpers continuam chamando get_db()/commit()/close():
+# close() não fecha a conexão compartilhada e, dentro de unidade_de_trabalho(),
+# commit() fica para o fim do bloco. Como a conexão é compartilhada, um helper
+# que falha chama desfazer(): senão o próximo commit() gravaria o que ele
+# deixou pela metade.
+
+class Conexao(sqlite3.Connection):
+    """Conexão compartilhada: close() é ignorado e commit() respeita a unidade de trabalho."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unidades = 0
+
+    def commit(self):
+        if not self.unidades:
+            super().commit()
+
+    def desfazer(self):
+        """Desfaz o que não foi confirmado; dentro de uma unidade de trabalho, quem decide é ela."""
+        if not self.unidades:
+            self.rollback()
+
+    def close(self):
+        pass
+
+    def fechar(self):
+        """Fecha de fato a conexão, descartando o que não foi confirmado."""
+        super().close()
+
+
+_local = threading.local()
+
+def conectar(caminho=None):
+    """Abre uma conexão nova, já com os pragmas do NanoSip."""
+    conn = sqlite3.connect(caminho or DB_PATH, factory=Conexao,
+                           timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=CACHE_SENTENCAS)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
+def _conexoes():
+    """Onde guardar a conexão compartilhada: g da requisição ou a thread atual."""
+    try:
+        from flask import g, has_app_context
+        if has_app_context():
+            return g
+    except ImportError:
+        pass
+    return _local
+
+def get_db():
+    escopo = _conexoes()
+    atual = getattr(escopo, "nanosip_db", None)
+    if atual is None or atual[0] != DB_PATH:
+        if atual is not None:
+            atual[1].fechar()
+        atual = (DB_PATH, conectar())
+        escopo.nanosip_db = atual
+    return atual[1]
+
+def fechar_db(exc=None):
+    """Fecha a conexão do escopo atual (teardown do Flask ou fim de script)."""
+    escopo = _conexoes()
+    atual = getattr(escopo, "nanosip_db", None)
+    if atual is not None:
+        escopo.nanosip_db = None
+        # Transação aberta no fim da requisição é trabalho que ninguém confirmou
+        if atual[1].in_transaction:
+            atual[1].rollback()
+        atual[1].fechar()
+
+@contextmanager
+def unidade_de_trabalho():
+    """
+    Agrupa várias operações (inclusive helpers que fazem commit) em uma
+    única transação: confirma no fim do bloco, desfaz tudo em caso de erro.
+    """
+    db = get_db()
+    db.unidades += 1
+    try:
+        yield db
+    except BaseException:
+        db.unidades -= 1
+        if not db.unidades:
+            db.rollback()
+        raise
+    db.unidades -= 1
+    if not db.unidades:
+        db.commit()
+
 def init_db():
 
     print(f"Inicializando banco de dados em: {DB_PATH}")
@@ -112,19 +209,13 @@ def get_ramais():
     return ramais
 
 def get_filas():
+    """Filas por número, com os ids dos ramais membros em 'ramais'."""
+    from modelo_config import carregar_filas
     db = get_db()
-    filas_raw = db.execute("SELECT id, fila, nome FROM filas order by fila").fetchall()
-    filas = []
-    for f in filas_raw:
-        ramais_associados = db.execute(
-            "SELECT ramal_id FROM ramal_fila WHERE fila_id = ?", (f["id"],)
-        ).fetchall()
-        ramais_id_list = [r["ramal_id"] for r in ramais_associados]
-        filas.append({
-            "id": f["id"], "fila": f["fila"], "nome": f["nome"], "ramais": ramais_id_list
-        })
-    db.close()
-    return filas
+    try:
+        return carregar_filas(db, ordem="fila")
+    finally:
+        db.close()
 
 # Nova função para buscar time conditions de uma rota
 def get_time_conditions_by_rota_id(rota_id):
@@ -134,38 +225,12 @@ def get_time_conditions_by_rota_id(rota_id):
     return [dict(tc) for tc in tcs_raw]
 
 def get_routes(include_time_conditions=False):
+    from modelo_config import carregar_rotas
     db = get_db()
-    cursor = db.execute("SELECT id, nome, numero_entrada, dest_fila_else FROM rotas")
-    rotas = []
-    for row in cursor.fetchall():
-        rota = {
-            "id": row[0],
-            "nome": row[1],
-            "numero_entrada": row[2],
-            "dest_fila_else": row[3],
-        }
-
-        if include_time_conditions:
-            tc_cursor = db.execute(
-                """SELECT id, time_start, time_end, days, dest_fila_if_time
-                   FROM time_conditions WHERE rota_id = ?""",
-                (row[0],),
-            )
-            time_conditions = []
-            for tc in tc_cursor.fetchall():
-                time_conditions.append({
-                    "id": tc[0],
-                    "time_start": tc[1],
-                    "time_end": tc[2],
-                    "days": tc[3],
-                    "dest_fila_if_time": tc[4],
-                })
-            rota["time_conditions"] = time_conditions
-
-        rotas.append(rota)
-
-    db.close()
-    return rotas
+    try:
+        return carregar_rotas(db, time_conditions=include_time_conditions)
+    finally:
+        db.close()
 
 # -------------------------------
 # Configurações gerais (localnets)
@@ -0,0 +1,287 @@
+# /opt/nanosip/gravacoes.py
+"""
+Catálogo das gravações em /var/spool/asterisk/monitor.
+
+O diretório é listado uma única vez e depois mantido pelo inotify (via
+ctypes, sem dependências). Onde o inotify não estiver disponível (ou o
+diretório ainda não existir), o catálogo é refeito por varredura periódica.
+
+Os arquivos seguem o padrão do dialplan (reload_extensions.py):
+    ${CALLERID(num)}-${EXTEN}-${UNIQUEID_SAFE}.wav
+Tamanho, mtime e duração (lida do cabeçalho WAV) são obtidos sob demanda,
+uma vez por arquivo, e descartados quando o inotify avisa de alteração.
+
+O índice é por UNIQUEID_SAFE, a única parte do nome que não muda quando o
+CDR registra outra origem/destino (transferências, filas). Um arquivo que
+o inotify ainda não entregou é conferido direto no disco (os.stat).
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import threading
+import time
+
+MONITOR_DIR = "/var/spool/asterisk/monitor"
+EXTENSAO = ".wav"
+INTERVALO_RESCAN = 60   # segundos, só sem inotify
+CABECALHO_WAV = 44      # arquivos deste tamanho ou menores não têm áudio
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+
+_MASCARA = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENTO = struct.Struct("iIII")
+
+
+def chave_do_nome(nome):
+    """'100-200-1700000000.wav' -> '1700000000' (UNIQUEID_SAFE), ou None fora do padrão."""
+    if not nome.endswith(EXTENSAO):
+        return None
+    partes = nome[:-len(EXTENSAO)].rsplit("-", 2)
+    return partes[2] if len(partes) == 3 else None
+
+
+def duracao_wav(caminho, tamanho=None):
+    """Duração em segundos a partir dos chunks 'fmt ' e 'data' do cabeçalho RIFF."""
+    try:
+        with open(caminho, "rb") as f:
+            cab = f.read(4096)
+        tamanho = tamanho if tamanho is not None else os.path.getsize(caminho)
+    except OSError:
+        return None
+    if cab[:4] != b"RIFF" or cab[8:12] != b"WAVE":
+        return None
+
+    pos, byte_rate = 12, None
+    while pos + 8 <= len(cab):
+        chunk, tam = cab[pos:pos + 4], struct.unpack_from("<I", cab, pos + 4)[0]
+        if chunk == b"fmt " and pos + 20 <= len(cab):
+            byte_rate = struct.unpack_from("<I", cab, pos + 16)[0]
+        elif chunk == b"data":
+            if not byte_rate:
+                return None
+            # Gravação em andamento: o cabeçalho ainda não tem o tamanho final
+            disponivel = tamanho - (pos + 8)
+            if tam == 0 or tam > disponivel:
+                tam = disponivel
+            return round(max(tam, 0) / byte_rate, 1)
+        pos += 8 + tam + (tam & 1)
+    return None
+
+
+class _Inotify:
+    """Acesso mínimo ao inotify(7) do Linux via ctypes."""
+
+    def __init__(self):
+        nome = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(nome, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+
+    def observar(self, caminho):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(caminho), _MASCARA)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falhou em {caminho}")
+        return wd
+
+    def ler(self):
+        """Bloqueia até haver eventos; gera (mascara, nome)."""
+        dados = os.read(self.fd, 64 * 1024)
+        pos = 0
+        while pos + _EVENTO.size <= len(dados):
+            _, mascara, _, tam = _EVENTO.unpack_from(dados, pos)
+            pos += _EVENTO.size
+            nome = dados[pos:pos + tam].rstrip(b"\0").decode(errors="replace")
+            pos += tam
+            yield mascara, nome
+
+    def fechar(self):
+        os.close(self.fd)
+
+
+class CatalogoGravacoes:
+    """Índice em memória: nome -> metadados e (src, dst, uniqueid_safe) -> nome."""
+
+    def __init__(self, diretorio=MONITOR_DIR):
+        self.diretorio = diretorio
+        self.modo = None  # 'inotify' ou 'varredura'
+        self._lock = threading.Lock()
+        self._arquivos = {}   # nome -> {"tamanho", "mtime", "duracao"} (None = ainda não lido)
+        self._chaves = {}     # uniqueid_safe -> {nomes} (vários se começaram no mesmo segundo)
+        self._inotify = None
+        self._thread = None
+
+    # --- Manutenção do índice ---
+
+    def _adicionar(self, nome):
+        if not nome.endswith(EXTENSAO):
+            return
+        self._arquivos[nome] = None
+        chave = chave_do_nome(nome)
+        if chave:
+            self._chaves.setdefault(chave, set()).add(nome)
+
+    def _remover(self, nome):
+        if self._arquivos.pop(nome, False) is not False:
+            chave = chave_do_nome(nome)
+            nomes = self._chaves.get(chave)
+            if nomes:
+                nomes.discard(nome)
+                if not nomes:
+                    del self._chaves[chave]
+
+    def varrer(self):
+        """Lista o diretório inteiro (sem stat por arquivo) e troca o índice."""
+        arquivos, chaves = {}, {}
+        try:
+            with os.scandir(self.diretorio) as it:
+                for entrada in it:
+                    if entrada.name.endswith(EXTENSAO):
+                        arquivos[entrada.name] = None
+                        chave = chave_do_nome(entrada.name)
+                        if chave:
+                            chaves.setdefault(chave, set()).add(entrada.name)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._arquivos, self._chaves = arquivos, chaves
+
+    def _aplicar_evento(self, mascara, nome):
+        with self._lock:
+            if mascara & (IN_CREATE | IN_MOVED_TO):
+                self._adicionar(nome)
+            elif mascara & (IN_MODIFY | IN_CLOSE_WRITE):
+                if nome in self._arquivos:
+                    self._arquivos[nome] = None  # metadados serão relidos
+                else:
+                    self._adicionar(nome)
+            elif mascara & (IN_DELETE | IN_MOVED_FROM):
+                self._remover(nome)
+
+    # --- Thread ---
+
+    def _ativar_inotify(self):
+        try:
+            inotify = _Inotify()
+        except OSError as e:
+            print(f"[gravacoes] inotify indisponível: {e}")
+            return False
+        try:
+            inotify.observar(self.diretorio)
+        except OSError as e:
+            print(f"[gravacoes] Não foi possível observar {self.diretorio}: {e}")
+            inotify.fechar()
+            return False
+        self._inotify = inotify
+        return True
+
+    def iniciar(self):
+        """Observa o diretório e só então lista: nada criado durante a listagem se perde."""
+        if self._thread and self._thread.is_alive():
+            return
+        self.modo = "inotify" if self._ativar_inotify() else "varredura"
+        self.varrer()
+        self._thread = threading.Thread(target=self._executar, name="nanosip-gravacoes", daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        while True:
+            if self._inotify is None:
+                time.sleep(INTERVALO_RESCAN)
+                if self._ativar_inotify():
+                    self.modo = "inotify"
+                self.varrer()
+                continue
+            try:
+                for mascara, nome in self._inotify.ler():
+                    if mascara & IN_Q_OVERFLOW:
+                        self.varrer()
+                    elif mascara & (IN_DELETE_SELF | IN_IGNORED):
+                        raise OSError(0, f"{self.diretorio} removido")
+                    elif nome:
+                        self._aplicar_evento(mascara, nome)
+            except OSError as e:
+                print(f"[gravacoes] Observação interrompida ({e}), usando varredura a cada {INTERVALO_RESCAN}s")
+                self._inotify.fechar()
+                self._inotify = None
+                self.modo = "varredura"
+
+    # --- Consulta ---
+
+    def info(self, nome):
+        """Metadados de uma gravação pelo nome do arquivo, ou None se não existir."""
+        with self._lock:
+            conhecido = nome in self._arquivos
+            meta = self._arquivos.get(nome)
+        if not conhecido:
+            # Gravação recém-criada cujo evento do inotify ainda não chegou
+            if os.path.basename(nome) != nome or not nome.endswith(EXTENSAO) \
+                    or not os.path.isfile(os.path.join(self.diretorio, nome)):
+                return None
+            with self._lock:
+                self._adicionar(nome)
+        if meta is None:
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                st = os.stat(caminho)
+            except FileNotFoundError:
+                with self._lock:
+                    self._remover(nome)
+                return None
+            meta = {"tamanho": st.st_size, "mtime": st.st_mtime,
+                    "duracao": duracao_wav(caminho, st.st_size)}
+            with self._lock:
+                if nome in self._arquivos:
+                    self._arquivos[nome] = meta
+        return {"nome": nome, **meta}
+
+    def procurar(self, src, dst, uniqueid):
+        """
+        Gravação de uma chamada do CDR pelo uniqueid (padrão do dialplan ou o
+        antigo '{uniqueid}.wav'). src/dst só desempatam gravações do mesmo segundo.
+        """
+        uniqueid_safe = (uniqueid or "").split(".")[0]
+        with self._lock:
+            candidatos = sorted(self._chaves.get(uniqueid_safe, ()))
+        nome = None
+        if len(candidatos) == 1:
+            nome = candidatos[0]
+        elif candidatos:
+            exato = f"{src}-{dst}-{uniqueid_safe}{EXTENSAO}"
+            nome = exato if exato in candidatos else next(
+                (c for c in candidatos if c.startswith(f"{src}-") or f"-{dst}-" in c), None)
+        if nome is None:
+            info = self.info(f"{uniqueid}{EXTENSAO}") if uniqueid else None
+            return info or self.info(f"{src}-{dst}-{uniqueid_safe}{EXTENSAO}")
+        return self.info(nome)
+
+    def total(self):
+        with self._lock:
+            return len(self._arquivos)
+
+
+_catalogo = None
+_init_lock = threading.Lock()
+
+
+def get_catalogo():
+    """Retorna o catálogo compartilhado, iniciando a thread na primeira chamada."""
+    global _catalogo
+    if _catalogo is None:
+        with _init_lock:
+            if _catalogo is None:
+                catalogo = CatalogoGravacoes(MONITOR_DIR)
+                catalogo.iniciar()
+                _catalogo = catalogo
+    return _catalogo
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# /opt/nanosip/importar_cdr.py
+"""
+Importação em massa de arquivos de CDR antigos (Master.csv.N, .gz) para a tabela cdr.
+
+Os arquivos são divididos em tarefas (trechos de ~16MB alinhados em linha
+para CSV; arquivo inteiro para .gz) lidas e normalizadas em paralelo por um
+pool de processos. Um único escritor, o processo principal, grava em lotes;
+uniqueids repetidos são descartados pelo índice UNIQUE (INSERT OR IGNORE).
+
+Durante a carga os índices de busca do relatório são removidos e, ao final,
+recriados junto com os resumos (cdr.reconstruir_resumos), o que é bem mais
+rápido do que mantê-los linha a linha. Enquanto isso o relatório fica lento.
+
+A importação segura a trava de ingestão do cdr.py (cdr.lock) do começo ao
+fim: a ingestão do cron não roda, nem recria os índices, durante a carga.
+
+Uso:
+    python3 importar_cdr.py [-j PROCESSOS] arquivo [arquivo ...]
+    python3 importar_cdr.py /backup/cdr-csv/Master.csv*
+"""
+import argparse
+import csv
+import gzip
+import io
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import cdr
+
+TAMANHO_TRECHO = 16 * 1024 * 1024
+LOTE_ESCRITA = 5000
+CACHE_KB = 256 * 1024   # cache de páginas do SQLite durante a carga
+TAREFAS_POR_PROCESSO = 2    # trechos lidos e ainda não gravados, por processo
+
+
+def dividir(caminhos, tamanho=TAMANHO_TRECHO):
+    """Tarefas (caminho, inicio, fim) em bytes; arquivos .gz não podem ser divididos."""
+    tarefas = []
+    for caminho in caminhos:
+        total = os.path.getsize(caminho)
+        if caminho.endswith(".gz"):
+            tarefas.append((caminho, 0, total))
+            continue
+        for inicio in range(0, total, tamanho):
+            tarefas.append((caminho, inicio, min(inicio + tamanho, total)))
+    return tarefas
+
+
+def ler_trecho(tarefa):
+    """
+    Executado nos processos do pool: lê e normaliza um trecho.
+    Uma linha pertence ao trecho em que começa. Retorna (tarefa, linhas normalizadas).
+    """
+    caminho, inicio, fim = tarefa
+    if caminho.endswith(".gz"):
+        with gzip.open(caminho, "rt", encoding="utf-8", errors="replace", newline="") as f:
+            return tarefa, [n for n in map(cdr.normalizar, csv.reader(f)) if n]
+
+    with open(caminho, "rb") as f:
+        if inicio:
+            # Pula o resto da linha que começou no trecho anterior
+            f.seek(inicio - 1)
+            f.readline()
+        posicao = f.tell()
+        dados = f.read(max(0, fim - posicao))
+        if dados and not dados.endswith(b"\n"):
+            dados += f.readline()
+    texto = dados.decode("utf-8", errors="replace")
+    return tarefa, [n for n in map(cdr.normalizar, csv.reader(io.StringIO(texto))) if n]
+
+
+def em_paralelo(pool, funcao, tarefas, limite):
+    """
+    Como pool.imap, mas com no máximo `limite` tarefas em andamento. Sem o
+    limite, leitores mais rápidos que o escritor acumulam na memória do
+    processo principal os trechos já lidos (~16MB de CSV cada, mais as tuplas).
+    """
+    pendentes = deque()
+    for tarefa in tarefas:
+        if len(pendentes) >= limite:
+            yield pendentes.popleft().get()
+        pendentes.append(pool.apply_async(funcao, (tarefa,)))
+    while pendentes:
+        yield pendentes.popleft().get()
+
+
+def _progresso(feitos, total, linhas, novos, inicio):
+    decorrido = time.monotonic() - inicio
+    taxa = linhas / decorrido if decorrido else 0
+    pct = 100.0 * feitos / total if total else 100.0
+    sys.stderr.write(f"\r{pct:5.1f}%  {linhas} linhas lidas, {novos} novas, {taxa:,.0f} linhas/s   ")
+    sys.stderr.flush()
+
+
+def importar(caminhos, processos=None, progresso=True):
+    """Importa os arquivos e retorna (linhas lidas, registros novos)."""
+    tarefas = dividir(caminhos)
+    total_bytes = sum(fim - inicio for _, inicio, fim in tarefas)
+
+    with cdr.trava_ingestao(esperar=True):
+        return _importar(tarefas, total_bytes, processos, progresso)
+
+
+def _importar(tarefas, total_bytes, processos, progresso):
+    # WAL com synchronous=NORMAL (get_cdr_db): sem fsync a cada lote e sem
+    # risco de corromper o cdr.db em produção se a máquina cair no meio
+    conn = cdr.get_cdr_db()
+    conn.execute(f"PRAGMA cache_size = -{CACHE_KB}")
+    cdr.remover_indices_busca(conn)
+    conn.commit()
+
+    processos = processos or os.cpu_count() or 1
+    lidas = novos = feitos = 0
+    inicio = time.monotonic()
+    ultimo_aviso = 0
+    try:
+        with Pool(processes=processos) as pool:
+            for (caminho, ini, fim), linhas in em_paralelo(
+                    pool, ler_trecho, tarefas, TAREFAS_POR_PROCESSO * processos):
+                antes = conn.total_changes
+                for i in range(0, len(linhas), LOTE_ESCRITA):
+                    conn.executemany(cdr._SQL_INSERIR, linhas[i:i + LOTE_ESCRITA])
+                conn.commit()
+                novos += conn.total_changes - antes
+                lidas += len(linhas)
+                feitos += fim - ini
+                if progresso and time.monotonic() - ultimo_aviso >= 1:
+                    _progresso(feitos, total_bytes, lidas, novos, inicio)
+                    ultimo_aviso = time.monotonic()
+        if progresso:
+            _progresso(feitos, total_bytes, lidas, novos, inicio)
+            sys.stderr.write("\nRecriando índices e resumos...\n")
+    finally:
+        # Mesmo se interrompida, a base volta a ter índices e resumos coerentes
+        cdr.init_cdr_db(conn)
+        conn.commit()
+        cdr.reconstruir_resumos(conn)
+        conn.close()
+    return lidas, novos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importação em massa de CDR (Master.csv*, .gz)")
+    parser.add_argument("arquivos", nargs="+")
+    parser.add_argument("-j", "--processos", type=int, default=None, help="padrão: nº de CPUs")
+    parser.add_argument("-q", "--silencioso", action="store_true", help="sem barra de progresso")
+    args = parser.parse_args(argv)
+
+    faltando = [a for a in args.arquivos if not os.path.isfile(a)]
+    if faltando:
+        print(f"Arquivo(s) não encontrado(s): {', '.join(faltando)}", file=sys.stderr)
+        return 1
+
+    inicio = time.monotonic()
+    lidas, novos = importar(args.arquivos, args.processos, progresso=not args.silencioso)
+    print(f"{lidas} linhas lidas, {novos} registros novos, {lidas - novos} duplicados/ignorados "
+          f"em {time.monotonic() - inicio:.1f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# /opt/nanosip/migracoes.py
+"""
+Migrações versionadas do nanosip.db, controladas por PRAGMA user_version.
+
+A versão 0 é o esquema criado por database.init_db. Cada migração da lista
+MIGRACOES roda em sua própria transação, junto com a atualização do
+user_version: ou entra inteira ou não entra. Rodar de novo não faz nada.
+
+Executadas na subida do app (app.initialize_database) e antes de gerar a
+configuração do Asterisk (aplicar_config.py).
+
+Uso:
+    python3 migracoes.py [--status]
+"""
+import sys
+
+import database
+
+# (versão, descrição, comandos SQL) em ordem crescente de versão; nunca altere uma já publicada
+MIGRACOES = [
+    (1, "índices das consultas e chaves estrangeiras mais usadas", [
+        "CREATE INDEX IF NOT EXISTS idx_ramal_fila_fila ON ramal_fila (fila_id)",
+        "CREATE INDEX IF NOT EXISTS idx_time_conditions_rota ON time_conditions (rota_id)",
+        "CREATE INDEX IF NOT EXISTS idx_time_conditions_fila ON time_conditions (dest_fila_if_time)",
+        "CREATE INDEX IF NOT EXISTS idx_filas_nome ON filas (nome)",
+        "CREATE INDEX IF NOT EXISTS idx_rotas_fila_else ON rotas (dest_fila_else)",
+    ]),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0] if MIGRACOES else 0
+
+
+def versao(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(caminho=None):
+    """Aplica as migrações pendentes; retorna a versão final do banco."""
+    conn = database.conectar(caminho)
+    try:
+        atual = versao(conn)
+        if atual > VERSAO_ATUAL:
+            print(f"[migracoes] Banco na versão {atual}, mais nova que este código ({VERSAO_ATUAL}). Nada feito.")
+            return atual
+
+        for numero, descricao, comandos in MIGRACOES:
+            if numero <= atual:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Outro processo pode ter migrado enquanto esperávamos o lock
+                if versao(conn) >= numero:
+                    conn.rollback()
+                    atual = versao(conn)
+                    continue
+                for sql in comandos:
+                    conn.execute(sql)
+                conn.execute(f"PRAGMA user_version = {numero}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            atual = numero
+            print(f"[migracoes] Versão {numero} aplicada: {descricao}")
+        return atual
+    finally:
+        conn.fechar()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--status" in argv:
+        conn = database.conectar()
+        try:
+            print(f"Banco na versão {versao(conn)}; código na versão {VERSAO_ATUAL}.")
+        finally:
+            conn.fechar()
+        return 0
+    print(f"Banco na versão {migrar()}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
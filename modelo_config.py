@@ -0,0 +1,132 @@
+# /opt/nanosip/modelo_config.py
+"""
+Modelo de configuração do PABX carregado de uma só vez.
+
+Ramais, filas (com membros), rotas (com horários) e localnets são lidos
+com uma consulta por conjunto, com as chaves estrangeiras resolvidas em
+memória, em vez de uma consulta por fila, rota ou horário. carregar_modelo
+faz tudo em uma única transação de leitura, para que extensions.conf,
+queues.conf e sip.conf saiam do mesmo retrato do banco mesmo que alguém
+salve algo no meio da aplicação. carregar_filas e carregar_rotas atendem
+as telas que só precisam de uma parte.
+
+As linhas são lidas por posição, então funcionam com ou sem sqlite3.Row.
+"""
+from database import get_db
+import sip_realtime
+
+# Ordenações aceitas por carregar_filas/carregar_rotas
+ORDEM_FILAS = {"id": "id", "fila": "fila"}
+ORDEM_ROTAS = {"id": "id", "nome": "nome"}
+
+
+def carregar_filas(db, ordem="id"):
+    """
+    [{id, fila, nome, membros: [{id, ramal, nome}], ramais: [id do ramal]}].
+    Membros na ordem em que foram incluídos na fila.
+    """
+    filas = [
+        {"id": f_id, "fila": fila, "nome": nome, "membros": [], "ramais": []}
+        for f_id, fila, nome in db.execute(
+            f"SELECT id, fila, nome FROM filas ORDER BY {ORDEM_FILAS[ordem]}")
+    ]
+    por_id = {f["id"]: f for f in filas}
+    for fila_id, ramal_id, ramal, nome in db.execute("""
+        SELECT rf.fila_id, r.id, r.ramal, r.nome
+        FROM ramal_fila rf
+        JOIN ramais r ON r.id = rf.ramal_id
+        ORDER BY rf.fila_id, rf.rowid
+    """):
+        fila = por_id.get(fila_id)
+        if fila:
+            fila["membros"].append({"id": ramal_id, "ramal": str(ramal), "nome": nome})
+            fila["ramais"].append(ramal_id)
+    return filas
+
+
+def carregar_rotas(db, filas_por_id=None, ordem="id", time_conditions=True):
+    """
+    [{id, nome, numero_entrada, dest_fila_else, time_conditions: [...]}].
+    Com filas_por_id, resolve também o número das filas de destino
+    (fila_else na rota, fila_if_time em cada horário; None se não existir).
+    """
+    rotas = [
+        {"id": r_id, "nome": nome, "numero_entrada": numero, "dest_fila_else": dest}
+        for r_id, nome, numero, dest in db.execute(
+            f"SELECT id, nome, numero_entrada, dest_fila_else FROM rotas ORDER BY {ORDEM_ROTAS[ordem]}")
+    ]
+
+    def numero_fila(fila_id):
+        fila = filas_por_id.get(fila_id)
+        return fila["fila"] if fila else None
+
+    por_id = {}
+    for rota in rotas:
+        if filas_por_id is not None:
+            rota["fila_else"] = numero_fila(rota["dest_fila_else"])
+        if time_conditions:
+            rota["time_conditions"] = []
+        por_id[rota["id"]] = rota
+    if not time_conditions:
+        return rotas
+
+    for tc_id, rota_id, inicio, fim, dias, dest in db.execute("""
+        SELECT id, rota_id, time_start, time_end, days, dest_fila_if_time
+        FROM time_conditions ORDER BY id
+    """):
+        rota = por_id.get(rota_id)
+        if rota is None:
+            continue
+        tc = {"id": tc_id, "time_start": inicio, "time_end": fim, "days": dias,
+              "dest_fila_if_time": dest}
+        if filas_por_id is not None:
+            tc["fila_if_time"] = numero_fila(dest)
+        rota["time_conditions"].append(tc)
+    return rotas
+
+
+def carregar_modelo(db=None):
+    """
+    Retorna um dict com:
+      ramais       [{id, ramal, nome, senha, contexto}] por ramal
+      filas        carregar_filas(), por id
+      filas_por_id {id: fila}
+      rotas        carregar_rotas() com fila_else/fila_if_time, por nome
+      localnets    [{id, nome, localnet}]
+      sip_realtime True se os peers vêm do Realtime (sip_realtime.py)
+    """
+    fechar = db is None
+    if db is None:
+        db = get_db()
+    # Transação de leitura própria, a menos que o chamador já esteja em uma
+    iniciou = not db.in_transaction
+    try:
+        if iniciou:
+            db.execute("BEGIN")
+        ramais = [
+            {"id": r_id, "ramal": ramal, "nome": nome, "senha": senha, "contexto": contexto}
+            for r_id, ramal, nome, senha, contexto in db.execute(
+                "SELECT id, ramal, nome, senha, contexto FROM ramais ORDER BY ramal")
+        ]
+        filas = carregar_filas(db)
+        filas_por_id = {f["id"]: f for f in filas}
+        rotas = carregar_rotas(db, filas_por_id, ordem="nome")
+        localnets = [
+            {"id": n_id, "nome": nome, "localnet": localnet}
+            for n_id, nome, localnet in db.execute("SELECT id, nome, localnet FROM localnets")
+        ]
+        realtime = sip_realtime.ativo(db)
+        if iniciou:
+            db.commit()
+    finally:
+        if fechar:
+            db.close()
+
+    return {
+        "ramais": ramais,
+        "filas": filas,
+        "filas_por_id": filas_por_id,
+        "rotas": rotas,
+        "localnets": localnets,
+        "sip_realtime": realtime,
+    }
@@ -0,0 +1,223 @@
+# /opt/nanosip/painel_estado.py
+"""
+Estado versionado do painel (ramais, filas e chamadas).
+
+Cada coleta é comparada com a anterior; apenas as entradas alteradas viram
+um evento com número de versão crescente. Um histórico curto desses eventos
+permite que um cliente retome o fluxo a partir da última versão recebida.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+SECOES = {"ramais": "ramal", "filas": "fila", "chamadas": "id"}
+
+# Campos recalculados a cada coleta que não representam mudança de estado
+# (a duração da chamada é derivada de 'inicio' no navegador)
+CAMPOS_VOLATEIS = {"duracao"}
+
+CACHE_TTL = float(os.environ.get("NANOSIP_PAINEL_TTL", "1.0"))
+HISTORICO_MAX = 500
+INTERVALO_COLETA = 5
+ESPERA_AGRUPAMENTO = 0.2
+
+
+def indexar(dados):
+    """Converte as listas de ramais/filas/chamadas em dicionários por chave."""
+    estado = {}
+    for secao, campo in SECOES.items():
+        estado[secao] = {
+            str(item[campo]): {k: v for k, v in item.items() if k not in CAMPOS_VOLATEIS}
+            for item in dados.get(secao, [])
+        }
+    return estado
+
+
+class PainelEventos:
+    """Diário de mudanças do painel, com versão monotônica e histórico limitado."""
+
+    def __init__(self, historico=HISTORICO_MAX):
+        self._cond = threading.Condition()
+        self._estado = {secao: {} for secao in SECOES}
+        self._historico = deque(maxlen=historico)
+        self._publicador = None
+        self.versao = 0
+
+    def atualizar(self, dados):
+        """Registra uma nova coleta e retorna a versão resultante."""
+        novo = indexar(dados)
+        with self._cond:
+            mudancas = []
+            for secao in SECOES:
+                antigo, atual = self._estado[secao], novo[secao]
+                for chave, item in atual.items():
+                    if antigo.get(chave) != item:
+                        mudancas.append({"tipo": secao, "chave": chave, "dados": item})
+                for chave in antigo.keys() - atual.keys():
+                    mudancas.append({"tipo": secao, "chave": chave, "dados": None})
+
+            if mudancas:
+                self.versao += 1
+                self._estado = novo
+                self._historico.append((self.versao, mudancas))
+                self._cond.notify_all()
+            return self.versao
+
+    def snapshot(self):
+        """Retorna (versão, estado completo indexado)."""
+        with self._cond:
+            return self.versao, self._estado
+
+    def mudancas_desde(self, versao):
+        """
+        Lista de (versão, mudanças) posteriores à versão informada, ou None se
+        ela não puder ser reconstruída pelo histórico (muito antiga ou inválida).
+        """
+        with self._cond:
+            if versao == self.versao:
+                return []
+            if versao > self.versao or not self._historico:
+                return None
+            if versao < self._historico[0][0] - 1:
+                return None
+            return [(v, m) for v, m in self._historico if v > versao]
+
+    def delta(self, versao):
+        """
+        Retorna (versão atual, mudanças agrupadas por seção desde 'versao').
+        Cada seção mapeia chave -> dados, ou None para entradas removidas.
+        Se a versão não estiver coberta pelo histórico, as mudanças são None.
+        """
+        with self._cond:
+            pendentes = self.mudancas_desde(versao)
+            if pendentes is None:
+                return self.versao, None
+            agrupado = {secao: {} for secao in SECOES}
+            for _, mudancas in pendentes:
+                for m in mudancas:
+                    agrupado[m["tipo"]][m["chave"]] = m["dados"]
+            return self.versao, agrupado
+
+    def aguardar(self, versao, timeout):
+        """Bloqueia até existir versão diferente da informada (ou até o timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.versao != versao, timeout)
+            return self.versao
+
+    # --- Coleta em segundo plano ---
+
+    def iniciar_publicador(self, coletor, estado_ami):
+        """
+        Inicia (uma única vez) a thread que recoleta o painel a cada mudança
+        no modelo AMI, ou a cada INTERVALO_COLETA segundos para refletir
+        alterações do banco. O coletor é responsável por chamar atualizar().
+        """
+        with self._cond:
+            if self._publicador and self._publicador.is_alive():
+                return
+            self._publicador = threading.Thread(
+                target=self._publicar, args=(coletor, estado_ami),
+                name="nanosip-painel", daemon=True
+            )
+            self._publicador.start()
+
+    def _publicar(self, coletor, estado_ami):
+        versao_ami = None
+        while True:
+            nova = estado_ami.aguardar_mudanca(versao_ami, INTERVALO_COLETA)
+            if nova != versao_ami:
+                # Agrupa rajadas de eventos AMI de uma mesma chamada
+                time.sleep(ESPERA_AGRUPAMENTO)
+                versao_ami = estado_ami.versao
+            try:
+                coletor()
+            except Exception as e:
+                print(f"[Painel] Erro ao coletar estado: {e}")
+
+
+# ========================================================
+# ⚡ Cache de snapshot com coleta única (single-flight)
+# ========================================================
+
+class CacheSnapshot:
+    """
+    Guarda a última coleta do painel por 'ttl' segundos.
+    Requisições simultâneas com o cache expirado aguardam a mesma coleta
+    em andamento em vez de cada uma disparar a sua.
+    """
+
+    def __init__(self, coletor, ttl=CACHE_TTL):
+        self._coletor = coletor
+        self.ttl = ttl
+        self._cond = threading.Condition()
+        self._valor = None
+        self._coletado_em = 0.0
+        self._coletando = False
+        self._geracao = 0
+        self._metricas = {
+            "hits": 0, "misses": 0, "aguardaram": 0, "erros": 0,
+            "coletas": 0, "duracao_total": 0.0, "duracao_ultima": 0.0, "duracao_max": 0.0,
+        }
+
+    def obter(self, ttl=None):
+        """Retorna o snapshot em cache ou coleta um novo (uma coleta por vez)."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._cond:
+            while True:
+                if self._valor is not None and time.monotonic() - self._coletado_em < ttl:
+                    self._metricas["hits"] += 1
+                    return self._valor
+                if not self._coletando:
+                    break
+                # Outra requisição já está coletando: aguarda o resultado dela
+                self._metricas["aguardaram"] += 1
+                geracao, coletado_antes = self._geracao, self._coletado_em
+                self._cond.wait_for(lambda: self._geracao != geracao)
+                if self._coletado_em != coletado_antes:
+                    return self._valor
+                # A coleta em andamento falhou: tenta novamente
+            self._metricas["misses"] += 1
+            self._coletando = True
+
+        inicio = time.perf_counter()
+        try:
+            valor = self._coletor()
+        except Exception:
+            with self._cond:
+                self._metricas["erros"] += 1
+                self._coletando = False
+                self._geracao += 1
+                self._cond.notify_all()
+            raise
+        duracao = time.perf_counter() - inicio
+
+        with self._cond:
+            self._valor = valor
+            self._coletado_em = time.monotonic()
+            self._coletando = False
+            self._geracao += 1
+            m = self._metricas
+            m["coletas"] += 1
+            m["duracao_total"] += duracao
+            m["duracao_ultima"] = duracao
+            m["duracao_max"] = max(m["duracao_max"], duracao)
+            self._cond.notify_all()
+        return valor
+
+    def metricas(self):
+        with self._cond:
+            m = dict(self._metricas)
+        consultas = m["hits"] + m["misses"] + m["aguardaram"]
+        return {
+            "ttl": self.ttl,
+            "hits": m["hits"],
+            "misses": m["misses"],
+            "aguardaram": m["aguardaram"],
+            "erros": m["erros"],
+            "coletas": m["coletas"],
+            "taxa_hits": round((m["hits"] + m["aguardaram"]) / consultas, 4) if consultas else 0.0,
+            "duracao_ultima_ms": round(m["duracao_ultima"] * 1000, 2),
+            "duracao_media_ms": round(m["duracao_total"] / m["coletas"] * 1000, 2) if m["coletas"] else 0.0,
+            "duracao_max_ms": round(m["duracao_max"] * 1000, 2),
+        }
@@ -0,0 +1,305 @@
+# /opt/nanosip/queue_log.py
+"""
+Leitor incremental do /var/log/asterisk/queue_log.
+
+Acompanha o arquivo a partir do último byte lido (offset + inode salvos em
+um checkpoint), sobrevive à rotação do log e mantém estatísticas por fila
+em uma janela deslizante: chamadas ofertadas, atendidas e abandonadas,
+espera média e máxima e nível de serviço (SLA).
+"""
+import json
+import os
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUEUE_LOG_PATH = "/var/log/asterisk/queue_log"
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "queue_log.pos")
+
+JANELA = 3600               # segundos cobertos pelas estatísticas
+BALDES = 60                 # janela dividida em baldes de JANELA/BALDES segundos
+SLA_SEGUNDOS = 20           # atendida dentro deste tempo conta para o SLA
+INTERVALO_LEITURA = 1       # segundos entre verificações do arquivo
+INTERVALO_CHECKPOINT = 10   # segundos entre gravações do checkpoint
+BOOTSTRAP_BYTES = 1024 * 1024  # sem checkpoint, lê apenas o final do arquivo
+BLOCO_LEITURA = 256 * 1024
+
+EVENTOS_ABANDONO = {"ABANDON", "EXITWITHTIMEOUT", "EXITEMPTY", "EXITWITHKEY"}
+
+# Posição (campos após 'evento') do tempo de espera em cada evento
+_CAMPO_ESPERA = {
+    "CONNECT": 0,           # CONNECT|holdtime|bridgedchan|ringtime
+    "ABANDON": 2,           # ABANDON|position|origposition|waittime
+    "EXITWITHTIMEOUT": 2,   # EXITWITHTIMEOUT|position|origposition|waittime
+    "EXITEMPTY": 2,         # EXITEMPTY|position|origposition|waittime
+    "EXITWITHKEY": 3,       # EXITWITHKEY|key|position|origposition|waittime
+}
+
+# Índices dos contadores de cada balde
+_INICIO, _OFERTADAS, _ATENDIDAS, _ABANDONADAS, _NO_SLA, _ESPERA_SOMA, _ESPERA_QTD, _ESPERA_MAX = range(8)
+
+
+def _balde_vazio(inicio):
+    return [inicio, 0, 0, 0, 0, 0, 0, 0]
+
+
+class EstatisticasFila:
+    """Janela deslizante em baldes fixos: O(1) por evento, O(BALDES) por leitura."""
+
+    def __init__(self, baldes=None):
+        self.largura = JANELA // BALDES
+        self.baldes = baldes or [_balde_vazio(-1) for _ in range(BALDES)]
+
+    def _balde(self, ts):
+        indice = int(ts) // self.largura
+        balde = self.baldes[indice % BALDES]
+        if balde[_INICIO] != indice:
+            balde[:] = _balde_vazio(indice)
+        return balde
+
+    def registrar(self, ts, evento, espera=None):
+        balde = self._balde(ts)
+        if evento == "ENTERQUEUE":
+            balde[_OFERTADAS] += 1
+            return
+        if evento == "CONNECT":
+            balde[_ATENDIDAS] += 1
+            if espera is not None and espera <= SLA_SEGUNDOS:
+                balde[_NO_SLA] += 1
+        elif evento in EVENTOS_ABANDONO:
+            balde[_ABANDONADAS] += 1
+        if espera is not None:
+            balde[_ESPERA_SOMA] += espera
+            balde[_ESPERA_QTD] += 1
+            balde[_ESPERA_MAX] = max(balde[_ESPERA_MAX], espera)
+
+    def resumo(self, agora=None):
+        atual = int(agora or time.time()) // self.largura
+        total = _balde_vazio(0)
+        for balde in self.baldes:
+            if atual - BALDES < balde[_INICIO] <= atual:
+                for i in (_OFERTADAS, _ATENDIDAS, _ABANDONADAS, _NO_SLA, _ESPERA_SOMA, _ESPERA_QTD):
+                    total[i] += balde[i]
+                total[_ESPERA_MAX] = max(total[_ESPERA_MAX], balde[_ESPERA_MAX])
+
+        finalizadas = total[_ATENDIDAS] + total[_ABANDONADAS]
+        return {
+            "ofertadas": total[_OFERTADAS],
+            "atendidas": total[_ATENDIDAS],
+            "abandonadas": total[_ABANDONADAS],
+            "espera_media": round(total[_ESPERA_SOMA] / total[_ESPERA_QTD], 1) if total[_ESPERA_QTD] else 0,
+            "espera_max": total[_ESPERA_MAX],
+            "sla": round(100.0 * total[_NO_SLA] / finalizadas, 1) if finalizadas else None,
+        }
+
+
+class TailerQueueLog:
+    """Lê o queue_log incrementalmente em uma thread e mantém as estatísticas."""
+
+    def __init__(self, caminho=QUEUE_LOG_PATH, checkpoint=CHECKPOINT_PATH):
+        self.caminho = caminho
+        self.checkpoint = checkpoint
+        self._lock = threading.Lock()
+        self._filas = {}
+        self._inode = None
+        self._offset = 0
+        self._arquivo = None
+        self._thread = None
+        self._ultimo_checkpoint = 0
+        self._carregar_checkpoint()
+
+    # --- Checkpoint ---
+
+    def _carregar_checkpoint(self):
+        try:
+            with open(self.checkpoint) as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._inode = dados.get("inode")
+        self._offset = dados.get("offset", 0)
+        for fila, baldes in dados.get("filas", {}).items():
+            if len(baldes) == BALDES:
+                self._filas[fila] = EstatisticasFila(baldes)
+
+    def salvar_checkpoint(self):
+        with self._lock:
+            dados = {
+                "inode": self._inode,
+                "offset": self._offset,
+                "filas": {fila: est.baldes for fila, est in self._filas.items()},
+            }
+        tmp = f"{self.checkpoint}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(dados, f)
+            os.replace(tmp, self.checkpoint)
+        except OSError as e:
+            print(f"[queue_log] Erro ao salvar checkpoint: {e}")
+        self._ultimo_checkpoint = time.monotonic()
+
+    # --- Leitura incremental ---
+
+    def _abrir(self, caminho, inode, offset):
+        arquivo = open(caminho, "rb")
+        arquivo.seek(offset)
+        self._arquivo, self._inode, self._offset = arquivo, inode, offset
+
+    def _abrir_inicial(self, st):
+        """Primeira abertura: retoma do checkpoint, inclusive se o log já rodou."""
+        if self._inode == st.st_ino and self._offset <= st.st_size:
+            self._abrir(self.caminho, st.st_ino, self._offset)
+            return
+
+        if self._inode is not None:
+            # Arquivo rodou com o serviço parado: termina o antigo, se ainda existir
+            rodado = f"{self.caminho}.1"
+            try:
+                if os.stat(rodado).st_ino == self._inode:
+                    self._abrir(rodado, self._inode, self._offset)
+                    self._ler_ate_o_fim()
+                    self._arquivo.close()
+            except OSError:
+                pass
+            self._abrir(self.caminho, st.st_ino, 0)
+            return
+
+        # Sem checkpoint: evita reler o histórico, só o trecho final interessa à janela
+        inicio = max(0, st.st_size - BOOTSTRAP_BYTES)
+        self._abrir(self.caminho, st.st_ino, inicio)
+        if inicio:
+            self._offset += len(self._arquivo.readline())
+
+    def _ler_ate_o_fim(self):
+        limite = time.time() - JANELA
+        while True:
+            bloco = self._arquivo.read(BLOCO_LEITURA)
+            if not bloco:
+                return
+            fim = bloco.rfind(b"\n")
+            if fim < 0 and len(bloco) == BLOCO_LEITURA:
+                # Linha maior que o bloco (ou lixo de um log corrompido): descarta até
+                # a próxima quebra, senão a mesma leitura se repetiria para sempre
+                self._descartar_linha(len(bloco))
+                continue
+            if fim < 0:
+                # Linha ainda incompleta: volta para relê-la na próxima passada
+                self._arquivo.seek(self._offset)
+                return
+            completo = bloco[:fim + 1]
+            self._arquivo.seek(self._offset + len(completo))
+            with self._lock:
+                for linha in completo.decode("utf-8", errors="replace").splitlines():
+                    self._processar_linha(linha, limite)
+                self._offset += len(completo)
+            if len(bloco) < BLOCO_LEITURA:
+                return
+
+    def _descartar_linha(self, descartados):
+        """Avança o offset até depois da próxima quebra de linha (ou até o fim do arquivo)."""
+        while True:
+            trecho = self._arquivo.read(BLOCO_LEITURA)
+            if not trecho:
+                break
+            pos = trecho.find(b"\n")
+            if pos >= 0:
+                descartados += pos + 1
+                break
+            descartados += len(trecho)
+        print(f"[queue_log] Linha com mais de {BLOCO_LEITURA} bytes descartada ({descartados} bytes)")
+        with self._lock:
+            self._offset += descartados
+        self._arquivo.seek(self._offset)
+
+    def _processar_linha(self, linha, limite):
+        partes = linha.split("|")
+        if len(partes) < 5:
+            return
+        try:
+            ts = int(partes[0])
+        except ValueError:
+            return
+        fila, evento, dados = partes[2], partes[4], partes[5:]
+        if ts < limite or fila == "NONE":
+            return
+        if evento != "ENTERQUEUE" and evento not in _CAMPO_ESPERA:
+            return
+
+        espera = None
+        campo = _CAMPO_ESPERA.get(evento)
+        if campo is not None and len(dados) > campo:
+            try:
+                espera = int(dados[campo])
+            except ValueError:
+                pass
+
+        est = self._filas.get(fila)
+        if est is None:
+            est = self._filas[fila] = EstatisticasFila()
+        est.registrar(ts, evento, espera)
+
+    def verificar(self):
+        """Uma passada: detecta rotação/truncamento e processa as linhas novas."""
+        try:
+            st = os.stat(self.caminho)
+        except FileNotFoundError:
+            return
+
+        if self._arquivo is None:
+            self._abrir_inicial(st)
+        elif st.st_ino != self._inode:
+            # Rotação: termina o arquivo antigo (ainda aberto) e passa para o novo
+            self._ler_ate_o_fim()
+            self._arquivo.close()
+            self._abrir(self.caminho, st.st_ino, 0)
+        elif st.st_size < self._offset:
+            # Truncado no lugar (copytruncate)
+            self._arquivo.seek(0)
+            self._offset = 0
+
+        self._ler_ate_o_fim()
+
+        if time.monotonic() - self._ultimo_checkpoint >= INTERVALO_CHECKPOINT:
+            self.salvar_checkpoint()
+
+    # --- Thread e leitura das estatísticas ---
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._executar, name="nanosip-queue-log", daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        while True:
+            try:
+                self.verificar()
+            except Exception as e:
+                print(f"[queue_log] Erro ao ler {self.caminho}: {e}")
+                if self._arquivo:
+                    self._arquivo.close()
+                    self._arquivo = None
+            time.sleep(INTERVALO_LEITURA)
+
+    def estatisticas(self):
+        """Resumo da janela atual para cada fila: {fila: {...}}."""
+        agora = time.time()
+        with self._lock:
+            return {fila: est.resumo(agora) for fila, est in self._filas.items()}
+
+
+_tailer = None
+_init_lock = threading.Lock()
+
+
+def get_tailer():
+    """Retorna o leitor compartilhado, iniciando a thread na primeira chamada."""
+    global _tailer
+    if _tailer is None:
+        with _init_lock:
+            if _tailer is None:
+                tailer = TailerQueueLog()
+                tailer.iniciar()
+                _tailer = tailer
+    return _tailer
@@ -0,0 +1,157 @@
+# /opt/nanosip/ramais_csv.py
+"""
+Importação e exportação de ramais (e das filas de cada ramal) em CSV.
+
+Colunas: ramal, nome, senha, filas. A coluna filas é opcional e traz os
+números das filas separados por espaço ou '|' (ex.: "800 801"). O separador
+do arquivo pode ser ';' ou ','; o cabeçalho é opcional.
+
+A importação valida o arquivo inteiro de uma vez contra ramais, filas e
+números de entrada das rotas (uma consulta por tabela) e só grava se não
+houver nenhum erro, em uma única transação com executemany. No modo
+Realtime os triggers mantêm sip_peers em dia.
+"""
+import csv
+import io
+import re
+
+from database import conectar, unidade_de_trabalho
+from sip_realtime import podar_peer
+
+CAMPOS_CSV = ["ramal", "nome", "senha", "filas"]
+CONTEXTO_PADRAO = "interno"
+LOTE_EXPORTACAO = 1000     # linhas por bloco enviado
+MAX_ERROS_EXIBIDOS = 10
+
+_SENHA_VALIDA = re.compile(r"^[a-zA-Z0-9]+$")     # mesma regra do formulário de ramal
+_SEPARADOR_FILAS = re.compile(r"[\s|]+")    # não ',': é também separador do arquivo
+
+
+def ler_csv(texto):
+    """Converte o CSV em [(linha, ramal, nome, senha, [filas])]; retorna (linhas, erros)."""
+    primeira = texto.split("\n", 1)[0]
+    delimitador = ";" if ";" in primeira else ","
+    linhas, erros, vistos = [], [], {}
+
+    for numero, campos in enumerate(csv.reader(io.StringIO(texto), delimiter=delimitador), 1):
+        campos = [c.strip() for c in campos]
+        if not any(campos):
+            continue
+        if numero == 1 and campos[0].lower() == "ramal":
+            continue
+        if len(campos) > len(CAMPOS_CSV):
+            # Em geral filas separadas por ',' num arquivo separado por ','
+            erros.append(f"Linha {numero}: {len(campos)} colunas, o máximo é {len(CAMPOS_CSV)} "
+                         f"({', '.join(CAMPOS_CSV)}). Separe as filas por espaço ou '|'.")
+            continue
+        campos += [""] * (len(CAMPOS_CSV) - len(campos))
+        ramal, nome, senha, filas = campos[:4]
+
+        try:
+            ramal = int(ramal)
+            if ramal <= 0:
+                raise ValueError
+        except ValueError:
+            erros.append(f"Linha {numero}: ramal '{ramal}' não é um número válido.")
+            continue
+        if not nome:
+            erros.append(f"Linha {numero}: ramal {ramal} sem nome.")
+        if not _SENHA_VALIDA.match(senha):
+            erros.append(f"Linha {numero}: a senha do ramal {ramal} deve ter apenas letras e números.")
+        if ramal in vistos:
+            erros.append(f"Linha {numero}: ramal {ramal} repetido (já aparece na linha {vistos[ramal]}).")
+        vistos.setdefault(ramal, numero)
+
+        try:
+            filas = sorted({int(f) for f in _SEPARADOR_FILAS.split(filas) if f})
+        except ValueError:
+            erros.append(f"Linha {numero}: filas inválidas '{filas}'.")
+            continue
+        linhas.append((numero, ramal, nome, senha, filas))
+    return linhas, erros
+
+
+def validar(db, linhas, atualizar=False):
+    """
+    Confere as linhas contra o banco de uma vez. Retorna (erros, ids_ramais, ids_filas),
+    com os ids dos ramais já cadastrados e de todas as filas, por número.
+    """
+    ids_ramais = {ramal: r_id for r_id, ramal in db.execute("SELECT id, ramal FROM ramais")}
+    ids_filas = {fila: f_id for f_id, fila in db.execute("SELECT id, fila FROM filas")}
+    entradas = {str(n) for (n,) in db.execute("SELECT numero_entrada FROM rotas")}
+
+    erros = []
+    for numero, ramal, _, _, filas in linhas:
+        if ramal in ids_ramais and not atualizar:
+            erros.append(f"Linha {numero}: já existe um ramal com o número {ramal}.")
+        if ramal in ids_filas:
+            erros.append(f"Linha {numero}: o número {ramal} já está em uso por uma fila.")
+        if str(ramal) in entradas:
+            erros.append(f"Linha {numero}: o número {ramal} já é número de entrada de uma rota.")
+        inexistentes = [str(f) for f in filas if f not in ids_filas]
+        if inexistentes:
+            erros.append(f"Linha {numero}: fila(s) inexistente(s): {', '.join(inexistentes)}.")
+    return erros, ids_ramais, ids_filas
+
+
+def importar_ramais(texto, atualizar=False):
+    """
+    Importa o CSV inteiro ou nada. Com atualizar, ramais já cadastrados têm
+    nome e senha atualizados e passam a pertencer só às filas do arquivo.
+    Retorna (sucesso, mensagem, erros).
+    """
+    linhas, erros = ler_csv(texto)
+    if not linhas and not erros:
+        return False, "Nenhum ramal encontrado no arquivo.", []
+
+    with unidade_de_trabalho() as db:
+        erros_banco, ids_ramais, ids_filas = validar(db, linhas, atualizar)
+        erros += erros_banco
+        if erros:
+            return False, f"Nenhum ramal importado: {len(erros)} erro(s) no arquivo.", erros
+
+        novos = [(ramal, nome, senha, CONTEXTO_PADRAO) for _, ramal, nome, senha, _ in linhas
+                 if ramal not in ids_ramais]
+        existentes = [(nome, senha, ids_ramais[ramal]) for _, ramal, nome, senha, _ in linhas
+                      if ramal in ids_ramais]
+
+        db.executemany("INSERT INTO ramais (ramal, nome, senha, contexto) VALUES (?, ?, ?, ?)", novos)
+        if existentes:
+            db.executemany("UPDATE ramais SET nome = ?, senha = ? WHERE id = ?", existentes)
+            db.executemany("DELETE FROM ramal_fila WHERE ramal_id = ?", [(r_id,) for _, _, r_id in existentes])
+        if novos:
+            ids_ramais = {ramal: r_id for r_id, ramal in db.execute("SELECT id, ramal FROM ramais")}
+
+        db.executemany(
+            "INSERT OR IGNORE INTO ramal_fila (ramal_id, fila_id) VALUES (?, ?)",
+            [(ids_ramais[ramal], ids_filas[f]) for _, ramal, _, _, filas in linhas for f in filas])
+
+    if existentes:
+        # Senhas alteradas: descarta os peers em cache no modo Realtime
+        podar_peer("all")
+    return True, f"{len(novos)} ramal(is) criado(s) e {len(existentes)} atualizado(s).", []
+
+
+def exportar_ramais():
+    """Gera o CSV de ramais em blocos, no mesmo formato aceito pela importação."""
+    conn = conectar()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        writer.writerow(CAMPOS_CSV)
+        cursor = conn.execute("""
+            SELECT r.ramal, r.nome, r.senha,
+                   (SELECT group_concat(fila, ' ') FROM (
+                        SELECT f.fila FROM ramal_fila rf JOIN filas f ON f.id = rf.fila_id
+                        WHERE rf.ramal_id = r.id ORDER BY f.fila))
+            FROM ramais r ORDER BY r.ramal
+        """)
+        for i, (ramal, nome, senha, filas) in enumerate(cursor, 1):
+            writer.writerow([ramal, nome, senha, filas or ""])
+            if i % LOTE_EXPORTACAO == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        conn.fechar()
@@ -1,40 +1,92 @@
-import os
-from database import get_db
 from licenca import get_modulos
+from modelo_config import carregar_modelo
 
 EXTENSIONS_CONF_PATH = '/etc/asterisk/extensions.conf'
 
-# --- Funções de Busca no Banco de Dados ---
-def get_all_peers(db):
-    peers_raw = db.execute("SELECT ramal FROM ramais ORDER BY ramal").fetchall()
-    return [str(p['ramal']) for p in peers_raw]
-
-def get_all_queues(db):
-    queues_raw = db.execute("SELECT fila FROM filas ORDER BY fila").fetchall()
-    return [str(q['fila']) for q in queues_raw]
-
-def get_all_routes(db):
-    routes_raw = db.execute("SELECT * FROM rotas ORDER BY nome").fetchall()
-    routes = []
-    for r in routes_raw:
-        time_conditions = db.execute(
-            "SELECT * FROM time_conditions WHERE rota_id = ?", (r['id'],)
-        ).fetchall()
-        r = dict(r)
-        r['time_conditions'] = [dict(tc) for tc in time_conditions]
-        routes.append(r)
-    return routes
-
-# --- Função Principal de Geração ---
-def generate_extensions_conf():
-    print("Iniciando a geração do arquivo extensions.conf...")
-    db = get_db()
+# Sub-rotina de gravação: ARG1 é o número discado (dentro do Gosub ${EXTEN} vira 's').
+# O nome do arquivo segue o padrão origem-destino-uniqueid usado por gravacoes.py.
+CONTEXTO_GRAVACAO = "nanosip-gravar"
+DIAS_SEMANA = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+# --- Compilação das condições de horário ---
+def intervalos_dias(days):
+    """
+    Converte a lista de dias do cadastro ("mon,tue,wed,fri") na sintaxe de
+    dias do GotoIfTime, juntando dias seguidos em intervalos ("mon-wed&fri").
+    Valores fora de mon..sun são mantidos como vieram.
+    """
+    informados = [d.strip().lower() for d in days.split(',') if d.strip()]
+    conhecidos = sorted({d for d in informados if d in DIAS_SEMANA}, key=DIAS_SEMANA.index)
+    outros = [d for d in informados if d not in DIAS_SEMANA]
+
+    partes = []
+    inicio = anterior = None
+    for dia in conhecidos:
+        indice = DIAS_SEMANA.index(dia)
+        if anterior is not None and indice == anterior + 1:
+            anterior = indice
+            continue
+        if inicio is not None:
+            partes.append((inicio, anterior))
+        inicio = anterior = indice
+    if inicio is not None:
+        partes.append((inicio, anterior))
+
+    textos = [DIAS_SEMANA[a] if a == b else f"{DIAS_SEMANA[a]}-{DIAS_SEMANA[b]}" for a, b in partes]
+    return "&".join(textos + outros)
+
+def _bloco_fila(fila, gravar_chamadas, comentario="", atender=False):
+    """Prioridades 'same =>' que gravam (opcional), entram na fila e desligam."""
+    linhas = []
+    if gravar_chamadas:
+        linhas.append(f" same => n,Gosub({CONTEXTO_GRAVACAO},s,1(${{EXTEN}}))")
+        if atender:
+            linhas.append(" same => n,Answer()")
+    linhas.append(f" same => n,Queue({fila}){comentario}")
+    if gravar_chamadas:
+        linhas.append(" same => n,StopMixMonitor()")
+    return linhas
+
+def compilar_rota(route, gravar_chamadas):
+    """
+    Dialplan de uma rota de entrada: um GotoIfTime por condição de horário
+    (dias seguidos agrupados), o destino fora do horário e um bloco rotulado
+    por condição de horário.
+    """
+    exten = route['numero_entrada']
+    linhas = [
+        f"\n; Rota: {route['nome']}",
+        f"exten => {exten},1,NoOp(### Rota de Entrada: {route['nome']} para o numero {exten} ###)",
+    ]
 
-    peers = get_all_peers(db)
-    queues = get_all_queues(db)
-    routes = get_all_routes(db)
-    MODULOS = get_modulos()
-    gravar_chamadas = 'record' in MODULOS.lower().split(',')
+    horarios = []
+    for i, tc in enumerate(route['time_conditions'], start=1):
+        dias = intervalos_dias(tc['days'])
+        if tc['fila_if_time'] is None or not dias:
+            continue
+        rotulo = f"horario-{i}"
+        horarios.append((rotulo, tc['fila_if_time']))
+        linhas.append(f" same => n,GotoIfTime({tc['time_start']}-{tc['time_end']},{dias},*,*?{rotulo})")
+
+    # Fora do horário (ou rota sem condição de horário)
+    if route['fila_else']:
+        comentario = " ; Rota fora do horario" if horarios else ""
+        linhas.extend(_bloco_fila(route['fila_else'], gravar_chamadas, comentario))
+    linhas.append(" same => n,Hangup()")
+
+    # Dentro do horário
+    for rotulo, fila in horarios:
+        linhas.append(f" same => n({rotulo}),NoOp(### Dentro do horario ###)")
+        linhas.extend(_bloco_fila(fila, gravar_chamadas, " ; Rota dentro do horario", atender=True))
+        linhas.append(" same => n,Hangup()")
+    return linhas
+
+# --- Geração (função pura: modelo -> texto) ---
+def render_extensions_conf(modelo, gravar_chamadas):
+    """Gera o conteúdo do extensions.conf a partir do modelo (modelo_config.carregar_modelo)."""
+    peers = [str(r['ramal']) for r in modelo['ramais']]
+    queues = [str(f['fila']) for f in sorted(modelo['filas'], key=lambda f: f['fila'])]
+    routes = modelo['rotas']
 
     conf_parts = [
         "; Arquivo gerado automaticamente pelo Micro PABX",
@@ -51,79 +103,7 @@ def generate_extensions_conf():
     if routes:
         conf_parts.append("\n; --- Regras Customizadas: Rotas de Entrada ---")
         for route in routes:
-            exten = route['numero_entrada']
-
-            fila_else_num = None
-            if route['dest_fila_else']:
-                fila_else_row = db.execute(
-                    "SELECT fila FROM filas WHERE id = ?", (route['dest_fila_else'],)
-                ).fetchone()
-                if fila_else_row:
-                    fila_else_num = fila_else_row['fila']
-
-            conf_parts.append(f"\n; Rota: {route['nome']}")
-            conf_parts.append(f"exten => {exten},1,NoOp(### Rota de Entrada: {route['nome']} para o numero {exten} ###)")
-
-            if route['time_conditions']:
-                for tc in route['time_conditions']:
-                    if not tc['dest_fila_if_time']:
-                        continue
-                    fila_if_time_row = db.execute(
-                        "SELECT fila FROM filas WHERE id = ?", (tc['dest_fila_if_time'],)
-                    ).fetchone()
-                    if not fila_if_time_row:
-                        continue
-                    fila_if_time_num = fila_if_time_row['fila']
-                    time_start = tc['time_start']
-                    time_end = tc['time_end']
-                    days = tc['days'].split(',')
-
-                    for day in days:
-                        day = day.strip()
-                        if not day:
-                            continue
-                        timestart = time_start.replace(':','-')
-                        conf_parts.append(
-                            f"exten => {exten},n,GotoIfTime({time_start}-{time_end},{day},*,*?time-{day}-{timestart})"
-                        )
-
-                    # Fora do horário
-                    if fila_else_num:
-                        if gravar_chamadas:
-                            conf_parts.append(f"exten => {exten},n,Set(UNIQUEID_SAFE=${{CUT(UNIQUEID,.,1)}})")
-                            conf_parts.append(f"exten => {exten},n,Set(ARQUIVO=${{CALLERID(num)}}-${{EXTEN}}-${{UNIQUEID_SAFE}})")
-                            conf_parts.append(f"exten => {exten},n,MixMonitor(${{ARQUIVO}}.wav,b)")
-                        conf_parts.append(f"exten => {exten},n,Queue({fila_else_num}) ; Rota fora do horario")
-                        if gravar_chamadas:
-                            conf_parts.append(f"exten => {exten},n,StopMixMonitor()")
-                    conf_parts.append(f"exten => {exten},n,Hangup()")
-
-                    # Dentro do horário
-                    for day in days:
-                        day = day.strip()
-                        if not day:
-                            continue
-                        conf_parts.append(f"exten => {exten},n(time-{day}-{timestart})")
-                        if gravar_chamadas:
-                            conf_parts.append(f"exten => {exten},n,Set(UNIQUEID_SAFE=${{CUT(UNIQUEID,.,1)}})")
-                            conf_parts.append(f"exten => {exten},n,Set(ARQUIVO=${{CALLERID(num)}}-${{EXTEN}}-${{UNIQUEID_SAFE}})")
-                            conf_parts.append(f"exten => {exten},n,MixMonitor(${{ARQUIVO}}.wav,b)")
-                            conf_parts.append(f"exten => {exten},n,Answer()")
-                        conf_parts.append(f"exten => {exten},n,Queue({fila_if_time_num}) ; Rota dentro do horario")
-                        if gravar_chamadas:
-                            conf_parts.append(f"exten => {exten},n,StopMixMonitor()")
-                        conf_parts.append(f"exten => {exten},n,Hangup()")
-            else:
-                # Sem time condition
-                if fila_else_num:
-                    if gravar_chamadas:
-                        conf_parts.append(f"exten => {exten},n,Set(UNIQUEID_SAFE=${{CUT(UNIQUEID,.,1)}})")
-                        conf_parts.append(f"exten => {exten},n,Set(ARQUIVO=${{CALLERID(num)}}-${{EXTEN}}-${{UNIQUEID_SAFE}})")
-                        conf_parts.append(f"exten => {exten},n,MixMonitor(${{ARQUIVO}}.wav,b)")
-                    conf_parts.append(f"exten => {exten},n,Queue({fila_else_num})")
-                    if gravar_chamadas:
-                        conf_parts.append(f"exten => {exten},n,StopMixMonitor()")
-                conf_parts.append(f"exten => {exten},n,Hangup()")
+            conf_parts.extend(compilar_rota(route, gravar_chamadas))
 
     # --- Chamadas para Filas ---
     if queues:
@@ -131,14 +111,12 @@ def generate_extensions_conf():
         for queue in queues:
             conf_parts.append(f"exten => {queue},1,NoOp(### Chamada interna para Fila ${{EXTEN}} ###)")
             if gravar_chamadas:
-                conf_parts.append(f"exten => {queue},n,Set(UNIQUEID_SAFE=${{CUT(UNIQUEID,.,1)}})")
-                conf_parts.append(f"exten => {queue},n,Set(ARQUIVO=${{CALLERID(num)}}-${{EXTEN}}-${{UNIQUEID_SAFE}})")
-                conf_parts.append(f"exten => {queue},n,MixMonitor(${{ARQUIVO}}.wav,b)")
-            conf_parts.append(f"exten => {exten},n,Answer()")
-            conf_parts.append(f"exten => {queue},n,Queue(${{EXTEN}})")
+                conf_parts.append(f" same => n,Gosub({CONTEXTO_GRAVACAO},s,1(${{EXTEN}}))")
+            conf_parts.append(" same => n,Answer()")
+            conf_parts.append(" same => n,Queue(${EXTEN})")
             if gravar_chamadas:
-                conf_parts.append(f"exten => {queue},n,StopMixMonitor()")
-            conf_parts.append(f"exten => {queue},n,Hangup()\n")
+                conf_parts.append(" same => n,StopMixMonitor()")
+            conf_parts.append(" same => n,Hangup()\n")
 
     # --- Chamadas para Ramais ---
     if peers:
@@ -146,20 +124,32 @@ def generate_extensions_conf():
         for pattern in ['_X', '_X.']:
             conf_parts.append(f"exten => {pattern},1,NoOp(### Chamada interna para Ramal ${{EXTEN}} ###)")
             if gravar_chamadas:
-                conf_parts.append(f"exten => {pattern},n,Set(UNIQUEID_SAFE=${{CUT(UNIQUEID,.,1)}})")
-                conf_parts.append(f"exten => {pattern},n,Set(ARQUIVO=${{CALLERID(num)}}-${{EXTEN}}-${{UNIQUEID_SAFE}})")
-                conf_parts.append(f"exten => {pattern},n,MixMonitor(${{ARQUIVO}}.wav,b)")
-            conf_parts.append(f"exten => {pattern},n,Answer()")
-            conf_parts.append(f"exten => {pattern},n,Dial(SIP/${{EXTEN}},20,Ttr)")
+                conf_parts.append(f" same => n,Gosub({CONTEXTO_GRAVACAO},s,1(${{EXTEN}}))")
+            conf_parts.append(" same => n,Answer()")
+            conf_parts.append(" same => n,Dial(SIP/${EXTEN},20,Ttr)")
             if gravar_chamadas:
-                conf_parts.append(f"exten => {pattern},n,StopMixMonitor()")
-            conf_parts.append(f"exten => {pattern},n,Hangup()\n")
+                conf_parts.append(" same => n,StopMixMonitor()")
+            conf_parts.append(" same => n,Hangup()\n")
 
+    # --- Sub-rotina de gravação ---
+    if gravar_chamadas:
+        conf_parts.extend([
+            f"\n[{CONTEXTO_GRAVACAO}] ; Gosub: inicia a gravação da chamada (ARG1 = número discado)",
+            "exten => s,1,Set(UNIQUEID_SAFE=${CUT(UNIQUEID,.,1)})",
+            " same => n,Set(ARQUIVO=${CALLERID(num)}-${ARG1}-${UNIQUEID_SAFE})",
+            " same => n,MixMonitor(${ARQUIVO}.wav,b)",
+            " same => n,Return()\n",
+        ])
 
-    db.close()
+    return "\n".join(conf_parts)
 
-    # --- Escreve o arquivo ---
-    conf_content = "\n".join(conf_parts)
+
+# --- Script (wrapper: carrega o modelo e grava o arquivo) ---
+def generate_extensions_conf():
+    print("Iniciando a geração do arquivo extensions.conf...")
+    MODULOS = get_modulos()
+    gravar_chamadas = 'record' in MODULOS.lower().split(',')
+    conf_content = render_extensions_conf(carregar_modelo(), gravar_chamadas)
     try:
         with open(EXTENSIONS_CONF_PATH, 'w') as f:
             f.write(conf_content)
@@ -1,74 +1,56 @@
 # /opt/nanosip/reload_queues.py
 
-from database import get_db # Usando a função centralizada
+from modelo_config import carregar_modelo
 
 # --- Configurações ---
 QUEUES_CONF_PATH = '/etc/asterisk/queues.conf'
 
-# --- Funções de Acesso ao Banco de Dados ---
-
-def get_all_filas():
-    """Busca todas as filas (incluindo seus IDs) cadastradas no banco de dados."""
-    db = get_db()
-    filas_raw = db.execute("SELECT id, fila, nome FROM filas").fetchall()
-    db.close()
-    return [dict(row) for row in filas_raw]
-
-def get_ramais_in_fila(fila_id):
-    """Busca todos os ramais associados a uma fila específica pelo ID da fila."""
-    db = get_db()
-    # CORREÇÃO: A consulta agora usa a tabela 'ramal_fila' e faz JOIN com 'ramais'
-    cursor = db.execute("""
-        SELECT r.ramal
-        FROM ramais r
-        JOIN ramal_fila rf ON r.id = rf.ramal_id
-        WHERE rf.fila_id = ?
-    """, (fila_id,))
-    ramais = cursor.fetchall()
-    db.close()
-    return [str(row['ramal']) for row in ramais]
-
-# --- Lógica Principal ---
+# --- Geração (função pura: modelo -> texto) ---
+
+def render_queues_conf(modelo, verbose=False):
+    """Gera o conteúdo do queues.conf a partir do modelo (modelo_config.carregar_modelo)."""
+    filas = modelo['filas']
+    if not filas:
+        return "; Arquivo gerado automaticamente pelo Micro PABX\n; Nenhuma fila configurada.\n"
+
+    conf_parts = ["; Arquivo gerado automaticamente pelo Micro PABX\n"]
+    for fila in filas:
+        fila_num = fila['fila']
+        fila_nome = fila['nome']
+
+        if verbose:
+            print(f"Processando fila: [{fila_nome}]")
+        conf_parts.append(f"[{fila_num}]")
+        conf_parts.append("musicclass=default")
+        conf_parts.append("strategy=ringall")
+        conf_parts.append("timeout=20")
+        conf_parts.append("retry=5")
+        conf_parts.append("maxlen=0")
+        conf_parts.append("leavewhenempty=no")
+        conf_parts.append("joinempty=yes")
+        conf_parts.append(f"context=interno")
+
+        ramais_membros = [m['ramal'] for m in fila['membros']]
+        if ramais_membros:
+            if verbose:
+                print(f"  - Ramais encontrados: {', '.join(ramais_membros)}")
+            for ramal in ramais_membros:
+                conf_parts.append(f"member => SIP/{ramal}")
+        elif verbose:
+            print(f"  - Aviso: A fila [{fila_nome}] não possui ramais associados.")
+
+        conf_parts.append("\n")
+
+    return "\n".join(conf_parts)
+
+# --- Script (wrapper: carrega o modelo e grava o arquivo) ---
 
 def generate_queues_conf():
-    """Gera o conteúdo do arquivo queues.conf a partir dos dados do banco."""
+    """Gera o arquivo queues.conf a partir dos dados do banco."""
     print("Iniciando a geração do arquivo queues.conf...")
 
     try:
-        filas = get_all_filas()
-        if not filas:
-            conf_content = "; Arquivo gerado automaticamente pelo Micro PABX\n; Nenhuma fila configurada.\n"
-        else:
-            conf_parts = ["; Arquivo gerado automaticamente pelo Micro PABX\n"]
-
-            for fila in filas:
-                fila_id = fila['id']
-                fila_num = fila['fila']
-                fila_nome = fila['nome']
-
-                print(f"Processando fila: [{fila_nome}]")
-                conf_parts.append(f"[{fila_num}]")
-                conf_parts.append("musicclass=default")
-                conf_parts.append("strategy=ringall")
-                conf_parts.append("timeout=20")
-                conf_parts.append("retry=5")
-                conf_parts.append("maxlen=0")
-                conf_parts.append("leavewhenempty=no")
-                conf_parts.append("joinempty=yes")
-                conf_parts.append(f"context=interno")
-
-                # CORREÇÃO: Passando o ID da fila para a função
-                ramais_membros = get_ramais_in_fila(fila_id)
-                if ramais_membros:
-                    print(f"  - Ramais encontrados: {', '.join(ramais_membros)}")
-                    for ramal in ramais_membros:
-                        conf_parts.append(f"member => SIP/{ramal}")
-                else:
-                    print(f"  - Aviso: A fila [{fila_nome}] não possui ramais associados.")
-
-                conf_parts.append("\n")
-
-            conf_content = "\n".join(conf_parts)
+        conf_content = render_queues_conf(carregar_modelo(), verbose=True)
 
         # --- Escrita do Arquivo ---
         with open(QUEUES_CONF_PATH, 'w') as f:
@@ -80,4 +62,3 @@ def generate_queues_conf():
 
 if __name__ == "__main__":
     generate_queues_conf()
-
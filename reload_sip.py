@@ -1,56 +1,61 @@
-import os
-import subprocess
-from database import get_ramais, get_localnets
 from licenca import get_modulos
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, 'nanosip.db')
-
-MODULOS = get_modulos()
-video_chamada = 'video' in MODULOS.lower().split(',')
+from modelo_config import carregar_modelo
 
 SIP_CONF = "/etc/asterisk/sip.conf"
 
+def render_sip_conf(modelo, video_chamada=False):
+    """
+    Gera o conteúdo do sip.conf a partir do modelo (modelo_config.carregar_modelo).
+    No modo Realtime (sip_realtime.py) os ramais não entram no arquivo.
+    """
+    realtime = modelo.get('sip_realtime', False)
+    linhas = []
+    # Cabeçalho
+    linhas.append("[general]\n")
+    linhas.append("language=pt_BR\n")
+    linhas.append("externip=193.186.4.201\n")
+    linhas.append("bindport=5060\n")
+    linhas.append("useragent=asterisk\n")
+    linhas.append("bindaddr=0.0.0.0\n")
+    linhas.append("context=default\n")
+    linhas.append("disallow=all\n")
+    linhas.append("allow=alaw,ulaw,h264\n")
+    if video_chamada:
+        linhas.append("videosupport=yes\n")
+    linhas.append("maxexpirey=3600\n")
+    linhas.append("canreinvite=no\n")
+    linhas.append("defaultexpirey=3600\n")
+    if realtime:
+        linhas.append("rtcachefriends=yes\n")
+
+    # Localnets vindos do banco
+    for net in modelo['localnets']:
+        linhas.append(f"localnet={net['localnet']}\n")
+
+    linhas.append("\n")
+    linhas.append("#include \"sip_custom.conf\"")
+    linhas.append("\n")
+
+    # Ramais
+    if realtime:
+        return "".join(linhas)
+    for r in modelo['ramais']:
+        linhas.append(f"[{r['ramal']}]\n")
+        linhas.append("type=friend\n")
+        linhas.append(f"username={r['ramal']}\n")
+        linhas.append(f"callerid=\"{r['nome']}\" <{r['ramal']}>\n")
+        linhas.append(f"secret={r['senha']}\n")
+        linhas.append("host=dynamic\n")
+        linhas.append(f"context={r['contexto']}\n")
+        linhas.append("nat=no\n")
+        linhas.append("qualify=yes\n\n")
+    return "".join(linhas)
+
 def gerar_sip_conf():
+    video_chamada = 'video' in get_modulos().lower().split(',')
+    conteudo = render_sip_conf(carregar_modelo(), video_chamada)
     with open(SIP_CONF, "w") as f:
-        # Cabeçalho
-        f.write("[general]\n")
-        f.write("language=pt_BR\n")
-        f.write("externip=193.186.4.201\n")
-        f.write("bindport=5060\n")
-        f.write("useragent=asterisk\n")
-        f.write("bindaddr=0.0.0.0\n")
-        f.write("context=default\n")
-        f.write("disallow=all\n")
-        f.write("allow=alaw,ulaw,h264\n")
-        if video_chamada:
-            f.write("videosupport=yes\n")
-        f.write("maxexpirey=3600\n")
-        f.write("canreinvite=no\n")
-        f.write("defaultexpirey=3600\n")
-
-        # Localnets vindos do banco
-        localnets = get_localnets()
-        for net in localnets:
-            f.write(f"localnet={net['localnet']}\n")
-
-        f.write("\n")
-        f.write("#include \"sip_custom.conf\"")
-        f.write("\n")
-
-        # Ramais
-        ramais = get_ramais()
-        for r in ramais:
-            f.write(f"[{r['ramal']}]\n")
-            f.write("type=friend\n")
-            f.write(f"username={r['ramal']}\n")
-            f.write(f"callerid=\"{r['nome']}\" <{r['ramal']}>\n")
-            f.write(f"secret={r['senha']}\n")
-            f.write("host=dynamic\n")
-            f.write(f"context={r['contexto']}\n")
-            f.write("nat=no\n")
-            f.write("qualify=yes\n\n")
+        f.write(conteudo)
 
 if __name__ == "__main__":
     gerar_sip_conf()
-
@@ -0,0 +1,237 @@
+# /opt/nanosip/retencao.py
+"""
+Retenção das gravações em /var/spool/asterisk/monitor.
+
+Aplica duas regras, sempre apagando das mais antigas para as mais novas:
+  1. idade máxima (NANOSIP_RETENCAO_DIAS, padrão 7 dias);
+  2. cota de disco: o diretório não passa de NANOSIP_RETENCAO_MAX_GB e o
+     sistema de arquivos mantém ao menos NANOSIP_RETENCAO_LIVRE_PCT% livres.
+
+As remoções são feitas em lotes com pausa entre eles, para não disputar I/O
+com o Asterisk. Ao final grava um resumo (retencao_status.json) com uso
+atual e projeção de dias até encher, exibido em /api/gravacoes/retencao.
+
+Uso (cron, via scripts/cleanup_recordings.sh):
+    python3 retencao.py [--dry-run] [--status] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from gravacoes import MONITOR_DIR, EXTENSAO
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATUS_PATH = os.path.join(BASE_DIR, "retencao_status.json")
+
+RETENCAO_DIAS = int(os.environ.get("NANOSIP_RETENCAO_DIAS", "7"))
+RETENCAO_MAX_GB = float(os.environ.get("NANOSIP_RETENCAO_MAX_GB", "0"))      # 0 = sem cota
+RETENCAO_LIVRE_PCT = float(os.environ.get("NANOSIP_RETENCAO_LIVRE_PCT", "10"))
+LOTE = 500                  # remoções por lote
+PAUSA_LOTE = 0.05           # segundos entre lotes
+PROTEGER_RECENTES = 600     # nunca remove arquivos modificados há menos disso (gravação em curso)
+JANELA_CRESCIMENTO = 7      # dias usados para estimar o crescimento diário
+
+
+def listar(diretorio=MONITOR_DIR):
+    """[(mtime, tamanho, nome)] das gravações, da mais antiga para a mais nova."""
+    arquivos = []
+    try:
+        with os.scandir(diretorio) as it:
+            for entrada in it:
+                if not entrada.name.endswith(EXTENSAO):
+                    continue
+                try:
+                    st = entrada.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                arquivos.append((st.st_mtime, st.st_size, entrada.name))
+    except FileNotFoundError:
+        pass
+    arquivos.sort()
+    return arquivos
+
+
+def calcular_status(arquivos, diretorio=MONITOR_DIR, agora=None):
+    """Uso atual, crescimento diário e projeção de dias até encher disco e cota."""
+    agora = agora or time.time()
+    uso = sum(a[1] for a in arquivos)
+    limite_janela = agora - JANELA_CRESCIMENTO * 86400
+    recentes = sum(a[1] for a in arquivos if a[0] >= limite_janela)
+    dias_observados = min(JANELA_CRESCIMENTO, (agora - arquivos[0][0]) / 86400) if arquivos else 0
+    crescimento = recentes / dias_observados if dias_observados >= 1 else 0
+
+    try:
+        disco = shutil.disk_usage(diretorio)
+        total_disco, livre = disco.total, disco.free
+    except OSError:
+        total_disco = livre = 0
+
+    # A retenção por idade estabiliza o uso: só projeta se a cota ou o disco vierem antes
+    reserva = total_disco * RETENCAO_LIVRE_PCT / 100
+    dias_disco = round((livre - reserva) / crescimento, 1) if crescimento and livre > reserva else None
+    cota = RETENCAO_MAX_GB * 1024 ** 3
+    dias_cota = round((cota - uso) / crescimento, 1) if crescimento and cota > uso else None
+
+    return {
+        "arquivos": len(arquivos),
+        "uso_bytes": uso,
+        "cota_bytes": int(cota) or None,
+        "disco_total_bytes": total_disco,
+        "disco_livre_bytes": livre,
+        "crescimento_bytes_dia": int(crescimento),
+        "dias_ate_encher_disco": dias_disco,
+        "dias_ate_cota": dias_cota,
+        "mais_antiga": arquivos[0][0] if arquivos else None,
+        "atualizado_em": agora,
+    }
+
+
+def _remover_lote(diretorio, lote, dry_run):
+    """
+    Remove o lote [(nome, tamanho, motivo)]. Retorna (removidos, sumidos): os
+    que esta execução apagou e os que já não existiam; os que falharam ficam fora.
+    """
+    if dry_run:
+        return lote, []
+    removidos, sumidos = [], []
+    for item in lote:
+        try:
+            os.unlink(os.path.join(diretorio, item[0]))
+            removidos.append(item)
+        except FileNotFoundError:
+            sumidos.append(item)
+        except OSError as e:
+            print(f"[retencao] Erro ao remover {item[0]}: {e}")
+    return removidos, sumidos
+
+
+def aplicar(diretorio=MONITOR_DIR, dry_run=False, agora=None):
+    """Executa a retenção e retorna o resumo da execução."""
+    inicio = time.monotonic()
+    agora = agora or time.time()
+    arquivos = listar(diretorio)
+    uso = sum(a[1] for a in arquivos)
+
+    limite_idade = agora - RETENCAO_DIAS * 86400
+    limite_protecao = agora - PROTEGER_RECENTES
+    cota = RETENCAO_MAX_GB * 1024 ** 3
+
+    try:
+        disco = shutil.disk_usage(diretorio)
+        # Quanto falta liberar para manter a reserva de espaço livre
+        falta_disco = max(0, disco.total * RETENCAO_LIVRE_PCT / 100 - disco.free)
+    except OSError:
+        falta_disco = 0
+    falta_cota = max(0, uso - cota) if cota else 0
+    a_liberar = max(falta_disco, falta_cota)
+
+    # Só entra na conta (e sai da lista) o que foi de fato removido
+    contagem = {"idade": 0, "cota": 0}
+    liberados = 0
+    fora = set()
+
+    def remover(lote):
+        nonlocal liberados
+        removidos, sumidos = _remover_lote(diretorio, lote, dry_run)
+        for nome, tamanho, motivo in removidos:
+            contagem[motivo] += 1
+            liberados += tamanho
+        fora.update(nome for nome, _, _ in removidos + sumidos)
+
+    lote = []
+    selecionados = 0
+    for mtime, tamanho, nome in arquivos:
+        if mtime < limite_idade:
+            motivo = "idade"
+        elif liberados + selecionados < a_liberar and mtime < limite_protecao:
+            motivo = "cota"
+        else:
+            break  # lista ordenada: daqui em diante nada mais sai
+        lote.append((nome, tamanho, motivo))
+        selecionados += tamanho
+        if len(lote) >= LOTE:
+            remover(lote)
+            lote, selecionados = [], 0
+            if not dry_run:
+                time.sleep(PAUSA_LOTE)
+    if lote:
+        remover(lote)
+
+    restantes = [a for a in arquivos if a[2] not in fora]
+    status = calcular_status(restantes, diretorio, agora)
+    return {
+        "dry_run": dry_run,
+        "removidos_idade": contagem["idade"],
+        "removidos_cota": contagem["cota"],
+        "bytes_liberados": liberados,
+        "cota_nao_atingida": liberados < a_liberar,
+        "duracao_s": round(time.monotonic() - inicio, 2),
+        "status": status,
+    }
+
+
+def salvar_status(status, caminho=STATUS_PATH):
+    tmp = f"{caminho}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp, caminho)
+    except OSError as e:
+        print(f"[retencao] Erro ao salvar status: {e}")
+
+
+def ler_status(caminho=STATUS_PATH):
+    """Último status gravado, com o espaço livre do disco atualizado."""
+    try:
+        with open(caminho) as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        status["disco_livre_bytes"] = shutil.disk_usage(MONITOR_DIR).free
+    except OSError:
+        pass
+    return status
+
+
+def _mb(n):
+    return f"{n / 1024 ** 2:.1f}MB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retenção das gravações do NanoSip")
+    parser.add_argument("--dry-run", action="store_true", help="só informa o que seria removido")
+    parser.add_argument("--status", action="store_true", help="mostra uso e projeção, sem remover")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    parser.add_argument("--diretorio", default=MONITOR_DIR)
+    args = parser.parse_args(argv)
+
+    if args.status:
+        resultado = calcular_status(listar(args.diretorio), args.diretorio)
+        print(json.dumps(resultado) if args.json else
+              f"{resultado['arquivos']} gravações, {_mb(resultado['uso_bytes'])}, "
+              f"+{_mb(resultado['crescimento_bytes_dia'])}/dia, "
+              f"dias até encher: {resultado['dias_ate_encher_disco']}")
+        return 0
+
+    resultado = aplicar(args.diretorio, dry_run=args.dry_run)
+    if not args.dry_run:
+        salvar_status(resultado["status"])
+    if args.json:
+        print(json.dumps(resultado))
+    else:
+        st = resultado["status"]
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {'(simulação) ' if args.dry_run else ''}"
+              f"removidas {resultado['removidos_idade']} por idade e {resultado['removidos_cota']} por cota, "
+              f"{_mb(resultado['bytes_liberados'])} liberados em {resultado['duracao_s']}s; "
+              f"restam {st['arquivos']} ({_mb(st['uso_bytes'])}), dias até encher: {st['dias_ate_encher_disco']}")
+        if resultado["cota_nao_atingida"]:
+            print("[retencao] Atenção: não foi possível liberar todo o espaço exigido pela cota.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
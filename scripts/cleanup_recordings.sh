@@ -1,18 +1,12 @@
 #!/bin/bash
 # cleanup_recordings.sh
-# Remove gravações antigas de mais de 7 dias do Asterisk
-
-# Diretório onde as gravações ficam
-MONITOR_DIR="/var/spool/asterisk/monitor"
+# Retenção das gravações do Asterisk (idade máxima + cota de disco), ver retencao.py
+# Parâmetros extras são repassados (ex: --dry-run, --status)
 
 # Log de limpeza
 LOG_FILE="/var/log/nanosip/cleanup_recordings.log"
 mkdir -p "$(dirname "$LOG_FILE")"
 
-echo "[$(date '+%Y-%m-%d %H:%M:%S')] Iniciando limpeza de gravações..." >> "$LOG_FILE"
-
-# Encontrar e remover arquivos com mais de 7 dias
-find "$MONITOR_DIR" -type f -name "*.wav" -mtime +7 -print -exec rm -f {} \; >> "$LOG_FILE" 2>&1
-
-echo "[$(date '+%Y-%m-%d %H:%M:%S')] Limpeza concluída." >> "$LOG_FILE"
-
+# Roda a cada 15 minutos (config/nanosip_cron); flock -n pula a execução se a anterior não terminou.
+# Baixa prioridade de CPU e I/O para não afetar as chamadas em curso
+exec flock -n /run/nanosip_cleanup_recordings.lock nice -n 10 ionice -c 3 /opt/nanosip/venv/bin/python3 /opt/nanosip/retencao.py "$@" >> "$LOG_FILE" 2>&1
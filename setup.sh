@@ -182,6 +182,9 @@ sed -i 's/^usegmtime=yes/usegmtime=no/' /etc/asterisk/cdr.conf
 # Desabilitando modulos desnecessarios do asterisk
 sed -i 's/noload = chan_sip.so/;noload = chan_sip.so/' /etc/asterisk/modules.conf
 cat /opt/nanosip/config/asterisk_modules >> /etc/asterisk/modules.conf
+# AMI local para o painel (ami.py), com senha gerada para esta máquina
+cp /opt/nanosip/config/manager.conf /etc/asterisk/manager.conf
+/usr/local/bin/python3.11 /opt/nanosip/ami.py instalar
 mkdir -p /etc/asterisk/sip_custom.conf
 mkdir -p /etc/asterisk/extensions_custom.conf
 chown asterisk:asterisk /etc/asterisk/sip_custom.conf
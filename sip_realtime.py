@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# /opt/nanosip/sip_realtime.py
+"""
+Modo Realtime dos ramais SIP (opcional).
+
+Com o modo ativo, o chan_sip busca os peers na tabela sip_peers do próprio
+nanosip.db (res_config_sqlite3 + extconfig.conf), em vez de lê-los do
+sip.conf. A tabela é mantida por triggers a partir de 'ramais': criar o
+ramal 4001 é um único INSERT, sem regenerar o sip.conf nem recarregar o
+chan_sip. O sip.conf fica só com [general] e localnets.
+
+O modo está ativo quando a tabela sip_peers existe. Como os peers ficam em
+cache (rtcachefriends), alterações e remoções de ramal descartam o peer do
+cache com 'sip prune realtime peer'.
+
+O nanosip.db está em WAL: mesmo só para ler, o Asterisk precisa criar e
+escrever o nanosip.db-wal e o nanosip.db-shm ao lado do banco. Se ele rodar
+com outro usuário (asterisk -U), 'ativar' só prossegue quando esse usuário
+pode escrever no diretório e nos arquivos do banco; senão as consultas dos
+peers falham com "attempt to write a readonly database".
+
+Uso:
+    python3 sip_realtime.py status|ativar|desativar
+"""
+import os
+import pwd
+import subprocess
+import sys
+
+import asterisk_cli
+from database import DB_PATH, get_db
+
+EXTCONFIG_PATH = "/etc/asterisk/extconfig.conf"
+RES_CONFIG_SQLITE3_PATH = "/etc/asterisk/res_config_sqlite3.conf"
+BANCO_REALTIME = "nanosip"      # seção do res_config_sqlite3.conf
+TABELA = "sip_peers"
+ASTERISK_PID_PATH = "/var/run/asterisk/asterisk.pid"
+# Usuário do Asterisk; sem a variável, o dono do processo em execução (ou root)
+ASTERISK_USUARIO = os.environ.get("NANOSIP_ASTERISK_USUARIO")
+
+# Colunas fixas (iguais aos peers do sip.conf) e as atualizadas pelo chan_sip no registro
+_SQL_TABELA = f"""
+    CREATE TABLE IF NOT EXISTS {TABELA} (
+        name TEXT PRIMARY KEY,
+        type TEXT DEFAULT 'friend',
+        defaultuser TEXT,
+        callerid TEXT,
+        secret TEXT,
+        host TEXT DEFAULT 'dynamic',
+        context TEXT,
+        nat TEXT DEFAULT 'no',
+        qualify TEXT DEFAULT 'yes',
+        ipaddr TEXT DEFAULT '',
+        port INTEGER DEFAULT 0,
+        regseconds INTEGER DEFAULT 0,
+        fullcontact TEXT DEFAULT '',
+        regserver TEXT DEFAULT '',
+        useragent TEXT DEFAULT '',
+        lastms INTEGER DEFAULT 0
+    )
+"""
+
+_CALLERID = "'\"' || NEW.nome || '\" <' || NEW.ramal || '>'"
+
+_SQL_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS ramais_sip_insert AFTER INSERT ON ramais BEGIN
+            INSERT OR REPLACE INTO {TABELA} (name, defaultuser, callerid, secret, context)
+            VALUES (CAST(NEW.ramal AS TEXT), CAST(NEW.ramal AS TEXT), {_CALLERID}, NEW.senha, NEW.contexto);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS ramais_sip_update AFTER UPDATE ON ramais BEGIN
+            UPDATE {TABELA}
+               SET name = CAST(NEW.ramal AS TEXT), defaultuser = CAST(NEW.ramal AS TEXT),
+                   callerid = {_CALLERID}, secret = NEW.senha, context = NEW.contexto
+             WHERE name = CAST(OLD.ramal AS TEXT);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS ramais_sip_delete AFTER DELETE ON ramais BEGIN
+            DELETE FROM {TABELA} WHERE name = CAST(OLD.ramal AS TEXT);
+        END""",
+]
+
+
+def ativo(db):
+    """True se o modo Realtime estiver ativo (tabela sip_peers existe)."""
+    return db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABELA,)
+    ).fetchone() is not None
+
+
+def gerar_extconfig(realtime):
+    linhas = ["; Arquivo gerado automaticamente pelo Micro PABX (sip_realtime.py)", "[settings]"]
+    if realtime:
+        linhas.append(f"sippeers => sqlite3,{BANCO_REALTIME},{TABELA}")
+    return "\n".join(linhas) + "\n"
+
+
+def gerar_res_config_sqlite3():
+    # batch=0: grava o registro dos peers na hora, sem segurar o lock do banco
+    return (
+        "; Arquivo gerado automaticamente pelo Micro PABX (sip_realtime.py)\n"
+        f"[{BANCO_REALTIME}]\n"
+        f"dbfile={DB_PATH}\n"
+        "requirements=warn\n"
+        "batch=0\n"
+    )
+
+
+def _escrever(caminho, conteudo):
+    with open(caminho, "w") as f:
+        f.write(conteudo)
+
+
+def _asterisk(comando):
+    try:
+        asterisk_cli.rx(comando)
+        return True
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        print(f"[sip_realtime] Erro ao executar '{comando}': {e}")
+        return False
+
+
+def usuario_asterisk():
+    """Nome do usuário que roda o Asterisk."""
+    if ASTERISK_USUARIO:
+        return ASTERISK_USUARIO
+    try:
+        with open(ASTERISK_PID_PATH) as f:
+            uid = os.stat(f"/proc/{int(f.read().strip())}").st_uid
+        return pwd.getpwuid(uid).pw_name
+    except (OSError, ValueError, KeyError):
+        return "root"
+
+
+def _pode_escrever(caminho, uid, gids):
+    st = os.stat(caminho)
+    if st.st_uid == uid:
+        return bool(st.st_mode & 0o200)
+    if st.st_gid in gids:
+        return bool(st.st_mode & 0o020)
+    return bool(st.st_mode & 0o002)
+
+
+def arquivos_sem_escrita(usuario, caminho_db=None):
+    """
+    Caminhos (diretório, banco, -wal, -shm) em que o usuário não pode escrever;
+    lista vazia se o Asterisk consegue abrir o banco em WAL.
+    """
+    caminho_db = caminho_db or DB_PATH
+    try:
+        pw = pwd.getpwnam(usuario)
+    except KeyError:
+        return [f"usuário '{usuario}' inexistente"]
+    if pw.pw_uid == 0:
+        return []
+    gids = set(os.getgrouplist(usuario, pw.pw_gid))
+    caminhos = [os.path.dirname(os.path.abspath(caminho_db)), caminho_db,
+                caminho_db + "-wal", caminho_db + "-shm"]
+    return [c for c in caminhos if os.path.exists(c) and not _pode_escrever(c, pw.pw_uid, gids)]
+
+
+def ativar(db):
+    """Cria sip_peers e os triggers e copia os ramais existentes (migração)."""
+    db.execute(_SQL_TABELA)
+    for sql in _SQL_TRIGGERS:
+        db.execute(sql)
+    db.execute(f"""
+        INSERT OR REPLACE INTO {TABELA} (name, defaultuser, callerid, secret, context)
+        SELECT CAST(ramal AS TEXT), CAST(ramal AS TEXT), '"' || nome || '" <' || ramal || '>', senha, contexto
+        FROM ramais
+    """)
+    db.commit()
+
+
+def desativar(db):
+    for trigger in ("ramais_sip_insert", "ramais_sip_update", "ramais_sip_delete"):
+        db.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    db.execute(f"DROP TABLE IF EXISTS {TABELA}")
+    db.commit()
+
+
+def podar_peer(ramal):
+    """Descarta o peer do cache do chan_sip após alterar/remover o ramal (só no modo Realtime)."""
+    db = get_db()
+    try:
+        if not ativo(db):
+            return
+    finally:
+        db.close()
+    _asterisk(f"sip prune realtime peer {ramal}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    acao = argv[0] if argv else "status"
+    if acao not in ("status", "ativar", "desativar"):
+        print(__doc__.strip().splitlines()[-1].strip())
+        return 1
+
+    db = get_db()
+    try:
+        if acao == "status":
+            realtime = ativo(db)
+            total = db.execute(f"SELECT COUNT(*) FROM {TABELA}").fetchone()[0] if realtime else 0
+            print(f"Realtime {'ativo' if realtime else 'inativo'}" + (f" ({total} peers)" if realtime else ""))
+            return 0
+        if acao == "ativar":
+            usuario = usuario_asterisk()
+            sem_escrita = arquivos_sem_escrita(usuario)
+            if sem_escrita:
+                print(f"[sip_realtime] O Asterisk (usuário '{usuario}') não pode escrever em: "
+                      f"{', '.join(sem_escrita)}. Com o banco em WAL ele precisa criar e escrever "
+                      "os arquivos -wal e -shm (ex.: chgrp do grupo do Asterisk e chmod g+w no "
+                      "diretório e nos arquivos do banco). Nada foi alterado.")
+                return 1
+            ativar(db)
+        else:
+            desativar(db)
+    finally:
+        db.close()
+
+    realtime = acao == "ativar"
+    try:
+        _escrever(RES_CONFIG_SQLITE3_PATH, gerar_res_config_sqlite3())
+        _escrever(EXTCONFIG_PATH, gerar_extconfig(realtime))
+    except OSError as e:
+        print(f"[sip_realtime] Erro ao escrever configuração do Asterisk: {e}")
+        return 1
+
+    if realtime:
+        _asterisk("module load res_config_sqlite3.so")
+    _asterisk("module reload extconfig")
+
+    # Regera o sip.conf (com ou sem os peers) e recarrega o chan_sip se mudou
+    import aplicar_config
+    aplicar_config.main()
+    print(f"Modo Realtime {'ativado' if realtime else 'desativado'}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 # system_info.py
 import subprocess
+from asterisk_cli import ASTERISK_BIN
 from blueprints.rede import carrega_config_atual
 from licenca import get_modulos
 
@@ -19,7 +20,7 @@ def get_system_info():
     try:
         # CORREÇÃO: Usar uma lista de argumentos em vez de shell=True é mais seguro.
         # O comando 'asterisk -V' não precisa de sudo, pois não se comunica com o processo.
-        versao_output = subprocess.check_output(["asterisk", "-V"], text=True, stderr=subprocess.PIPE)
+        versao_output = subprocess.check_output([ASTERISK_BIN, "-V"], text=True, stderr=subprocess.PIPE)
         info["versao_asterisk"] = versao_output.strip()
     except (subprocess.CalledProcessError, FileNotFoundError):
         info["versao_asterisk"] = "Não foi possível obter a versão"
@@ -27,7 +28,7 @@ def get_system_info():
     try:
         # CORREÇÃO: Adicionado 'sudo' para permitir a comunicação com o Asterisk.
         # O comando foi simplificado para ser mais legível e robusto.
-        command = ["asterisk", "-rx", "sip show peers"]
+        command = [ASTERISK_BIN, "-rx", "sip show peers"]
         peers_output = subprocess.check_output(command, text=True, stderr=subprocess.PIPE)
         
         # Processa a saída para contar os ramais
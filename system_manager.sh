@@ -12,17 +12,18 @@ echo "--- Executando tarefa: $ACTION (rodando como $USER) ---" >&2
 
 case $ACTION in
     "apply_config")
-        echo "[1/4] Gerando plano de discagem (extensions.conf)..." >&2
-        $PYTHON_EXEC "${BASE_DIR}/reload_extensions.py"
-
-        echo "[2/4] Gerando filas (queues.conf)..." >&2
-        $PYTHON_EXEC "${BASE_DIR}/reload_queues.py"
-
-        echo "[3/4] Gerando ramais (sip.conf)..." >&2
-        $PYTHON_EXEC "${BASE_DIR}/reload_sip.py"
+        # Gera extensions.conf, queues.conf e sip.conf; grava só o que mudou e
+        # recarrega apenas os módulos afetados (dialplan, sip, queue)
+        echo "Gerando configurações e recarregando o Asterisk se necessário..." >&2
+        $PYTHON_EXEC "${BASE_DIR}/aplicar_config.py"
+        # Atualizações: garante o usuário AMI do painel (idempotente)
+        $PYTHON_EXEC "${BASE_DIR}/ami.py" instalar >&2
+        ;;
 
-        echo "[4/4] Recarregando o Asterisk..." >&2
-        /usr/sbin/asterisk -rx "core reload" > /dev/null 2>&1
+    "install_ami")
+        # Cria a senha AMI desta máquina (ami.secret) e instala/mescla o usuário
+        # do painel no /etc/asterisk/manager.conf; recarrega o manager se mudou
+        $PYTHON_EXEC "${BASE_DIR}/ami.py" instalar >&2
         ;;
 
     "get_network_info")
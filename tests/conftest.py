@@ -0,0 +1,21 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# Os módulos do NanoSip ficam na raiz do repositório (/opt/nanosip)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture
+def cliente():
+    """Cliente de teste do Flask já autenticado."""
+    from app import app
+    app.config["TESTING"] = True
+    with app.test_client() as c:
+        with c.session_transaction() as sessao:
+            sessao["user"] = "admin"
+        yield c
@@ -0,0 +1,141 @@
+# tests/test_ami.py
+"""Modelo do painel (EstadoAsterisk/ClienteAMI) contra o servidor AMI falso do bench/."""
+import os
+import sys
+import time
+
+import pytest
+
+import ami
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+from fake_ami import ServidorAMIFalso  # noqa: E402
+from fake_asterisk import gerar_canais, gerar_peers  # noqa: E402
+
+SEGREDO = "segredo-de-teste"
+
+
+def _aguardar(condicao, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def servidor():
+    srv = ServidorAMIFalso(segredo=SEGREDO).iniciar()
+    yield srv
+    srv.parar()
+
+
+@pytest.fixture
+def conectar(servidor):
+    clientes = []
+
+    def _conectar(senha=SEGREDO):
+        estado = ami.EstadoAsterisk()
+        cliente = ami.ClienteAMI(estado, servidor.host, servidor.port, "nanosip", senha)
+        cliente.iniciar()
+        clientes.append(cliente)
+        return estado
+
+    yield _conectar
+    for cliente in clientes:
+        cliente.parar()
+
+
+def test_sincronizacao_inicial(conectar):
+    peers, canais = gerar_peers(), gerar_canais()
+    estado = conectar()
+    assert _aguardar(lambda: estado.conectado and len(estado.status_peers()) == len(peers)
+                     and len(estado.chamadas()) == len(canais) // 2)
+
+    status = estado.status_peers()
+    for ramal, ip, _, situacao in peers:
+        esperado = "online" if situacao.startswith("OK") else "offline"
+        assert status[ramal]["status"] == esperado
+        assert status[ramal]["ip"] == (ip or "offline")
+    assert status[peers[0][0]]["latencia"] == "1 ms"
+
+    chamada = next(c for c in estado.chamadas() if c["id"] == "1700000000.0")
+    assert chamada["origem"] == "1000"
+    assert chamada["destino"] == "1001"
+    assert chamada["ramais"] == ["1000", "1001"]
+
+
+def test_login_recusado_nao_carrega_nada(conectar):
+    estado = conectar(senha="errada")
+    time.sleep(0.3)
+    assert not estado.conectado
+    assert estado.status_peers() == {}
+
+
+def test_senha_padrao_vem_do_arquivo(servidor, tmp_path, monkeypatch):
+    arquivo = tmp_path / "ami.secret"
+    arquivo.write_text(SEGREDO + "\n")
+    monkeypatch.setattr(ami, "AMI_SEGREDO_PATH", str(arquivo))
+    estado = ami.EstadoAsterisk()
+    cliente = ami.ClienteAMI(estado, servidor.host, servidor.port, "nanosip", None)
+    cliente.iniciar()
+    try:
+        assert _aguardar(lambda: estado.conectado and estado.status_peers())
+    finally:
+        cliente.parar()
+
+
+def test_eventos_atualizam_o_modelo():
+    estado = ami.EstadoAsterisk()
+    estado.processar({"Event": "PeerStatus", "Peer": "SIP/200", "PeerStatus": "Reachable",
+                      "Address": "10.0.0.5:5060", "Time": "12"})
+    assert estado.status_peers()["200"] == {"ip": "10.0.0.5", "status": "online", "latencia": "12 ms"}
+
+    estado.processar({"Event": "Newchannel", "Channel": "SIP/200-00000001", "Uniqueid": "1.1",
+                      "Linkedid": "1.1", "CallerIDNum": "200", "Exten": "300", "ChannelStateDesc": "Ring"})
+    assert [c["destino"] for c in estado.chamadas()] == ["300"]
+    versao = estado.versao
+    estado.processar({"Event": "Hangup", "Uniqueid": "1.1"})
+    assert estado.chamadas() == []
+    assert estado.aguardar_mudanca(versao, timeout=0) == versao + 1
+
+    estado.processar({"Event": "QueueMember", "Queue": "800", "StateInterface": "SIP/200",
+                      "Status": "1", "Paused": "1"})
+    estado.processar({"Event": "QueueCallerJoin", "Queue": "800", "Count": "2"})
+    assert estado.filas_ativas()["800"] == {"membros": {"200": {"status": 1, "pausado": True}}, "aguardando": 2}
+
+    estado.processar({"Event": "PeerStatus", "Peer": "SIP/200", "PeerStatus": "Unregistered"})
+    assert estado.status_peers()["200"]["status"] == "offline"
+
+
+def test_manager_conf_mescla_usuario():
+    existente = (
+        "[general]\nenabled = no\nport = 5038\n\n"
+        "[outro]\nsecret = x\nwrite = all\n\n"
+        "[nanosip]\nsecret = nanosip\nwrite = system,call,agent,reporting\n"
+    )
+    novo = ami.mesclar_manager_conf(existente, "abc123")
+    assert "enabled = yes" in novo and "enabled = no" not in novo
+    assert "[outro]\nsecret = x\nwrite = all" in novo
+    assert novo.count("[nanosip]") == 1
+    assert "secret = abc123" in novo and "secret = nanosip" not in novo
+    assert "write = reporting\n" in novo
+    assert ami.mesclar_manager_conf(novo, "abc123") == novo
+
+
+def test_manager_conf_sem_general():
+    novo = ami.mesclar_manager_conf("", "abc123")
+    assert novo.startswith("[general]\nenabled = yes")
+    assert "[nanosip]\nsecret = abc123" in novo
+
+
+def test_instalar_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(ami, "AMI_SEGREDO_PATH", str(tmp_path / "ami.secret"))
+    conf = tmp_path / "manager.conf"
+    assert ami.instalar_manager(str(conf)) is True
+    segredo = (tmp_path / "ami.secret").read_text().strip()
+    assert len(segredo) >= 24
+    assert oct((tmp_path / "ami.secret").stat().st_mode & 0o777) == "0o600"
+    assert f"secret = {segredo}" in conf.read_text()
+    assert ami.instalar_manager(str(conf)) is False
@@ -0,0 +1,46 @@
+# tests/test_cadastro.py
+"""Helpers de cadastro na conexão compartilhada: falha não deixa escrita pela metade."""
+import pytest
+
+import cadastro
+import database
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "nanosip.db"))
+    monkeypatch.setattr(cadastro, "podar_peer", lambda ramal: None)
+    database.init_db()
+    yield database.get_db()
+    database.fechar_db()
+
+
+def _ramais(db):
+    return [r["ramal"] for r in db.execute("SELECT ramal FROM ramais ORDER BY ramal")]
+
+
+def test_helper_que_falha_desfaz_o_que_fez(banco, monkeypatch):
+    assert cadastro.adicionar_ramal(4001, "Ana", "abc123", "interno")[0]
+    assert cadastro.adicionar_fila(800, "Suporte")[0]
+    fila_id = banco.execute("SELECT id FROM filas WHERE fila = 800").fetchone()["id"]
+    ramal_id = banco.execute("SELECT id FROM ramais WHERE ramal = 4001").fetchone()["id"]
+    assert cadastro.associar_ramal_fila(ramal_id, fila_id)[0]
+
+    # A segunda instrução falha depois de a primeira já ter apagado as associações
+    banco.execute("""CREATE TRIGGER falha BEFORE DELETE ON ramais
+                     BEGIN SELECT RAISE(ABORT, 'falha simulada'); END""")
+    sucesso, msg = cadastro.remover_ramal(ramal_id)
+    assert not sucesso and "falha simulada" in msg
+    assert not banco.in_transaction
+
+    # O commit do próximo helper não pode gravar o DELETE pela metade
+    banco.execute("DROP TRIGGER falha")
+    assert cadastro.adicionar_ramal(4002, "Bia", "abc123", "interno")[0]
+    assert banco.execute("SELECT COUNT(*) FROM ramal_fila").fetchone()[0] == 1
+    assert _ramais(banco) == [4001, 4002]
+
+
+def test_fechar_db_descarta_transacao_aberta(banco):
+    banco.execute("INSERT INTO ramais (ramal, nome, senha) VALUES (4003, 'Caio', 'abc123')")
+    database.fechar_db()
+    assert _ramais(database.get_db()) == []
@@ -0,0 +1,84 @@
+# tests/test_dialplan.py
+"""
+Dialplan compilado (reload_extensions.py) comparado byte a byte com os
+trechos esperados em tests/golden/. Depois de uma mudança intencional no
+dialplan, regere-os com:
+
+    NANOSIP_ATUALIZAR_GOLDEN=1 python3 -m pytest tests/test_dialplan.py
+"""
+import os
+
+import pytest
+
+from reload_extensions import compilar_rota, intervalos_dias, render_extensions_conf
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+ATUALIZAR = os.environ.get("NANOSIP_ATUALIZAR_GOLDEN") == "1"
+
+ROTA_SEM_HORARIO = {
+    "id": 1, "nome": "Suporte", "numero_entrada": "4830001000",
+    "dest_fila_else": 2, "fila_else": 801, "time_conditions": [],
+}
+
+ROTA_COM_HORARIOS = {
+    "id": 2, "nome": "Comercial", "numero_entrada": "4830002000",
+    "dest_fila_else": 3, "fila_else": 802,
+    "time_conditions": [
+        {"id": 1, "time_start": "08:00", "time_end": "18:00", "days": "mon,tue,wed,thu,fri",
+         "dest_fila_if_time": 1, "fila_if_time": 800},
+        {"id": 2, "time_start": "08:00", "time_end": "12:00", "days": "sat",
+         "dest_fila_if_time": 2, "fila_if_time": 801},
+        # Fila removida: a condição é ignorada
+        {"id": 3, "time_start": "13:00", "time_end": "17:00", "days": "sun",
+         "dest_fila_if_time": 9, "fila_if_time": None},
+    ],
+}
+
+MODELO = {
+    "ramais": [
+        {"id": 1, "ramal": 1001, "nome": "Recepcao", "senha": "abc1", "contexto": "interno"},
+        {"id": 2, "ramal": 1002, "nome": "Vendas", "senha": "abc2", "contexto": "interno"},
+    ],
+    "filas": [
+        {"id": 1, "fila": 800, "nome": "Atendimento", "membros": [], "ramais": []},
+        {"id": 2, "fila": 801, "nome": "Suporte", "membros": [], "ramais": []},
+        {"id": 3, "fila": 802, "nome": "Fora do horario", "membros": [], "ramais": []},
+    ],
+    "rotas": [ROTA_COM_HORARIOS, ROTA_SEM_HORARIO],
+    "localnets": [],
+    "sip_realtime": False,
+}
+
+
+def _comparar(nome, conteudo):
+    caminho = os.path.join(GOLDEN_DIR, nome)
+    if ATUALIZAR:
+        with open(caminho, "w") as f:
+            f.write(conteudo)
+    with open(caminho) as f:
+        assert conteudo == f.read(), f"dialplan diferente de tests/golden/{nome}"
+
+
+@pytest.mark.parametrize("rota", [ROTA_SEM_HORARIO, ROTA_COM_HORARIOS], ids=["sem_horario", "com_horarios"])
+@pytest.mark.parametrize("gravar", [False, True], ids=["sem_gravacao", "com_gravacao"])
+def test_compilar_rota(rota, gravar):
+    nome = f"rota_{'com_horarios' if rota['time_conditions'] else 'sem_horario'}" \
+           f"_{'com' if gravar else 'sem'}_gravacao.conf"
+    _comparar(nome, "\n".join(compilar_rota(rota, gravar)) + "\n")
+
+
+@pytest.mark.parametrize("gravar", [False, True], ids=["sem_gravacao", "com_gravacao"])
+def test_render_extensions_conf(gravar):
+    _comparar(f"extensions_{'com' if gravar else 'sem'}_gravacao.conf", render_extensions_conf(MODELO, gravar))
+
+
+@pytest.mark.parametrize("days, esperado", [
+    ("mon,tue,wed,thu,fri", "mon-fri"),
+    ("sun,mon,tue", "mon-tue&sun"),
+    ("mon,wed,fri", "mon&wed&fri"),
+    ("sat,sun", "sat-sun"),
+    ("mon,tue,wed,thu,fri,sat,sun", "mon-sun"),
+    ("", ""),
+])
+def test_intervalos_dias(days, esperado):
+    assert intervalos_dias(days) == esperado
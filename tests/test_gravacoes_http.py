@@ -0,0 +1,133 @@
+# tests/test_gravacoes_http.py
+"""Entrega das gravações (/recordings): Range, requisições condicionais e caminhos inválidos."""
+import struct
+
+import pytest
+
+import gravacoes
+from blueprints import relatorios
+
+TAMANHO = 300 * 1024 * 1024     # WAV esparso de 300MB: não ocupa disco
+NOME = "20261018-120000-1001-2002-1760788800.wav"
+
+
+def _cabecalho_wav(tamanho):
+    dados = tamanho - 44
+    return (b"RIFF" + struct.pack("<I", tamanho - 8) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 8000, 16000, 2, 16)
+            + b"data" + struct.pack("<I", dados))
+
+
+@pytest.fixture
+def gravacao(tmp_path, monkeypatch):
+    monitor = tmp_path / "monitor"
+    monitor.mkdir()
+    with open(monitor / NOME, "wb") as f:
+        f.write(_cabecalho_wav(TAMANHO))
+        f.truncate(TAMANHO)
+    # Fora do diretório de gravações: não pode ser alcançado pela rota
+    (tmp_path / "segredo.wav").write_bytes(_cabecalho_wav(1024).ljust(1024, b"\0"))
+
+    catalogo = gravacoes.CatalogoGravacoes(str(monitor))
+    catalogo.varrer()
+    monkeypatch.setattr(relatorios, "MONITOR_DIR", str(monitor))
+    monkeypatch.setattr(gravacoes, "get_catalogo", lambda: catalogo)
+    return f"/recordings/{NOME}"
+
+
+def _etag(cliente, url):
+    r = cliente.head(url)
+    assert r.status_code == 200
+    return r.headers["ETag"]
+
+
+def test_range_parcial(cliente, gravacao):
+    r = cliente.get(gravacao, headers={"Range": "bytes=1000-1999"})
+    assert r.status_code == 206
+    assert r.headers["Content-Range"] == f"bytes 1000-1999/{TAMANHO}"
+    assert r.headers["Accept-Ranges"] == "bytes"
+    assert len(r.data) == 1000
+
+
+def test_range_inicio_do_arquivo(cliente, gravacao):
+    r = cliente.get(gravacao, headers={"Range": "bytes=0-43"})
+    assert r.status_code == 206
+    assert r.headers["Content-Range"] == f"bytes 0-43/{TAMANHO}"
+    assert r.data == _cabecalho_wav(TAMANHO)
+
+
+def test_range_final_do_arquivo(cliente, gravacao):
+    r = cliente.get(gravacao, headers={"Range": "bytes=-500"})
+    assert r.status_code == 206
+    assert r.headers["Content-Range"] == f"bytes {TAMANHO - 500}-{TAMANHO - 1}/{TAMANHO}"
+    assert len(r.data) == 500
+
+
+def test_if_none_match_retorna_304(cliente, gravacao):
+    etag = _etag(cliente, gravacao)
+    r = cliente.get(gravacao, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.data == b""
+
+
+def test_if_modified_since_retorna_304(cliente, gravacao):
+    ultima = cliente.head(gravacao).headers["Last-Modified"]
+    r = cliente.get(gravacao, headers={"If-Modified-Since": ultima})
+    assert r.status_code == 304
+
+
+def test_range_fora_do_arquivo_retorna_416(cliente, gravacao):
+    r = cliente.get(gravacao, headers={"Range": f"bytes={TAMANHO}-{TAMANHO + 100}"})
+    assert r.status_code == 416
+    assert r.headers["Content-Range"] == f"bytes */{TAMANHO}"
+
+
+def test_if_range_com_etag_diferente_entrega_tudo(cliente, gravacao):
+    r = cliente.get(gravacao, buffered=False,
+                    headers={"Range": "bytes=1000-1999", "If-Range": '"etag-antiga"'})
+    try:
+        assert r.status_code == 200
+        assert "Content-Range" not in r.headers
+        assert int(r.headers["Content-Length"]) == TAMANHO
+    finally:
+        r.close()
+
+
+def test_if_range_com_etag_atual_entrega_trecho(cliente, gravacao):
+    etag = _etag(cliente, gravacao)
+    r = cliente.get(gravacao, headers={"Range": "bytes=1000-1999", "If-Range": etag})
+    assert r.status_code == 206
+    assert r.headers["Content-Range"] == f"bytes 1000-1999/{TAMANHO}"
+
+
+@pytest.mark.parametrize("caminho", [
+    "/recordings/../segredo.wav",
+    "/recordings/..%2Fsegredo.wav",
+    "/recordings/%2e%2e/segredo.wav",
+    "/recordings/inexistente.wav",
+])
+def test_caminho_invalido_retorna_404(cliente, gravacao, caminho):
+    assert cliente.get(caminho).status_code == 404
+
+
+def test_gravacao_ainda_nao_catalogada_e_entregue(cliente, gravacao, tmp_path):
+    # Criada depois da varredura, antes de o inotify avisar
+    nova = "1001-2003-1760788900.wav"
+    (tmp_path / "monitor" / nova).write_bytes(_cabecalho_wav(1024).ljust(1024, b"\0"))
+    r = cliente.get(f"/recordings/{nova}")
+    assert r.status_code == 200
+    assert len(r.data) == 1024
+
+
+def test_procurar_pelo_uniqueid_com_src_dst_diferentes(tmp_path):
+    for nome in ("1001-2002-1760788800.wav", "1001-800-1760788900.wav", "1005-800-1760788900.wav"):
+        (tmp_path / nome).write_bytes(_cabecalho_wav(1024).ljust(1024, b"\0"))
+    catalogo = gravacoes.CatalogoGravacoes(str(tmp_path))
+    catalogo.varrer()
+
+    # O CDR registrou o destino final da transferência, não o do arquivo
+    assert catalogo.procurar("1001", "2005", "1760788800.12")["nome"] == "1001-2002-1760788800.wav"
+    # Duas gravações no mesmo segundo: src/dst desempatam
+    assert catalogo.procurar("1005", "800", "1760788900.3")["nome"] == "1005-800-1760788900.wav"
+    assert catalogo.procurar("1001", "800", "1760788900.2")["nome"] == "1001-800-1760788900.wav"
+    assert catalogo.procurar("1001", "2002", "1760789999.1") is None
@@ -0,0 +1,28 @@
+# tests/test_importar_cdr.py
+"""Leitura paralela da importação de CDR: número limitado de trechos em andamento."""
+import threading
+from multiprocessing.pool import ThreadPool
+
+import importar_cdr
+
+
+def test_em_paralelo_limita_tarefas_em_andamento():
+    lock = threading.Lock()
+    estado = {"andamento": 0, "maximo": 0}
+
+    def ler(tarefa):
+        with lock:
+            estado["andamento"] += 1
+            estado["maximo"] = max(estado["maximo"], estado["andamento"])
+        return tarefa
+
+    with ThreadPool(4) as pool:
+        resultados = []
+        for r in importar_cdr.em_paralelo(pool, ler, range(50), limite=3):
+            # Escritor lento: o trecho só sai de "andamento" quando é gravado
+            with lock:
+                estado["andamento"] -= 1
+            resultados.append(r)
+
+    assert sorted(resultados) == list(range(50))
+    assert estado["maximo"] <= 3
@@ -0,0 +1,127 @@
+# tests/test_migracoes.py
+"""Migrações do nanosip.db: atualização a partir de cada versão já publicada."""
+import sqlite3
+
+import pytest
+
+import database
+import migracoes
+
+INDICES = {"idx_ramal_fila_fila", "idx_time_conditions_rota", "idx_time_conditions_fila",
+           "idx_filas_nome", "idx_rotas_fila_else"}
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch, capsys):
+    """Caminho de um nanosip.db na versão 0 (esquema do database.init_db)."""
+    caminho = str(tmp_path / "nanosip.db")
+    monkeypatch.setattr(database, "DB_PATH", caminho)
+    database.init_db()
+    database.fechar_db()
+    capsys.readouterr()
+    return caminho
+
+
+def _na_versao(caminho, versao):
+    """Leva o banco da versão 0 até 'versao' com as migrações daquela época."""
+    conn = sqlite3.connect(caminho)
+    for numero, _, comandos in migracoes.MIGRACOES:
+        if numero > versao:
+            break
+        for sql in comandos:
+            conn.execute(sql)
+        conn.execute(f"PRAGMA user_version = {numero}")
+    conn.commit()
+    conn.close()
+
+
+def _versao(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _esquema(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master"))
+    finally:
+        conn.close()
+
+
+def _indices(caminho):
+    return {nome for _, nome, _ in _esquema(caminho) if nome.startswith("idx_")}
+
+
+def test_banco_novo_comeca_na_versao_zero(banco):
+    assert _versao(banco) == 0
+    assert _indices(banco) == set()
+
+
+@pytest.mark.parametrize("versao", range(migracoes.VERSAO_ATUAL))
+def test_atualiza_de_cada_versao(banco, versao):
+    _na_versao(banco, versao)
+    assert _versao(banco) == versao
+
+    assert migracoes.migrar(banco) == migracoes.VERSAO_ATUAL
+    assert _versao(banco) == migracoes.VERSAO_ATUAL
+    assert INDICES <= _indices(banco)
+
+
+def test_preserva_os_dados(banco):
+    conn = sqlite3.connect(banco)
+    conn.execute("INSERT INTO ramais (ramal, nome, senha, contexto) VALUES (1001, 'Recepcao', 'abc1', 'interno')")
+    conn.execute("INSERT INTO filas (fila, nome) VALUES (800, 'Atendimento')")
+    conn.execute("INSERT INTO ramal_fila (ramal_id, fila_id) VALUES (1, 1)")
+    conn.execute("INSERT INTO rotas (nome, numero_entrada, dest_fila_else) VALUES ('Entrada', '4830001000', 1)")
+    conn.commit()
+    conn.close()
+
+    migracoes.migrar(banco)
+
+    conn = sqlite3.connect(banco)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM ramal_fila").fetchone()[0] == 1
+        assert conn.execute("SELECT numero_entrada FROM rotas").fetchone()[0] == "4830001000"
+        plano = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM rotas WHERE dest_fila_else = 1").fetchall()
+        assert "idx_rotas_fila_else" in str(plano)
+    finally:
+        conn.close()
+
+
+def test_segunda_execucao_nao_faz_nada(banco, capsys):
+    migracoes.migrar(banco)
+    esquema = _esquema(banco)
+    capsys.readouterr()
+
+    assert migracoes.migrar(banco) == migracoes.VERSAO_ATUAL
+    assert _esquema(banco) == esquema
+    assert capsys.readouterr().out == ""
+
+
+def test_banco_mais_novo_fica_intocado(banco):
+    futura = migracoes.VERSAO_ATUAL + 5
+    conn = sqlite3.connect(banco)
+    conn.execute(f"PRAGMA user_version = {futura}")
+    conn.commit()
+    conn.close()
+    esquema = _esquema(banco)
+
+    assert migracoes.migrar(banco) == futura
+    assert _versao(banco) == futura
+    assert _esquema(banco) == esquema
+
+
+def test_falha_desfaz_a_migracao_inteira(banco, monkeypatch):
+    monkeypatch.setattr(migracoes, "MIGRACOES", [
+        (1, "com erro no meio", [
+            "CREATE INDEX idx_teste ON filas (nome)",
+            "CREATE INDEX idx_invalido ON tabela_inexistente (x)",
+        ]),
+    ])
+    with pytest.raises(sqlite3.OperationalError):
+        migracoes.migrar(banco)
+    assert _versao(banco) == 0
+    assert "idx_teste" not in _indices(banco)
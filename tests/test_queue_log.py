@@ -0,0 +1,65 @@
+# tests/test_queue_log.py
+"""Leitura incremental do queue_log (TailerQueueLog)."""
+import time
+
+import queue_log
+
+
+def _evento(ts, fila, evento, *dados):
+    return f"{ts}|{ts}.1|{fila}|SIP/200|{evento}|{'|'.join(dados)}\n".encode()
+
+
+def _tailer(tmp_path):
+    log = tmp_path / "queue_log"
+    log.write_bytes(b"")
+    tailer = queue_log.TailerQueueLog(str(log), str(tmp_path / "queue_log.pos"))
+    return log, tailer
+
+
+def test_le_eventos_novos(tmp_path):
+    log, tailer = _tailer(tmp_path)
+    tailer.verificar()
+    agora = int(time.time())
+    with open(log, "ab") as f:
+        f.write(_evento(agora, "800", "ENTERQUEUE", "", "1001", "1"))
+        f.write(_evento(agora, "800", "CONNECT", "5", "SIP/200-1", "3"))
+    tailer.verificar()
+    est = tailer.estatisticas()["800"]
+    assert est["ofertadas"] == 1 and est["atendidas"] == 1 and est["espera_media"] == 5
+
+
+def test_linha_maior_que_o_bloco_nao_trava_a_leitura(tmp_path, capsys):
+    log, tailer = _tailer(tmp_path)
+    tailer.verificar()
+    agora = int(time.time())
+    with open(log, "ab") as f:
+        f.write(b"x" * (queue_log.BLOCO_LEITURA * 2 + 123) + b"\n")
+        f.write(_evento(agora, "800", "ENTERQUEUE", "", "1001", "1"))
+    tailer.verificar()
+    assert tailer.estatisticas()["800"]["ofertadas"] == 1
+    assert tailer._offset == log.stat().st_size
+    assert "descartada" in capsys.readouterr().out
+
+    # Lixo sem quebra de linha até o fim: a próxima passada continua de onde parou
+    with open(log, "ab") as f:
+        f.write(b"\0" * (queue_log.BLOCO_LEITURA + 10))
+    tailer.verificar()
+    with open(log, "ab") as f:
+        f.write(b"\n" + _evento(agora, "800", "ENTERQUEUE", "", "1002", "1"))
+    tailer.verificar()
+    assert tailer.estatisticas()["800"]["ofertadas"] == 2
+
+
+def test_linha_incompleta_espera_o_resto(tmp_path):
+    log, tailer = _tailer(tmp_path)
+    tailer.verificar()
+    agora = int(time.time())
+    linha = _evento(agora, "800", "ENTERQUEUE", "", "1001", "1")
+    with open(log, "ab") as f:
+        f.write(linha[:10])
+    tailer.verificar()
+    assert "800" not in tailer.estatisticas()
+    with open(log, "ab") as f:
+        f.write(linha[10:])
+    tailer.verificar()
+    assert tailer.estatisticas()["800"]["ofertadas"] == 1
@@ -0,0 +1,98 @@
+# tests/test_ramais_csv.py
+"""Importação de ramais por CSV: leitura, validação contra o banco e tudo ou nada."""
+import pytest
+
+import database
+import ramais_csv
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "nanosip.db"))
+    monkeypatch.setattr(ramais_csv, "podar_peer", lambda ramal: None)
+    database.init_db()
+    db = database.get_db()
+    db.execute("INSERT INTO ramais (ramal, nome, senha) VALUES (4001, 'Ana', 'abc123')")
+    db.execute("INSERT INTO filas (fila, nome) VALUES (800, 'Suporte')")
+    db.execute("INSERT INTO filas (fila, nome) VALUES (801, 'Vendas')")
+    db.execute("INSERT INTO rotas (nome, numero_entrada, dest_fila_else) VALUES ('Entrada', '5000', 1)")
+    db.commit()
+    yield db
+    database.fechar_db()
+
+
+def _ramais(db):
+    return [r["ramal"] for r in db.execute("SELECT ramal FROM ramais ORDER BY ramal")]
+
+
+def test_ler_csv_com_cabecalho_e_separadores_de_fila():
+    linhas, erros = ramais_csv.ler_csv(
+        "ramal;nome;senha;filas\n4002;Bia;abc123;801 800\n\n4003;Caio;abc123;800|801\n4004;Duda;abc123\n")
+    assert erros == []
+    assert linhas == [(2, 4002, "Bia", "abc123", [800, 801]),
+                      (4, 4003, "Caio", "abc123", [800, 801]),
+                      (5, 4004, "Duda", "abc123", [])]
+
+
+def test_ler_csv_rejeita_linha_com_colunas_demais():
+    # Filas separadas por ',' num arquivo separado por ',': viram colunas a mais
+    linhas, erros = ramais_csv.ler_csv("4002,Bia,abc123,800,801\n4003,Caio,abc123,800\n")
+    assert [l[1] for l in linhas] == [4003]
+    assert len(erros) == 1 and erros[0].startswith("Linha 1: 5 colunas")
+
+
+def test_ler_csv_virgula_nao_separa_filas():
+    linhas, erros = ramais_csv.ler_csv('4002;Bia;abc123;"800,801"\n')
+    assert linhas == [] and erros == ["Linha 1: filas inválidas '800,801'."]
+
+
+@pytest.mark.parametrize("linha, trecho", [
+    ("x;Bia;abc123", "não é um número válido"),
+    ("4002;;abc123", "sem nome"),
+    ("4002;Bia;abc-123", "apenas letras e números"),
+])
+def test_ler_csv_campos_invalidos(linha, trecho):
+    _, erros = ramais_csv.ler_csv(linha + "\n")
+    assert len(erros) == 1 and trecho in erros[0]
+
+
+def test_ler_csv_ramal_repetido():
+    _, erros = ramais_csv.ler_csv("4002;Bia;abc123\n4003;Caio;abc123\n4002;Duda;abc123\n")
+    assert erros == ["Linha 3: ramal 4002 repetido (já aparece na linha 1)."]
+
+
+def test_validar_conflitos_com_o_banco(banco):
+    linhas, _ = ramais_csv.ler_csv(
+        "4001;Ana;abc123\n800;Fila;abc123\n5000;Rota;abc123\n4002;Bia;abc123;800 999\n")
+    erros, ids_ramais, ids_filas = ramais_csv.validar(banco, linhas)
+    assert erros == [
+        "Linha 1: já existe um ramal com o número 4001.",
+        "Linha 2: o número 800 já está em uso por uma fila.",
+        "Linha 3: o número 5000 já é número de entrada de uma rota.",
+        "Linha 4: fila(s) inexistente(s): 999.",
+    ]
+    assert set(ids_ramais) == {4001} and set(ids_filas) == {800, 801}
+    # Com atualizar, o ramal existente deixa de ser erro
+    erros, _, _ = ramais_csv.validar(banco, linhas[:1], atualizar=True)
+    assert erros == []
+
+
+def test_importar_nada_e_gravado_se_houver_erro(banco):
+    sucesso, _, erros = ramais_csv.importar_ramais(
+        "4002;Bia;abc123;800\n4003;Caio;abc123;800\n801;Colide;abc123\n")
+    assert not sucesso and len(erros) == 1
+    assert _ramais(banco) == [4001]
+    assert banco.execute("SELECT COUNT(*) FROM ramal_fila").fetchone()[0] == 0
+
+
+def test_importar_cria_e_atualiza(banco):
+    sucesso, msg, erros = ramais_csv.importar_ramais(
+        "4001;Ana Maria;nova123;801\n4002;Bia;abc123;800 801\n", atualizar=True)
+    assert sucesso and erros == []
+    assert msg == "1 ramal(is) criado(s) e 1 atualizado(s)."
+    assert _ramais(banco) == [4001, 4002]
+    assert banco.execute("SELECT nome, senha FROM ramais WHERE ramal = 4001").fetchone()[:] == ("Ana Maria", "nova123")
+    filas = banco.execute("""SELECT r.ramal, f.fila FROM ramal_fila rf
+                             JOIN ramais r ON r.id = rf.ramal_id JOIN filas f ON f.id = rf.fila_id
+                             ORDER BY r.ramal, f.fila""").fetchall()
+    assert [tuple(f) for f in filas] == [(4001, 801), (4002, 800), (4002, 801)]
@@ -0,0 +1,54 @@
+# tests/test_sip_realtime.py
+"""Permissões do banco em WAL para o Asterisk ao ativar o modo Realtime."""
+import os
+import pwd
+
+import pytest
+
+import sip_realtime
+
+
+@pytest.fixture
+def banco(tmp_path):
+    caminho = tmp_path / "nanosip.db"
+    caminho.write_bytes(b"")
+    return str(caminho)
+
+
+def _usuario_comum():
+    for nome in ("nobody", "daemon"):
+        try:
+            return pwd.getpwnam(nome)
+        except KeyError:
+            pass
+    pytest.skip("sem usuário não-root para o teste")
+
+
+def test_root_sempre_pode_escrever(banco):
+    os.chmod(os.path.dirname(banco), 0o500)
+    try:
+        assert sip_realtime.arquivos_sem_escrita("root", banco) == []
+    finally:
+        os.chmod(os.path.dirname(banco), 0o700)
+
+
+def test_outro_usuario_sem_escrita_no_diretorio(banco):
+    pw = _usuario_comum()
+    sem_escrita = sip_realtime.arquivos_sem_escrita(pw.pw_name, banco)
+    # O diretório (onde nascem -wal e -shm) e o banco pertencem a outro usuário
+    assert os.path.dirname(banco) in sem_escrita
+    assert banco in sem_escrita
+
+
+def test_outro_usuario_com_escrita(banco):
+    pw = _usuario_comum()
+    diretorio = os.path.dirname(banco)
+    for caminho in (diretorio, banco, banco + "-wal", banco + "-shm"):
+        if not os.path.exists(caminho):
+            open(caminho, "wb").close()
+        os.chmod(caminho, 0o777 if caminho == diretorio else 0o666)
+    assert sip_realtime.arquivos_sem_escrita(pw.pw_name, banco) == []
+
+
+def test_usuario_inexistente(banco):
+    assert sip_realtime.arquivos_sem_escrita("nao-existe-nanosip", banco)